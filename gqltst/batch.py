@@ -0,0 +1,161 @@
+import re
+
+from gqltst.limits import RETRY_STATUSES
+
+ALIAS = "alias"
+ARRAY = "array"
+
+# returned by split when the batch was understood but its cases must be sent
+# alone, without shrinking further batches
+RESEND = "resend"
+
+
+class Batcher(object):
+    # Subclasses implement merge(items), the payload sent for a batch, and
+    # split(status, content, items): (data, errors) per item, an error message
+    # for the whole batch, RESEND, or None when the server does not support
+    # this kind of batching.
+    def __init__(self, size=10):
+        if size < 1:
+            raise Exception("Batch size must be positive, got %s" % size)
+
+        self.size = size
+        self.rejections = 0
+
+    def can_join(self, batch, item):
+        return True
+
+    def group(self, queries):
+        batch = []
+        for item in queries:
+            if len(batch) > 0 and (len(batch) >= self.size or not self.can_join(batch, item)):
+                yield batch
+                batch = []
+            batch.append(item)
+
+        if len(batch) > 0:
+            yield batch
+
+    def reject(self):
+        self.rejections += 1
+        self.size = max(1, self.size // 2)
+
+    def get_payload(self, query):
+        if type(query) == dict:
+            return query
+        return {"query": query}
+
+
+class AliasBatcher(Batcher):
+    # Merges combinations of the same TestQuery into one document where every
+    # case is an aliased copy of the root field: {t0: users(...) t1: users(...)}
+    document_re = re.compile(r"^query(\((?P<definitions>.*?)\))?\{(?P<body>.*)\}$", re.S)
+    root_re = re.compile(r"\s*(\w+)")
+    variable_re = re.compile(r"\$(\w+)")
+
+    def can_join(self, batch, item):
+        return len(item) > 2 and len(batch[0]) > 2 and batch[0][2] is item[2]
+
+    def parse(self, query):
+        payload = self.get_payload(query)
+        match = self.document_re.match(payload["query"].strip())
+        if match is None:
+            raise Exception("Unable to alias query %s" % payload["query"])
+
+        return match.group("definitions"), match.group("body"), payload.get("variables") or {}
+
+    def merge(self, items):
+        definitions = []
+        bodies = []
+        variables = {}
+        for i, item in enumerate(items):
+            alias = "t%d" % i
+            item_definitions, body, item_variables = self.parse(item[0])
+
+            if item_definitions:
+                rename = "$%s_\\1" % alias
+                definitions.append(self.variable_re.sub(rename, item_definitions))
+                body = self.variable_re.sub(rename, body)
+                for name, value in item_variables.items():
+                    variables["%s_%s" % (alias, name)] = value
+
+            bodies.append("%s: %s" % (alias, body.strip()))
+
+        if len(definitions) > 0:
+            document = "query(%s){%s}" % (", ".join(definitions), " ".join(bodies))
+        else:
+            document = "query{%s}" % " ".join(bodies)
+
+        return {"query": document, "variables": variables}
+
+    def split(self, status, content, items):
+        if type(content) != dict:
+            return "Unexpected response %s (HTTP %s)" % (type(content).__name__, status)
+
+        data = content.get("data")
+        aliases = ["t%d" % i for i in range(len(items))]
+        if type(data) == dict and len([a for a in aliases if a in data.keys()]) == 0:
+            # answered, but none of the aliases came back
+            return None
+
+        # errors without an alias in their path (request errors, HTTP
+        # failures) cannot be attributed: a request error may come from a
+        # single case, so the cases are sent alone, while a throttled or
+        # failed batch gives every case the errors
+        errors = content.get("errors") or []
+        shared = [e for e in errors if type(e) != dict or not e.get("path") or e["path"][0] not in aliases]
+        if len(shared) > 0 and len(shared) == len(errors) and len(items) > 1 and \
+                status not in RETRY_STATUSES and (status is None or status < 500):
+            return RESEND
+
+        result = []
+        for alias, item in zip(aliases, items):
+            root = self.root_re.match(self.parse(item[0])[1]).group(1)
+
+            item_errors = list(shared)
+            for error in errors:
+                if error not in shared and error["path"][0] == alias:
+                    error = dict(error)
+                    error["path"] = [root] + list(error["path"][1:])
+                    item_errors.append(error)
+
+            item_data = None if type(data) != dict else {root: data.get(alias)}
+            result.append((item_data, item_errors or None))
+
+        return result
+
+
+class ArrayBatcher(Batcher):
+    # Transport-level batching: a JSON array of operations per request,
+    # answered by an array of results in the same order
+    def merge(self, items):
+        return [self.get_payload(item[0]) for item in items]
+
+    def split(self, status, content, items):
+        if type(content) == dict and (status == 429 or status >= 500):
+            # throttled or failed before the body was looked at
+            return [(content.get("data"), content.get("errors"))] * len(items)
+        if type(content) != list or len(content) != len(items):
+            return None
+
+        result = []
+        for entry in content:
+            if type(entry) != dict:
+                return None
+            result.append((entry.get("data"), entry.get("errors")))
+
+        return result
+
+    def reject(self):
+        # a server that does not answer with an array does not support transport batching
+        self.rejections += 1
+        self.size = 1
+
+
+def get_batcher(mode, size=10):
+    if mode == ALIAS:
+        return AliasBatcher(size)
+    elif mode == ARRAY:
+        return ArrayBatcher(size)
+    else:
+        raise Exception("Unknown batch mode %s" % mode)
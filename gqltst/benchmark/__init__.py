@@ -0,0 +1,2 @@
+from gqltst.benchmark.synthetic import SyntheticSchema, generate_introspection
+from gqltst.benchmark.runner import run_benchmark
@@ -0,0 +1,48 @@
+import argparse
+import json
+import sys
+
+from gqltst.benchmark.runner import run_benchmark
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gqltst.benchmark",
+                                     description="Offline gqltst benchmark on a synthetic schema")
+    parser.add_argument("--types", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--arguments", type=int, default=2)
+    parser.add_argument("--enums", type=int, default=4)
+    parser.add_argument("--enum-size", type=int, default=4)
+    parser.add_argument("--connections", type=float, default=0.2)
+    parser.add_argument("--cycles", type=float, default=0.1)
+    parser.add_argument("--argumented", type=float, default=0.3)
+    parser.add_argument("--limit", type=int, default=1000, help="combinations enumerated per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    params = {
+        "types": args.types,
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "arguments": args.arguments,
+        "enums": args.enums,
+        "enum_size": args.enum_size,
+        "connections": args.connections,
+        "cycles": args.cycles,
+        "argumented": args.argumented,
+    }
+    result = run_benchmark(params, limit=args.limit, memory=not args.no_memory, seed=args.seed)
+
+    if args.output is None:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import contextlib
+import io
+import itertools
+import json
+import platform
+import time
+import tracemalloc
+
+from gqltst.reslovers import seed_random
+from gqltst.schema import GqlType, Schema, STREAM_CHUNK_SIZE
+from gqltst.stream import iter_types
+from gqltst.benchmark.synthetic import SyntheticSchema
+
+BENCHMARK_URL = "http://benchmark.invalid/graphql"
+
+
+class StageTimer(object):
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = {}
+
+    def measure(self, name, func, *args):
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - started
+
+        stage = self.stages.setdefault(name, {})
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            stage["peak_bytes"] = peak - before
+            stage["retained_bytes"] = current - before
+        else:
+            stage["seconds"] = seconds
+
+        return result
+
+
+def build_schema(payload):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Schema(BENCHMARK_URL, introspection=payload)
+
+
+def build_streamed(raw):
+    # the path Schema takes for a live response: decode and build type by type
+    content = raw.encode("utf-8")
+    chunks = (content[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(content), STREAM_CHUNK_SIZE))
+    return dict([(d["name"], GqlType(d)) for d in iter_types(chunks)])
+
+
+def enumerate_combinations(test_queries, scalars, limit):
+    count = 0
+    for test_query in test_queries:
+        test_query._prepare_variables(scalars, {})
+        for _ in itertools.islice(test_query._get_variables(), limit):
+            count += 1
+    return count
+
+
+def render_queries(test_queries, scalars, limit, compiled=False):
+    count = 0
+    for test_query in test_queries:
+        for _ in itertools.islice(test_query.get_query(scalars, compiled=compiled), limit):
+            count += 1
+    return count
+
+
+def run_pipeline(raw, timer, limit, seed):
+    seed_random(seed)
+    counts = {}
+
+    timer.measure("build_streamed", build_streamed, raw)
+    payload = timer.measure("decode", json.loads, raw)
+    schema = timer.measure("build", build_schema, payload)
+    counts["types"] = len(schema.types)
+
+    timer.measure("prepare_queries", schema.prepare_queries, {}, True)
+    counts["queries"] = len(schema.queries)
+
+    test_queries = timer.measure("templates", schema.get_test_queries)
+    counts["combinations"] = timer.measure("enumerate", enumerate_combinations, test_queries, schema.scalars, limit)
+    timer.measure("render", render_queries, test_queries, schema.scalars, limit)
+    timer.measure("render_compiled", render_queries, test_queries, schema.scalars, limit, True)
+
+    return counts
+
+
+def run_benchmark(params={}, limit=1000, memory=True, seed=0):
+    synthetic = SyntheticSchema(seed=seed, **params)
+    raw = json.dumps(synthetic.generate())
+
+    timer = StageTimer()
+    counts = run_pipeline(raw, timer, limit, seed)
+
+    if memory:
+        # a second pass under tracemalloc, so tracing overhead does not skew the timings
+        timer.memory = True
+        tracemalloc.start()
+        try:
+            run_pipeline(raw, timer, limit, seed)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "params": synthetic.get_params(),
+        "seed": seed,
+        "limit": limit,
+        "payload_bytes": len(raw),
+        "counts": counts,
+        "stages": timer.stages,
+    }
@@ -0,0 +1,175 @@
+import random
+
+BUILTIN_SCALARS = ["String", "Int", "Float", "Boolean", "ID", "DateTime"]
+
+
+def named(kind, name):
+    return {"kind": kind, "name": name, "ofType": None}
+
+
+def non_null(of_type):
+    return {"kind": "NON_NULL", "name": None, "ofType": of_type}
+
+
+def list_of(of_type):
+    return {"kind": "LIST", "name": None, "ofType": of_type}
+
+
+def make_type(kind, name, fields=None, enum_values=None):
+    return {
+        "kind": kind,
+        "name": name,
+        "description": None,
+        "fields": fields,
+        "inputFields": None,
+        "interfaces": [] if kind == "OBJECT" else None,
+        "possibleTypes": None,
+        "enumValues": enum_values,
+    }
+
+
+def make_field(name, field_type, args=None):
+    return {
+        "name": name,
+        "description": None,
+        "isDeprecated": False,
+        "deprecationReason": None,
+        "args": args or [],
+        "type": field_type,
+    }
+
+
+def make_argument(name, arg_type):
+    return {"name": name, "description": None, "type": arg_type, "defaultValue": None}
+
+
+class SyntheticSchema(object):
+    # Builds an introspection payload shaped like the response to
+    # schema.structure_query, so it can be fed straight into Schema.
+    def __init__(self, types=100, depth=4, fanout=4, arguments=2, enums=4, enum_size=4,
+                 connections=0.2, cycles=0.1, argumented=0.3, seed=0):
+        self.types = types
+        self.depth = max(1, depth)
+        self.fanout = fanout
+        self.arguments = arguments
+        self.enums = max(1, enums)
+        self.enum_size = enum_size
+        self.connections = connections
+        self.cycles = cycles
+        self.argumented = argumented
+        self.random = random.Random(seed)
+
+    def get_params(self):
+        return {
+            "types": self.types,
+            "depth": self.depth,
+            "fanout": self.fanout,
+            "arguments": self.arguments,
+            "enums": self.enums,
+            "enum_size": self.enum_size,
+            "connections": self.connections,
+            "cycles": self.cycles,
+            "argumented": self.argumented,
+        }
+
+    def get_level(self, i):
+        return i * self.depth // max(1, self.types)
+
+    def make_arguments(self):
+        args = []
+        for i in range(self.arguments):
+            choice = i % 4
+            if choice == 0:
+                arg_type = named("SCALAR", "Int")
+            elif choice == 1:
+                arg_type = named("ENUM", "Enum%d" % self.random.randrange(self.enums))
+            elif choice == 2:
+                arg_type = list_of(non_null(named("ENUM", "Enum%d" % self.random.randrange(self.enums))))
+            else:
+                arg_type = named("SCALAR", self.random.choice(["String", "DateTime", "Boolean"]))
+            args.append(make_argument("arg%d" % i, arg_type))
+        return args
+
+    def make_connection(self, name, payload):
+        payload.append(make_type("OBJECT", "%sEdge" % name, [
+            make_field("cursor", non_null(named("SCALAR", "String"))),
+            make_field("node", named("OBJECT", name)),
+        ]))
+        payload.append(make_type("OBJECT", "%sConnection" % name, [
+            make_field("totalCount", non_null(named("SCALAR", "Int"))),
+            make_field("pageInfo", non_null(named("OBJECT", "PageInfo"))),
+            make_field("edges", list_of(named("OBJECT", "%sEdge" % name))),
+        ]))
+
+    def make_object_field(self, name, target, payload, connections):
+        args = None
+        if self.random.random() < self.argumented:
+            args = self.make_arguments()
+
+        if self.random.random() < self.connections:
+            if target not in connections:
+                connections.add(target)
+                self.make_connection(target, payload)
+            args = (args or []) + [make_argument("first", named("SCALAR", "Int")),
+                                   make_argument("last", named("SCALAR", "Int"))]
+            return make_field(name, named("OBJECT", "%sConnection" % target), args)
+
+        field_type = named("OBJECT", target)
+        if self.random.random() < 0.3:
+            field_type = list_of(non_null(field_type))
+        return make_field(name, field_type, args)
+
+    def generate(self):
+        payload = []
+        connections = set()
+
+        for name in BUILTIN_SCALARS:
+            payload.append(make_type("SCALAR", name))
+
+        payload.append(make_type("OBJECT", "PageInfo", [
+            make_field("hasNextPage", non_null(named("SCALAR", "Boolean"))),
+            make_field("endCursor", named("SCALAR", "String")),
+        ]))
+
+        for i in range(self.enums):
+            values = [{"name": "VALUE_%d" % j, "description": None, "isDeprecated": False,
+                       "deprecationReason": None} for j in range(self.enum_size)]
+            payload.append(make_type("ENUM", "Enum%d" % i, enum_values=values))
+
+        levels = {}
+        for i in range(self.types):
+            levels.setdefault(self.get_level(i), []).append("Type%d" % i)
+
+        for i in range(self.types):
+            name = "Type%d" % i
+            level = self.get_level(i)
+
+            fields = [make_field("id", non_null(named("SCALAR", "ID")))]
+            for j in range(self.fanout):
+                if j % 2 == 0:
+                    fields.append(make_field("scalar%d" % j, named("SCALAR", self.random.choice(BUILTIN_SCALARS))))
+                else:
+                    fields.append(make_field("enum%d" % j, named("ENUM", "Enum%d" % self.random.randrange(self.enums))))
+
+            for j in range(self.fanout):
+                if self.random.random() < self.cycles:
+                    candidates = [t for lv in range(level + 1) for t in levels.get(lv, [])]
+                elif level + 1 in levels.keys():
+                    candidates = levels[level + 1]
+                else:
+                    continue
+                target = self.random.choice(candidates)
+                fields.append(self.make_object_field("child%d" % j, target, payload, connections))
+
+            payload.append(make_type("OBJECT", name, fields))
+
+        root_fields = []
+        for j, target in enumerate(levels.get(0, [])[:max(1, self.fanout)]):
+            root_fields.append(self.make_object_field("root%d" % j, target, payload, connections))
+        payload.append(make_type("OBJECT", "Query", root_fields))
+
+        return {"data": {"__schema": {"types": payload}}}
+
+
+def generate_introspection(**params):
+    return SyntheticSchema(**params).generate()
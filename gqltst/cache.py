@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+
+CACHE_VERSION = 5
+
+
+class SchemaCache(object):
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "gqltst")
+
+        self.directory = directory
+
+    def get_key(self, url, headers={}):
+        # headers usually carry credentials, so only their digest ends up on disk
+        source = json.dumps([url, sorted([(str(k).lower(), str(v)) for k, v in headers.items()])])
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get_path(self, url, headers={}, suffix=""):
+        return os.path.join(self.directory, "%s%s.pickle" % (self.get_key(url, headers), suffix))
+
+    def read(self, url, path):
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        if type(entry) != dict or entry.get("version") != CACHE_VERSION or entry.get("url") != url:
+            return None
+
+        return entry
+
+    def write(self, path, entry):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, url, headers={}):
+        return self.read(url, self.get_path(url, headers))
+
+    def save(self, url, headers, types, etag=None, schema_hash=None):
+        entry = {
+            "version": CACHE_VERSION,
+            "url": url,
+            "etag": etag,
+            "hash": schema_hash,
+            "stored": time.time(),
+            "types": types,
+        }
+        self.write(self.get_path(url, headers), entry)
+
+        return entry
+
+    def load_results(self, url, headers={}, options=None):
+        # the last incremental run: its results grouped by planned query path,
+        # and the types and schema hash they were produced against
+        entry = self.read(url, self.get_path(url, headers, ".results"))
+        if entry is None or entry.get("options") != options:
+            return None
+        return entry
+
+    def save_results(self, url, headers, results, options=None, types=None, schema_hash=None):
+        entry = {
+            "version": CACHE_VERSION,
+            "url": url,
+            "options": options,
+            "hash": schema_hash,
+            "stored": time.time(),
+            "types": types,
+            "results": results,
+        }
+        self.write(self.get_path(url, headers, ".results"), entry)
+
+        return entry
+
+    def clear(self, url, headers={}):
+        for path in [self.get_path(url, headers), self.get_path(url, headers, ".results")]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def spool_response(chunks):
+    # Hashes an introspection response (same digest as the one taken while
+    # streaming it) and spools it to a temporary file, so it can be compared
+    # with a cache entry without being held in memory. Returns the digest and
+    # the file, rewound for reading.
+    digest = hashlib.sha256()
+    spool = tempfile.TemporaryFile()
+    for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return digest.hexdigest(), spool
+
+
+def iter_spool(spool, chunk_size):
+    return iter(lambda: spool.read(chunk_size), b"")
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import re
+
+token_re = re.compile(r'"""(?:[^"\\]|\\.|"(?!""))*"""|"(?:[^"\\\n]|\\.)*"|#[^\n]*|[\s,]+|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\.\.|[!$&()\[\]{}:=@|]|[^\s,"#!$&()\[\]{}:=@|.]+|\.')
+punctuation_re = re.compile(r'^(\.\.\.|[!$&()\[\]{}:=@|])$')
+
+
+def normalize_document(document):
+    # Drops comments and insignificant whitespace and commas; a single space is
+    # kept only where two names, numbers or strings would otherwise merge.
+    tokens = []
+    previous_word = False
+    for token in token_re.findall(document):
+        first = token[0]
+        if first == "#" or first == "," or first.isspace():
+            continue
+
+        word = punctuation_re.match(token) is None
+        if word and previous_word:
+            tokens.append(" ")
+        tokens.append(token)
+        previous_word = word
+
+    return "".join(tokens)
+
+
+def get_canonical_hash(query):
+    # query is a literal document, a {"query", "variables"} payload as sent by
+    # the executor or a list of payloads (array batch); variables with a None
+    # value are the same as absent ones
+    if type(query) == list:
+        content = "\n".join([get_canonical_hash(item) for item in query])
+        return hashlib.sha256(("[%s]" % content).encode("utf-8")).hexdigest()
+
+    if type(query) == dict:
+        document = query["query"]
+        variables = dict([(k, v) for k, v in (query.get("variables") or {}).items() if v is not None])
+    else:
+        document = query
+        variables = {}
+
+    content = "%s\n%s" % (normalize_document(document),
+                          json.dumps(variables, sort_keys=True, separators=(",", ":"), default=str))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class Deduplicator(object):
+    def __init__(self):
+        self.seen = set()
+        self.duplicates = 0
+
+    def add(self, query):
+        key = get_canonical_hash(query)
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+
+        self.seen.add(key)
+        return True
+
+    def filter(self, requests):
+        for item in requests:
+            if self.add(item[0]):
+                yield item
@@ -0,0 +1,310 @@
+import itertools
+
+
+class VariablesPrefix(object):
+    # Immutable linked list of resolved values. Every extension shares its
+    # parent, so the combinations of one query cost O(depth) memory in total.
+    def __init__(self, parent=None, key=None, value=None):
+        self.parent = parent
+        self.key = key
+        self.value = value
+
+        if parent is None:
+            self.depth = 0
+        else:
+            self.depth = parent.depth + 1
+
+    def extend(self, key, value):
+        return VariablesPrefix(self, key, value)
+
+    def items(self):
+        items = []
+        node = self
+        while node.parent is not None:
+            items.append((node.key, node.value))
+            node = node.parent
+        items.reverse()
+        return items
+
+    def keys(self):
+        return [k for k, _ in self.items()]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+    def get(self, key, default=None):
+        node = self
+        while node.parent is not None:
+            if node.key == key:
+                return node.value
+            node = node.parent
+        return default
+
+    def __getitem__(self, key):
+        node = self
+        while node.parent is not None:
+            if node.key == key:
+                return node.value
+            node = node.parent
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        node = self
+        while node.parent is not None:
+            if node.key == key:
+                return True
+            node = node.parent
+        return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return self.depth
+
+
+def get_context(prefix):
+    return {"vars": prefix}
+
+
+def iterate_combinations(keys, resolvers, prefix=None):
+    # Depth-first walk over the resolvers with an explicit stack of value
+    # iterators: combinations are produced one at a time, in resolver order.
+    if prefix is None:
+        prefix = VariablesPrefix()
+
+    if len(keys) == 0:
+        yield prefix
+        return
+
+    stack = [(prefix, iter(resolvers[0](get_context(prefix))))]
+    while len(stack) > 0:
+        parent, values = stack[-1]
+        try:
+            value = next(values)
+        except StopIteration:
+            stack.pop()
+            continue
+
+        node = parent.extend(keys[len(stack) - 1], value)
+        if len(stack) == len(keys):
+            yield node
+        else:
+            stack.append((node, iter(resolvers[len(stack)](get_context(node)))))
+
+
+EXHAUSTIVE = "exhaustive"
+PAIRWISE = "pairwise"
+T_WISE = "t-wise"
+
+
+def freeze(value):
+    if type(value) in [list, tuple]:
+        return tuple([freeze(v) for v in value])
+    elif isinstance(value, dict):
+        return tuple(sorted([(k, freeze(v)) for k, v in value.items()]))
+    return (type(value).__name__, value)
+
+
+class CoveringArray(object):
+    # Greedy IPOG construction of a t-wise covering array. Resolvers are always
+    # called with the row prefix built so far, so dependent resolvers
+    # (depend_resolver, connection_last_resolver) only ever see the arguments
+    # before them and tuples they can never produce are dropped as infeasible.
+    def __init__(self, keys, resolvers, strength=2, prefix=None, max_backtracks=1000):
+        if strength < 1:
+            raise Exception("Covering strength must be positive, got %s" % strength)
+
+        if prefix is None:
+            prefix = VariablesPrefix()
+
+        self.keys = keys
+        self.resolvers = resolvers
+        self.strength = strength
+        self.prefix = prefix
+        self.max_backtracks = max_backtracks
+
+        self.tables = [[] for _ in keys]
+        self.indexes = [{} for _ in keys]
+        self.candidates_cache = {}
+        self.infeasible = 0
+
+    def get_prefix(self, row):
+        node = self.prefix
+        for j, idx in enumerate(row):
+            node = node.extend(self.keys[j], self.tables[j][idx])
+        return node
+
+    def get_index(self, j, value):
+        frozen = freeze(value)
+        if frozen not in self.indexes[j]:
+            self.indexes[j][frozen] = len(self.tables[j])
+            self.tables[j].append(value)
+        return self.indexes[j][frozen]
+
+    def get_candidates(self, row, j):
+        key = tuple(row[:j])
+        if key not in self.candidates_cache:
+            candidates = []
+            for value in self.resolvers[j](get_context(self.get_prefix(row[:j]))):
+                idx = self.get_index(j, value)
+                if idx not in candidates:
+                    candidates.append(idx)
+            self.candidates_cache[key] = candidates
+        return self.candidates_cache[key]
+
+    def complete(self, required, last):
+        budget = [self.max_backtracks]
+
+        def search(row):
+            j = len(row)
+            if j > last:
+                return row
+
+            candidates = self.get_candidates(row, j)
+            if j in required:
+                options = [required[j]] if required[j] in candidates else []
+            else:
+                options = candidates
+
+            for idx in options:
+                if budget[0] <= 0:
+                    return None
+                found = search(row + [idx])
+                if found is not None:
+                    return found
+                budget[0] -= 1
+
+            return None
+
+        return search([])
+
+    def get_uncovered(self, rows, i, candidates):
+        t = self.strength
+        domains = [sorted(set([row[j] for row in rows])) for j in range(i)]
+        domain = sorted(set([idx for c in candidates for idx in c]))
+
+        uncovered = set()
+        for cols in itertools.combinations(range(i), t - 1):
+            for values in itertools.product(*[domains[c] for c in cols]):
+                for idx in domain:
+                    uncovered.add((cols, values + (idx,)))
+        return uncovered
+
+    def get_tuples(self, row, last):
+        return set([(cols, tuple([row[c] for c in cols]))
+                    for cols in itertools.combinations(range(last + 1), self.strength)])
+
+    def recover(self, dropped, rows, i):
+        # a row column i has no value for is dropped, and with it the tuples of
+        # earlier columns only it covered: each of those is completed into a
+        # new row that does reach column i, or counted as infeasible
+        lost = set()
+        for row in dropped:
+            lost.update(self.get_tuples(row, i - 1))
+        for row in rows:
+            lost.difference_update(self.get_tuples(row, i - 1))
+
+        for cols, values in sorted(lost):
+            if (cols, values) not in lost:
+                continue
+
+            row = self.complete(dict(zip(cols, values)), i)
+            if row is None:
+                self.infeasible += 1
+                lost.discard((cols, values))
+                continue
+
+            rows.append(row)
+            lost.difference_update(self.get_tuples(row, i - 1))
+
+    def build(self):
+        t = self.strength
+        n = len(self.keys)
+
+        rows = [[]]
+        for j in range(min(t, n)):
+            rows = [row + [idx] for row in rows for idx in self.get_candidates(row, j)]
+
+        for i in range(t, n):
+            candidates = [self.get_candidates(row, i) for row in rows]
+            uncovered = self.get_uncovered(rows, i, candidates)
+            col_sets = list(itertools.combinations(range(i), t - 1))
+
+            # horizontal growth: extend every row with its most useful value
+            extended = []
+            dropped = []
+            for row, row_candidates in zip(rows, candidates):
+                if len(row_candidates) == 0:
+                    dropped.append(row)
+                    continue
+
+                partials = [(cols, tuple([row[c] for c in cols])) for cols in col_sets]
+                best, best_gain = row_candidates[0], -1
+                for idx in row_candidates:
+                    gain = len([1 for cols, values in partials if (cols, values + (idx,)) in uncovered])
+                    if gain > best_gain:
+                        best, best_gain = idx, gain
+
+                for cols, values in partials:
+                    uncovered.discard((cols, values + (best,)))
+                extended.append(row + [best])
+
+            # vertical growth: merge remaining tuples into as few new rows as possible
+            pending = []
+            for cols, values in sorted(uncovered):
+                required = dict(zip(cols + (i,), values))
+                for assigned in pending:
+                    if all([assigned.get(c, v) == v for c, v in required.items()]):
+                        assigned.update(required)
+                        break
+                else:
+                    pending.append(required)
+
+            covered = set()
+            for assigned in pending:
+                row = self.complete(assigned, i)
+                if row is not None:
+                    extended.append(row)
+                    continue
+
+                for cols, values in sorted(uncovered):
+                    required = dict(zip(cols + (i,), values))
+                    if (cols, values) in covered or any([assigned.get(c) != v for c, v in required.items()]):
+                        continue
+
+                    row = self.complete(required, i)
+                    if row is None:
+                        self.infeasible += 1
+                        continue
+
+                    extended.append(row)
+                    for row_cols in col_sets:
+                        covered.add((row_cols, tuple([row[c] for c in row_cols]) + (row[i],)))
+
+            if len(dropped) > 0:
+                self.recover(dropped, extended, i)
+            rows = extended
+
+        return rows
+
+    def __iter__(self):
+        for row in self.build():
+            yield self.get_prefix(row)
+
+
+def get_combinations(keys, resolvers, strategy=EXHAUSTIVE, strength=None, prefix=None):
+    if strategy == EXHAUSTIVE:
+        return iterate_combinations(keys, resolvers, prefix)
+    elif strategy == PAIRWISE:
+        strength = 2
+    elif strategy == T_WISE:
+        if strength is None:
+            raise Exception("Strategy %s requires strength" % strategy)
+    else:
+        raise Exception("Unknown combination strategy %s" % strategy)
+
+    if strength >= len(keys):
+        return iterate_combinations(keys, resolvers, prefix)
+
+    return iter(CoveringArray(keys, resolvers, strength, prefix))
@@ -0,0 +1,238 @@
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+
+FIELDS = "fields"
+ENUM_VALUES = "enum values"
+ARGUMENTS = "argument classes"
+
+
+def get_value_class(value):
+    if value is None:
+        return "absent"
+    if type(value) == bool:
+        return str(value).lower()
+    if type(value) in [int, float]:
+        return "negative" if value < 0 else ("zero" if value == 0 else "positive")
+    if type(value) == str:
+        return "empty" if value == "" else "string"
+    if type(value) in [list, tuple]:
+        return "empty list" if len(value) == 0 else ("one item" if len(value) == 1 else "many items")
+    if type(value) == dict:
+        return "object"
+    return type(value).__name__
+
+
+class Coverage(object):
+    # Schema elements exercised by a run: object and interface fields seen in
+    # responses, enum values sent or received, and the class (absent, zero,
+    # empty list, enum value, ...) of every argument sent per query path.
+    def __init__(self, types):
+        self.types = types
+        self.total = OrderedDict([(FIELDS, set()), (ENUM_VALUES, set())])
+        for otype in types.values():
+            if otype.name.startswith("__"):
+                continue
+            if otype.kind in ["OBJECT", "INTERFACE"]:
+                self.total[FIELDS].update(["%s.%s" % (otype.name, f) for f in otype.fields.keys()])
+            elif otype.kind == "ENUM":
+                self.total[ENUM_VALUES].update(["%s.%s" % (otype.name, v) for v in otype.enum_values.keys()])
+
+        self.seen = OrderedDict([(FIELDS, set()), (ENUM_VALUES, set()), (ARGUMENTS, set())])
+        # argument features of requests handed out but not answered yet
+        self.planned = set()
+        self.requests = 0
+        self.useful = 0
+
+    def add(self, kind, key):
+        if key in self.seen[kind]:
+            return False
+        self.seen[kind].add(key)
+        return True
+
+    def get_argument_features(self, test_query, values):
+        features = []
+        for (key, var), value in zip(test_query.query_data.variables.items(), values):
+            node_type = var["node"].type
+            features.append((ARGUMENTS, "%s:%s" % (key, get_value_class(value))))
+            if value is not None:
+                self.get_value_features(node_type.name, value, features)
+        return features
+
+    def get_value_features(self, type_name, value, features):
+        if type(value) in [list, tuple]:
+            for item in value:
+                self.get_value_features(type_name, item, features)
+            return
+
+        otype = self.types.get(type_name)
+        if otype is None:
+            return
+        if otype.kind == "ENUM":
+            features.append((ENUM_VALUES, "%s.%s" % (type_name, value)))
+        elif otype.kind == "INPUT_OBJECT" and type(value) == dict:
+            for name, item in value.items():
+                features.append((ARGUMENTS, "%s.%s:%s" % (type_name, name, get_value_class(item))))
+                if name in otype.input_fields and item is not None:
+                    self.get_value_features(otype.input_fields[name].type.name, item, features)
+
+    def get_response_features(self, otype, data, features):
+        if type(data) == list:
+            for item in data:
+                self.get_response_features(otype, item, features)
+            return
+        if type(data) != dict:
+            return
+
+        for name, value in data.items():
+            if name not in otype.fields:
+                continue
+            features.append((FIELDS, "%s.%s" % (otype.name, name)))
+
+            if value is None:
+                continue
+            field_type = self.types.get(otype.fields[name].type.name)
+            if field_type is None:
+                continue
+            if field_type.kind == "ENUM":
+                for item in (value if type(value) == list else [value]):
+                    features.append((ENUM_VALUES, "%s.%s" % (field_type.name, item)))
+            elif field_type.kind in ["OBJECT", "INTERFACE"]:
+                self.get_response_features(field_type, value, features)
+
+    def get_novelty(self, test_query, values):
+        # how much a planned request could add before it is sent
+        return len([f for f in self.get_argument_features(test_query, values)
+                    if f not in self.planned and f[1] not in self.seen[f[0]]])
+
+    def plan(self, test_query, values):
+        self.planned.update(self.get_argument_features(test_query, values))
+
+    def record(self, result):
+        # returns the number of schema elements the result covered for the first time
+        features = []
+        if result.source is not None and result.values is not None and hasattr(result.source, "schema_objects"):
+            features.extend(self.get_argument_features(result.source, result.values))
+            # answered features move to seen, other requests planned with them need no entry here
+            self.planned.difference_update(features)
+        if type(result.data) == dict and "Query" in self.types.keys():
+            self.get_response_features(self.types["Query"], result.data, features)
+
+        added = len([f for f in features if self.add(*f)])
+        self.requests += 1
+        if added > 0:
+            self.useful += 1
+        return added
+
+    def get_ratio(self, kind=None):
+        kinds = [kind] if kind is not None else self.total.keys()
+        total = sum([len(self.total[k]) for k in kinds])
+        seen = sum([len(self.seen[k] & self.total[k]) for k in kinds])
+        return seen / float(total) if total > 0 else 1.0
+
+    def get_missing(self, kind):
+        return sorted(self.total[kind] - self.seen[kind])
+
+    def to_dict(self, missing=False):
+        output = OrderedDict()
+        output["requests"] = self.requests
+        output["useful_requests"] = self.useful
+        for kind, seen in self.seen.items():
+            entry = OrderedDict()
+            entry["seen"] = len(seen if kind not in self.total.keys() else seen & self.total[kind])
+            if kind in self.total.keys():
+                entry["total"] = len(self.total[kind])
+                entry["ratio"] = self.get_ratio(kind)
+                if missing:
+                    entry["missing"] = self.get_missing(kind)
+            output[kind] = entry
+        return output
+
+    def format(self):
+        lines = []
+        for kind, entry in self.to_dict().items():
+            if type(entry) != OrderedDict:
+                continue
+            if "total" in entry.keys():
+                lines.append("%-18s %6d / %-6d %6.1f%%" % (kind, entry["seen"], entry["total"], entry["ratio"] * 100))
+            else:
+                lines.append("%-18s %6d" % (kind, entry["seen"]))
+        lines.append("%d of %d requests added coverage" % (self.useful, self.requests))
+        return "\n".join(lines)
+
+
+class CoverageScheduler(object):
+    # Wraps the planned requests: keeps up to lookahead of them buffered and
+    # hands out the one whose arguments add the most new coverage first, query
+    # paths that have not been sent yet before the rest. Iteration stops once
+    # the time budget is spent, the target coverage is reached, or the last
+    # patience results added nothing and no buffered request can.
+    def __init__(self, requests, coverage, lookahead=1000, budget=None, target=None, patience=None):
+        self.requests = iter(requests)
+        self.coverage = coverage
+        self.lookahead = lookahead
+        self.budget = budget
+        self.target = target
+        self.patience = patience
+        self.heap = []
+        self.counter = itertools.count()
+        self.exhausted = False
+        self.paths = set()
+        self.idle = 0
+        self.started = time.perf_counter()
+        self.sent = 0
+        self.reason = None
+
+    def __iter__(self):
+        return self
+
+    def get_score(self, item):
+        new_path = ".".join(item[2].query_data.path) not in self.paths
+        return (-int(new_path), -self.coverage.get_novelty(item[2], item[1]))
+
+    def fill(self):
+        while not self.exhausted and len(self.heap) < self.lookahead:
+            try:
+                item = next(self.requests)
+            except StopIteration:
+                self.exhausted = True
+                break
+            heapq.heappush(self.heap, (self.get_score(item), next(self.counter), item))
+
+    def pop(self):
+        # scores only drop as coverage grows, so a popped entry whose fresh
+        # score still beats the next stored one is the best (lazy greedy)
+        while True:
+            _, order, item = heapq.heappop(self.heap)
+            score = self.get_score(item)
+            if len(self.heap) == 0 or (score, order) <= self.heap[0][:2]:
+                return score, item
+            heapq.heappush(self.heap, (score, order, item))
+
+    def record(self, added):
+        self.idle = 0 if added > 0 else self.idle + 1
+
+    def get_stop_reason(self, score):
+        if self.budget is not None and time.perf_counter() - self.started >= self.budget:
+            return "time budget of %ss spent" % self.budget
+        if self.target is not None and self.coverage.get_ratio() >= self.target:
+            return "coverage target of %.0f%% reached" % (self.target * 100)
+        if self.patience is not None and self.idle >= self.patience and score == (0, 0):
+            return "coverage saturated, last %d results added nothing" % self.idle
+        return None
+
+    def __next__(self):
+        self.fill()
+        if len(self.heap) == 0:
+            raise StopIteration
+
+        score, item = self.pop()
+        self.reason = self.get_stop_reason(score)
+        if self.reason is not None:
+            raise StopIteration
+
+        self.paths.add(".".join(item[2].query_data.path))
+        self.coverage.plan(item[2], item[1])
+        self.sent += 1
+        return item
@@ -0,0 +1,165 @@
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class SchemaDiff(object):
+    # Changes between two type registries. types holds the names of types whose
+    # own shape changed (so every selection of them changes), fields holds
+    # "Type.field" for every added, removed or changed field.
+    def __init__(self):
+        self.changes = []
+        self.types = set()
+        self.fields = set()
+
+    def add(self, change, kind, path, detail=None):
+        self.changes.append((change, kind, path, detail))
+
+    def is_empty(self):
+        return len(self.changes) == 0
+
+    def is_affected(self, dependencies):
+        fields, types = dependencies
+        return not self.fields.isdisjoint(fields) or not self.types.isdisjoint(types)
+
+    def __str__(self):
+        marks = {ADDED: "+", REMOVED: "-", CHANGED: "~"}
+        lines = []
+        for change, kind, path, detail in self.changes:
+            line = "%s %s %s" % (marks[change], kind, path)
+            if detail is not None:
+                line = "%s: %s" % (line, detail)
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def get_signature(node):
+    return None if node.type is None else node.type.signature
+
+
+def diff_members(diff, kind, path, old, new, describe):
+    for name in old.keys():
+        if name not in new.keys():
+            diff.add(REMOVED, kind, "%s.%s" % (path, name))
+    for name, member in new.items():
+        if name not in old.keys():
+            diff.add(ADDED, kind, "%s.%s" % (path, name))
+        elif describe(old[name]) != describe(member):
+            diff.add(CHANGED, kind, "%s.%s" % (path, name), "%s -> %s" % (describe(old[name]), describe(member)))
+
+
+def describe_input(node):
+    if node.default_value is None:
+        return get_signature(node)
+    return "%s = %s" % (get_signature(node), node.default_value)
+
+
+def diff_field(diff, owner, old, new):
+    path = "%s.%s" % (owner, new.name)
+    changed = len(diff.changes)
+
+    if get_signature(old) != get_signature(new):
+        diff.add(CHANGED, "field", path, "%s -> %s" % (get_signature(old), get_signature(new)))
+    diff_members(diff, "argument", path, old.args, new.args, describe_input)
+
+    if len(diff.changes) > changed:
+        diff.fields.add(path)
+
+
+def diff_type(diff, old, new):
+    changed = len(diff.changes)
+
+    if old.kind != new.kind:
+        diff.add(CHANGED, "type", new.name, "%s -> %s" % (old.kind, new.kind))
+
+    for name in old.enum_values.keys():
+        if name not in new.enum_values.keys():
+            diff.add(REMOVED, "enum value", "%s.%s" % (new.name, name))
+    for name in new.enum_values.keys():
+        if name not in old.enum_values.keys():
+            diff.add(ADDED, "enum value", "%s.%s" % (new.name, name))
+
+    diff_members(diff, "input field", new.name, old.input_fields, new.input_fields, describe_input)
+
+    old_possible = sorted([t.name for t in old.possible_types])
+    new_possible = sorted([t.name for t in new.possible_types])
+    if old_possible != new_possible:
+        diff.add(CHANGED, "possible types", new.name, "%s -> %s" % (", ".join(old_possible), ", ".join(new_possible)))
+
+    for name in old.fields.keys():
+        if name not in new.fields.keys():
+            diff.add(REMOVED, "field", "%s.%s" % (new.name, name))
+            diff.fields.add("%s.%s" % (new.name, name))
+
+    if len(diff.changes) > changed:
+        diff.types.add(new.name)
+
+    for name, field in new.fields.items():
+        if name not in old.fields.keys():
+            diff.add(ADDED, "field", "%s.%s" % (new.name, name))
+            diff.fields.add("%s.%s" % (new.name, name))
+        else:
+            diff_field(diff, new.name, old.fields[name], field)
+
+
+def diff_types(old, new):
+    diff = SchemaDiff()
+    for name in old.keys():
+        if name not in new.keys():
+            diff.add(REMOVED, "type", name)
+            diff.types.add(name)
+
+    for name, otype in new.items():
+        if name not in old.keys():
+            diff.add(ADDED, "type", name)
+            diff.types.add(name)
+        else:
+            diff_type(diff, old[name], otype)
+
+    return diff
+
+
+def add_input_dependencies(otype, types, dependencies):
+    if otype.name in dependencies or otype.kind not in ["ENUM", "INPUT_OBJECT", "SCALAR"]:
+        return
+
+    dependencies.add(otype.name)
+    if otype.kind == "INPUT_OBJECT" and otype.name in types.keys():
+        for ifield in types[otype.name].input_fields.values():
+            add_input_dependencies(ifield.type, types, dependencies)
+
+
+def add_selection_dependencies(otype, selection, types, fields, dependencies):
+    dependencies.add(otype.name)
+    for name, field, children in selection:
+        if field is None:
+            continue
+
+        fields.add("%s.%s" % (otype.name, name))
+        dependencies.add(field.type.name)
+        if children is not None:
+            add_selection_dependencies(types[field.type.name], children, types, fields, dependencies)
+
+
+def get_query_dependencies(test_query, types):
+    # fields and types a planned query's document, variables and validation rely on
+    fields = set()
+    dependencies = set()
+
+    owner = types["Query"]
+    field = None
+    for name in test_query.query_data.path:
+        field = owner.fields[name]
+        fields.add("%s.%s" % (owner.name, name))
+        for arg in field.args.values():
+            add_input_dependencies(arg.type, types, dependencies)
+
+        if not field.is_leaf_type(field.type):
+            owner = types[field.type.name]
+
+    if field.is_leaf_type(field.type):
+        dependencies.add(field.type.name)
+    else:
+        add_selection_dependencies(owner, owner.get_selection_tree(types), types, fields, dependencies)
+
+    return fields, dependencies
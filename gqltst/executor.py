@@ -0,0 +1,262 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from gqltst import tracing
+from gqltst.batch import RESEND
+from gqltst.metrics import RequestTiming
+
+
+class ExecutionResult(object):
+    def __init__(self, query, values=None, source=None):
+        self.query = query
+        self.values = values
+        self.source = source
+
+        self.status = None
+        self.data = None
+        self.errors = None
+        self.error = None
+        self.elapsed = None
+        self.timing = None
+        self.validation = []
+
+    def to_dict(self):
+        return {
+            "query": self.query,
+            "values": self.values,
+            "status": self.status,
+            "data": self.data,
+            "errors": self.errors,
+            "error": self.error,
+            "elapsed": self.elapsed,
+        }
+
+    @staticmethod
+    def from_dict(data, source=None):
+        result = ExecutionResult(data["query"], data["values"], source)
+        for key in ["status", "data", "errors", "error", "elapsed"]:
+            setattr(result, key, data[key])
+        return result
+
+    @property
+    def success(self):
+        return self.error is None and self.status == 200 and not self.errors and not self.validation
+
+    def __str__(self):
+        if self.success:
+            return "OK [%.3fs] %s" % (self.elapsed, self.query)
+
+        if self.error is not None:
+            reason = self.error
+        elif self.errors:
+            reason = "; ".join([str(e.get("message", e)) if type(e) == dict else str(e) for e in self.errors])
+        elif self.validation:
+            reason = "; ".join([str(v) for v in self.validation])
+        else:
+            reason = "HTTP %s" % self.status
+
+        return "FAIL [%s] %s" % (reason, self.query)
+
+
+class Executor(object):
+    def __init__(self, url, headers={}, max_in_flight=10, timeout=30, keepalive_timeout=60, batcher=None,
+                 limiter=None):
+        if max_in_flight < 1:
+            raise Exception("max_in_flight must be positive, got %s" % max_in_flight)
+
+        self.url = url
+        self.headers = headers
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.batcher = batcher
+        # max_in_flight stays the hard cap, the limiter moves below it
+        self.limiter = limiter
+        if limiter is not None:
+            limiter.max_limit = min(limiter.max_limit, max_in_flight)
+            limiter.set_value(limiter.value)
+
+    def get_limit(self):
+        if self.limiter is None:
+            return self.max_in_flight
+        return self.limiter.limit
+
+    def on_sample(self, results, in_flight):
+        # one sample per HTTP request, a batch shares its status and timing
+        result = results[0]
+        timing = result.timing
+        rtt = result.elapsed if timing is None or timing.total is None else timing.total
+        retry_after = None if timing is None else timing.retry_after
+        self.limiter.on_sample(rtt, in_flight, result.status, result.error, retry_after)
+
+    def create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=self.keepalive_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                     trace_configs=[self.create_trace_config()])
+
+    def create_trace_config(self):
+        async def on_connection_create_start(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.connect_started = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            timing = context.trace_request_ctx
+            if timing is not None and timing.connect_started is not None:
+                timing.connect = time.perf_counter() - timing.connect_started
+
+        async def on_request_end(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.ttfb = time.perf_counter() - context.trace_request_ctx.started
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def get_payload(self, query):
+        if type(query) == dict:
+            return query
+        return {"query": query}
+
+    async def post(self, session, payload, timing=None):
+        # headers and timeout go with every request so one session can serve several endpoints
+        async with session.post(self.url, json=payload, headers=self.headers, trace_request_ctx=timing,
+                                timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            status = response.status
+            body = await response.read()
+
+        if timing is not None:
+            timing.retry_after = response.headers.get("Retry-After")
+            timing.finish(len(body))
+
+        return status, body
+
+    async def send(self, session, query, values=None, source=None):
+        result = ExecutionResult(query, values, source)
+
+        with tracing.span("send", "http", True) as span:
+            started = time.perf_counter()
+            result.timing = RequestTiming()
+            try:
+                result.status, body = await self.post(session, self.get_payload(query), result.timing)
+
+                content = json.loads(body)
+                if type(content) == dict:
+                    result.data = content.get("data")
+                    result.errors = content.get("errors")
+                else:
+                    result.error = "Unexpected response %s" % type(content).__name__
+            except asyncio.TimeoutError:
+                result.error = "Timeout after %ss" % self.timeout
+            except aiohttp.ClientError as e:
+                result.error = "%s: %s" % (type(e).__name__, e)
+            except ValueError:
+                result.error = "Invalid JSON response (HTTP %s)" % result.status
+            result.elapsed = time.perf_counter() - started
+
+            span.set("status", result.status)
+            if result.error is not None:
+                span.set("error", result.error)
+
+        return result
+
+    async def send_batch(self, session, items):
+        if len(items) == 1:
+            return [await self.send(session, *items[0])]
+
+        results = [ExecutionResult(*item) for item in items]
+
+        with tracing.span("send_batch", "http", True, size=len(items)) as span:
+            started = time.perf_counter()
+            timing = RequestTiming()
+            status = None
+            try:
+                status, body = await self.post(session, self.batcher.merge(items), timing)
+                parts = self.batcher.split(status, json.loads(body), items)
+            except asyncio.TimeoutError:
+                parts = "Timeout after %ss" % self.timeout
+            except aiohttp.ClientError as e:
+                parts = "%s: %s" % (type(e).__name__, e)
+            except ValueError:
+                parts = "Invalid JSON response (HTTP %s)" % status
+            elapsed = time.perf_counter() - started
+            span.set("status", status)
+
+        if parts is None or parts == RESEND:
+            # the server does not support the batch: shrink further batches and retry every case alone
+            if parts is None:
+                self.batcher.reject()
+            return await asyncio.gather(*[self.send(session, *item) for item in items])
+
+        for i, result in enumerate(results):
+            result.status = status
+            result.elapsed = elapsed
+            result.timing = timing
+            if type(parts) == str:
+                result.error = parts
+            else:
+                result.data, result.errors = parts[i]
+
+        return results
+
+    async def execute(self, queries, session=None):
+        # queries yields (query, values) pairs as produced by TestQuery.get_query,
+        # optionally extended with a third "source" item which is kept on the result
+        own_session = session is None
+        if own_session:
+            session = self.create_session()
+
+        if self.batcher is None:
+            source = ([item] for item in queries)
+        else:
+            source = self.batcher.group(queries)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                delay = 0.0 if self.limiter is None else self.limiter.get_delay()
+                while not exhausted and delay == 0.0 and len(pending) < self.get_limit():
+                    try:
+                        batch = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self.send_batch(session, batch)))
+
+                if len(pending) == 0:
+                    if exhausted:
+                        break
+                    # paused by Retry-After with nothing left in flight
+                    await asyncio.sleep(delay)
+                    continue
+
+                in_flight = len(pending)
+                done, pending = await asyncio.wait(pending, timeout=delay or None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results = task.result()
+                    if self.limiter is not None:
+                        self.on_sample(results, in_flight)
+                    for result in results:
+                        yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            if own_session:
+                await session.close()
+
+    def run(self, queries, callback=None):
+        async def runner():
+            results = []
+            async for result in self.execute(queries):
+                if callback is None:
+                    results.append(result)
+                else:
+                    callback(result)
+            return results
+
+        return asyncio.run(runner())
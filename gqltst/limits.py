@@ -0,0 +1,192 @@
+import math
+import time
+from collections import OrderedDict
+
+AIMD = "aimd"
+GRADIENT = "gradient"
+
+RETRY_STATUSES = [429, 503]
+
+
+def get_retry_after(value):
+    # only the delay-seconds form; HTTP dates fall back to the default backoff
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class LimiterMetrics(object):
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.completed = 0
+        self.drops = 0
+        self.limits = []
+        self.backoffs = []
+
+    def record_limit(self, limit):
+        if len(self.limits) == 0 or self.limits[-1][1] != limit:
+            self.limits.append((time.perf_counter() - self.started, limit))
+
+    def record_backoff(self, reason, limit, delay=0.0):
+        self.backoffs.append((time.perf_counter() - self.started, reason, limit, delay))
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        limits = [limit for _, limit in self.limits]
+
+        reasons = OrderedDict()
+        for _, reason, _, _ in self.backoffs:
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+        output = OrderedDict()
+        output["limit"] = limits[-1] if len(limits) > 0 else None
+        output["min_limit"] = min(limits) if len(limits) > 0 else None
+        output["max_limit"] = max(limits) if len(limits) > 0 else None
+        output["completed"] = self.completed
+        output["throughput"] = self.completed / elapsed if elapsed > 0 else 0.0
+        output["drops"] = self.drops
+        output["backoffs"] = reasons
+        return output
+
+
+class Limiter(object):
+    # Concurrency limit adjusted from completed requests. A drop (429, 5xx,
+    # timeout or connection error) always shrinks the limit; Retry-After also
+    # pauses new requests until it expires. Subclasses implement
+    # on_success(rtt, in_flight) and on_drop().
+    def __init__(self, initial=10, min_limit=1, max_limit=200, backoff=1.0):
+        self.value = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.paused_until = 0.0
+        self.metrics = LimiterMetrics()
+        self.metrics.record_limit(self.limit)
+
+    @property
+    def limit(self):
+        return int(self.value)
+
+    def get_delay(self):
+        return max(0.0, self.paused_until - time.perf_counter())
+
+    def set_value(self, value):
+        self.value = min(max(value, self.min_limit), self.max_limit)
+        self.metrics.record_limit(self.limit)
+
+    def pause(self, delay):
+        self.paused_until = max(self.paused_until, time.perf_counter() + delay)
+
+    def get_drop_reason(self, status, error):
+        if error is not None:
+            return "error"
+        if status in RETRY_STATUSES or (status is not None and status >= 500):
+            return "HTTP %s" % status
+        return None
+
+    def on_sample(self, rtt, in_flight, status=None, error=None, retry_after=None):
+        self.metrics.completed += 1
+
+        reason = self.get_drop_reason(status, error)
+        if reason is None:
+            self.on_success(rtt, in_flight)
+            return
+
+        self.metrics.drops += 1
+        self.on_drop()
+
+        delay = 0.0
+        if status in RETRY_STATUSES:
+            delay = get_retry_after(retry_after)
+            if delay is None:
+                delay = self.backoff
+            self.pause(delay)
+        self.metrics.record_backoff(reason, self.limit, delay)
+
+
+class AIMDLimiter(Limiter):
+    # Additive increase while the limit is actually used, multiplicative
+    # decrease on drops or when a request is slower than latency_threshold.
+    # Without a threshold it is latency_ratio times a slowly moving baseline
+    # RTT, seeded by the first sample as in the gradient limiter.
+    def __init__(self, initial=10, min_limit=1, max_limit=200, backoff=1.0, backoff_ratio=0.9,
+                 latency_threshold=None, latency_ratio=2.0, long_window=600):
+        super(AIMDLimiter, self).__init__(initial, min_limit, max_limit, backoff)
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+        self.latency_ratio = latency_ratio
+        self.long_factor = 2.0 / (long_window + 1)
+        self.long_rtt = None
+
+    def get_latency_threshold(self, rtt):
+        if self.latency_threshold is not None:
+            return self.latency_threshold
+        if self.long_rtt is None:
+            self.long_rtt = rtt
+        threshold = self.long_rtt * self.latency_ratio
+        self.long_rtt += (rtt - self.long_rtt) * self.long_factor
+        return threshold
+
+    def on_success(self, rtt, in_flight):
+        if rtt > self.get_latency_threshold(rtt):
+            self.set_value(self.value * self.backoff_ratio)
+            self.metrics.record_backoff("latency", self.limit)
+        elif in_flight * 2 >= self.limit:
+            self.set_value(self.value + 1.0 / max(1, self.limit))
+
+    def on_drop(self):
+        self.set_value(self.value * self.backoff_ratio)
+
+
+class GradientLimiter(Limiter):
+    # Compares a short-term RTT average with a slowly moving long-term one:
+    # while they match the limit grows by a queue allowance of sqrt(limit),
+    # a rising short-term RTT scales it down by long/short (at most by half).
+    def __init__(self, initial=10, min_limit=1, max_limit=200, backoff=1.0, smoothing=0.2, tolerance=1.5,
+                 long_window=600, short_window=10, backoff_ratio=0.9):
+        super(GradientLimiter, self).__init__(initial, min_limit, max_limit, backoff)
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.long_factor = 2.0 / (long_window + 1)
+        self.short_factor = 2.0 / (short_window + 1)
+        self.backoff_ratio = backoff_ratio
+        self.long_rtt = None
+        self.short_rtt = None
+
+    def on_success(self, rtt, in_flight):
+        if self.long_rtt is None:
+            self.long_rtt = rtt
+            self.short_rtt = rtt
+            return
+
+        self.short_rtt += (rtt - self.short_rtt) * self.short_factor
+        self.long_rtt += (rtt - self.long_rtt) * self.long_factor
+
+        # let the baseline recover quickly once latency falls back
+        if self.long_rtt / self.short_rtt > 2:
+            self.long_rtt *= 0.95
+
+        # an idle limit says nothing about capacity
+        if in_flight < self.limit / 2.0:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        target = self.value * gradient + math.sqrt(self.value)
+        self.set_value(self.value * (1 - self.smoothing) + target * self.smoothing)
+        if gradient < 1.0:
+            self.metrics.record_backoff("latency", self.limit)
+
+    def on_drop(self):
+        self.set_value(self.value * self.backoff_ratio)
+
+
+def get_limiter(mode, max_limit=200, initial=10):
+    if mode == AIMD:
+        return AIMDLimiter(initial, max_limit=max_limit)
+    elif mode == GRADIENT:
+        return GradientLimiter(initial, max_limit=max_limit)
+    else:
+        raise Exception("Unknown concurrency limiter %s" % mode)
@@ -0,0 +1,194 @@
+import asyncio
+import bisect
+import itertools
+import random
+import time
+from collections import OrderedDict
+
+from gqltst.metrics import Histogram, PERCENTILES
+
+
+class RateProfile(object):
+    # Requests per second at a given moment: constant, or a linear ramp from
+    # rate to ramp_to over the first ramp seconds, then held at ramp_to.
+    def __init__(self, rate, ramp_to=None, ramp=0):
+        if rate <= 0 or (ramp_to is not None and ramp_to <= 0):
+            raise Exception("Request rate must be positive, got %s" % (rate if rate <= 0 else ramp_to))
+
+        self.rate = float(rate)
+        self.ramp_to = float(rate if ramp_to is None else ramp_to)
+        self.ramp = ramp
+
+    def get_rate(self, offset):
+        if self.ramp <= 0 or offset >= self.ramp:
+            return self.ramp_to
+        return self.rate + (self.ramp_to - self.rate) * offset / self.ramp
+
+    def get_schedule(self, duration):
+        # intended send offsets, independent of how fast the server answers
+        offset = 0.0
+        while offset < duration:
+            yield offset
+            offset += 1.0 / self.get_rate(offset)
+
+
+class LoadCorpus(object):
+    # Requests from Schema.get_requests grouped by root field; next() draws a
+    # root field by weight and cycles through its requests.
+    def __init__(self, requests, weights=None, seed=0):
+        self.requests = OrderedDict()
+        for item in requests:
+            self.requests.setdefault(item[2].query_data.path[0], []).append(item)
+
+        if weights is None:
+            weights = {}
+        for field in weights.keys():
+            if field not in self.requests.keys():
+                raise Exception("No queries for root field %s" % field)
+
+        self.fields = [f for f in self.requests.keys() if weights.get(f, 1) > 0]
+        if len(self.fields) == 0:
+            raise Exception("Load corpus is empty")
+
+        self.cumulative = list(itertools.accumulate([weights.get(f, 1) for f in self.fields]))
+        self.cycles = dict([(f, itertools.cycle(self.requests[f])) for f in self.fields])
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return sum([len(r) for r in self.requests.values()])
+
+    def next(self):
+        point = self.random.random() * self.cumulative[-1]
+        field = self.fields[bisect.bisect_right(self.cumulative, point)]
+        return field, next(self.cycles[field])
+
+
+class LoadWindow(object):
+    def __init__(self, start, target):
+        self.start = start
+        self.target = target
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.latency = Histogram()
+
+    def to_dict(self, length):
+        output = OrderedDict()
+        output["start"] = self.start
+        output["target_rps"] = self.target
+        output["sent"] = self.sent
+        output["throughput"] = self.completed / float(length)
+        output["errors"] = self.errors
+        output["error_rate"] = self.errors / float(self.completed) if self.completed > 0 else 0.0
+        output["dropped"] = self.dropped
+        output["latency"] = self.latency.summary()
+        return output
+
+
+class LoadReport(object):
+    # Latency is measured from the intended send time, so a server (or client)
+    # falling behind shows up as latency instead of silently lowering the rate.
+    def __init__(self, profile, window=1.0):
+        self.profile = profile
+        self.window = window
+        self.windows = []
+        self.fields = OrderedDict()
+        self.latency = Histogram()
+
+    def get_window(self, offset):
+        index = int(offset // self.window)
+        while len(self.windows) <= index:
+            start = len(self.windows) * self.window
+            self.windows.append(LoadWindow(start, self.profile.get_rate(start)))
+        return self.windows[index]
+
+    def sent(self, offset):
+        self.get_window(offset).sent += 1
+
+    def dropped(self, offset):
+        self.get_window(offset).dropped += 1
+
+    def record(self, field, offset, latency, success):
+        window = self.get_window(offset)
+        window.completed += 1
+        window.latency.record(latency * 1000000)
+        self.latency.record(latency * 1000000)
+
+        if field not in self.fields.keys():
+            self.fields[field] = Histogram()
+        self.fields[field].record(latency * 1000000)
+
+        if not success:
+            window.errors += 1
+
+    def to_dict(self):
+        output = OrderedDict()
+        output["window"] = self.window
+        output["windows"] = [w.to_dict(self.window) for w in self.windows]
+        output["latency"] = self.latency.summary()
+        output["fields"] = OrderedDict([(f, h.summary()) for f, h in self.fields.items()])
+        return output
+
+    def format(self):
+        lines = ["%8s %8s %8s %8s %8s %10s %10s %10s" % ("time s", "target", "rps", "errors", "dropped",
+                                                          "p50 ms", "p95 ms", "p99 ms")]
+        for window in self.windows:
+            values = [window.latency.percentile(p) for p in PERCENTILES]
+            error_rate = window.errors / float(window.completed) if window.completed > 0 else 0.0
+            lines.append("%8.1f %8.1f %8.1f %7.1f%% %8d %s" % (window.start, window.target,
+                                                              window.completed / float(self.window),
+                                                              error_rate * 100, window.dropped,
+                                                              " ".join(["%10.1f" % ((v or 0) / 1000.0)
+                                                                        for v in values])))
+        return "\n".join(lines)
+
+
+class LoadRunner(object):
+    def __init__(self, executor, corpus, profile, duration, window=1.0, max_outstanding=1000):
+        self.executor = executor
+        self.corpus = corpus
+        self.profile = profile
+        self.duration = duration
+        self.max_outstanding = max_outstanding
+        self.report = LoadReport(profile, window)
+
+    async def fire(self, session, started, intended, field, item):
+        result = await self.executor.send(session, *item)
+        completed = time.perf_counter()
+        self.report.record(field, completed - started, completed - intended, result.success)
+
+    async def execute(self):
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        session = self.executor.create_session()
+        try:
+            started = time.perf_counter()
+            for offset in self.profile.get_schedule(self.duration):
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                field, item = self.corpus.next()
+                self.report.sent(offset)
+                if len(pending) >= self.max_outstanding:
+                    # never block the schedule on slow responses, shed the request instead
+                    self.report.dropped(offset)
+                    continue
+
+                task = loop.create_task(self.fire(session, started, started + offset, field, item))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if len(pending) > 0:
+                await asyncio.wait(pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            await session.close()
+
+        return self.report
+
+    def run(self):
+        return asyncio.run(self.execute())
@@ -0,0 +1,237 @@
+import time
+from collections import OrderedDict
+
+PERCENTILES = [50, 95, 99]
+
+
+class Histogram(object):
+    # HDR-style log-linear histogram over non-negative integers: values below
+    # 2^precision are exact, above that each power of two is split into
+    # 2^(precision - 1) buckets, keeping the relative error under 2^(1 - precision).
+    def __init__(self, precision=8):
+        self.precision = precision
+        self.sub_count = 1 << precision
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def get_index(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.precision
+        return (shift << self.precision) + (value >> shift)
+
+    def get_value(self, index):
+        # highest value that falls into the bucket
+        if index < self.sub_count:
+            return index
+        shift = index >> self.precision
+        mantissa = index & (self.sub_count - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = max(0, int(value))
+        index = self.get_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise Exception("Unable to merge histograms with precision %s and %s" % (self.precision, other.precision))
+
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percent):
+        if self.count == 0:
+            return None
+
+        target = max(1, int(round(self.count * percent / 100.0 + 0.4999999)))
+        seen = 0
+        for index in sorted(self.counts.keys()):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.get_value(index), self.max)
+
+        return self.max
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / float(self.count)
+
+    def summary(self):
+        output = OrderedDict()
+        output["count"] = self.count
+        output["min"] = self.min
+        output["mean"] = self.mean()
+        for percent in PERCENTILES:
+            output["p%d" % percent] = self.percentile(percent)
+        output["max"] = self.max
+        return output
+
+    def to_dict(self):
+        output = self.summary()
+        output["precision"] = self.precision
+        output["total"] = self.total
+        output["buckets"] = [[index, count] for index, count in sorted(self.counts.items())]
+        return output
+
+    @staticmethod
+    def from_dict(data):
+        histogram = Histogram(data["precision"])
+        for index, count in data["buckets"]:
+            histogram.counts[index] = count
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class RequestTiming(object):
+    # Filled by the executor's aiohttp trace hooks; connect is 0 for a reused
+    # keep-alive connection. retry_after keeps the raw Retry-After header.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect_started = None
+        self.connect = 0.0
+        self.ttfb = None
+        self.total = None
+        self.size = None
+        self.retry_after = None
+
+    def finish(self, size):
+        self.total = time.perf_counter() - self.started
+        self.size = size
+
+
+class LatencyGroup(object):
+    METRICS = ["connect", "ttfb", "total"]
+
+    def __init__(self):
+        self.histograms = OrderedDict()
+        for metric in self.METRICS:
+            self.histograms[metric] = Histogram()
+        self.histograms["size"] = Histogram()
+        self.errors = 0
+
+    def record(self, timing, success=True):
+        for metric in self.METRICS:
+            value = getattr(timing, metric)
+            if value is not None:
+                self.histograms[metric].record(value * 1000000)
+        if timing.size is not None:
+            self.histograms["size"].record(timing.size)
+        if not success:
+            self.errors += 1
+
+    def merge(self, other):
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+        self.errors += other.errors
+
+    def to_dict(self, buckets=False):
+        output = OrderedDict()
+        output["errors"] = self.errors
+        for name, histogram in self.histograms.items():
+            output[name] = histogram.to_dict() if buckets else histogram.summary()
+        return output
+
+    @staticmethod
+    def from_dict(data):
+        group = LatencyGroup()
+        group.errors = data["errors"]
+        for name in group.histograms.keys():
+            group.histograms[name] = Histogram.from_dict(data[name])
+        return group
+
+
+def get_query_key(source):
+    if source is None:
+        return "unknown"
+    return ".".join(source.query_data.path)
+
+
+def get_shape_key(source, values):
+    if source is None or values is None:
+        return get_query_key(source)
+
+    present = [key[1:] for key, value in zip(source.query_data.variables.keys(), values) if value is not None]
+    return "%s(%s)" % (get_query_key(source), ", ".join(present))
+
+
+class LatencyReport(object):
+    # Latency (microseconds) and response size (bytes) per root field,
+    # per planned query and per argument shape, i.e. the set of arguments sent.
+    def __init__(self):
+        self.fields = OrderedDict()
+        self.queries = OrderedDict()
+        self.shapes = OrderedDict()
+
+    def get_group(self, groups, key):
+        if key not in groups.keys():
+            groups[key] = LatencyGroup()
+        return groups[key]
+
+    def record(self, result):
+        if result.timing is None:
+            return
+
+        source = result.source
+        field = "unknown" if source is None else source.query_data.path[0]
+        for groups, key in [(self.fields, field),
+                            (self.queries, get_query_key(source)),
+                            (self.shapes, get_shape_key(source, result.values))]:
+            self.get_group(groups, key).record(result.timing, result.success)
+
+    def merge(self, other):
+        for name in ["fields", "queries", "shapes"]:
+            groups = getattr(self, name)
+            for key, group in getattr(other, name).items():
+                self.get_group(groups, key).merge(group)
+
+    def to_dict(self, buckets=False):
+        output = OrderedDict()
+        for name in ["fields", "queries", "shapes"]:
+            output[name] = OrderedDict([(k, g.to_dict(buckets)) for k, g in getattr(self, name).items()])
+        return output
+
+    @staticmethod
+    def from_dict(data):
+        report = LatencyReport()
+        for name in ["fields", "queries", "shapes"]:
+            groups = getattr(report, name)
+            for key, group in data[name].items():
+                groups[key] = LatencyGroup.from_dict(group)
+        return report
+
+    def format(self, groups=None, limit=20):
+        if groups is None:
+            groups = self.fields
+
+        lines = ["%-50s %8s %10s %10s %10s %10s %10s" % ("", "count", "p50 ms", "p95 ms", "p99 ms", "max ms",
+                                                          "p99 bytes")]
+        rows = sorted(groups.items(), key=lambda i: i[1].histograms["total"].percentile(99) or 0, reverse=True)
+        for key, group in rows[:limit]:
+            total = group.histograms["total"]
+            values = [total.percentile(p) for p in PERCENTILES] + [total.max]
+            lines.append("%-50s %8d %s %10s" % (key[:50], total.count,
+                                                " ".join(["%10.1f" % ((v or 0) / 1000.0) for v in values]),
+                                                group.histograms["size"].percentile(99)))
+        return "\n".join(lines)
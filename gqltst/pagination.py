@@ -0,0 +1,259 @@
+import math
+from collections import OrderedDict
+
+from gqltst.combinations import EXHAUSTIVE
+
+# fewer points than this above the noise floor give no exponent worth flagging
+MIN_FIT_POINTS = 3
+
+
+def get_page_sizes(maximum=1000, steps=(1, 2, 5)):
+    # 1, 2, 5, 10, 20, 50, ... so every decade has several points to fit
+    sizes = []
+    decade = 1
+    while decade <= maximum:
+        sizes.extend([decade * step for step in steps if decade * step <= maximum])
+        decade *= 10
+    return sizes
+
+
+def fit_power_law(points):
+    # least squares on log y = log a + b log x, returns (b, a)
+    points = [(x, y) for x, y in points if x > 0 and y > 0]
+    if len(set([x for x, _ in points])) < 2:
+        return None, None
+
+    xs = [math.log(x) for x, _ in points]
+    ys = [math.log(y) for _, y in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    slope = sum([(x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)]) / sum([(x - mean_x) ** 2 for x in xs])
+    return slope, math.exp(mean_y - slope * mean_x)
+
+
+def get_median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2 == 1:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def get_page_items(data, path):
+    # number of edges the connection at path returned, None if not selected
+    node = data
+    for name in path:
+        while type(node) == list:
+            if len(node) == 0:
+                return None
+            node = node[0]
+        if type(node) != dict or node.get(name) is None:
+            return None
+        node = node[name]
+
+    if type(node) != dict or type(node.get("edges")) != list:
+        return None
+    return len(node["edges"])
+
+
+class ScalingPoint(object):
+    def __init__(self, size):
+        self.size = size
+        self.latency = []
+        self.bytes = []
+        self.items = []
+        self.errors = 0
+
+    def record(self, result, path):
+        if not result.success:
+            self.errors += 1
+            return
+
+        self.latency.append(result.timing.total if result.timing.total is not None else result.elapsed)
+        self.bytes.append(result.timing.size or 0)
+        items = get_page_items(result.data, path)
+        if items is not None:
+            self.items.append(items)
+
+    def get_x(self):
+        # a server capping the page size returns fewer edges than asked for
+        if len(self.items) > 0:
+            return max(get_median(self.items), 1)
+        return self.size
+
+    def to_dict(self):
+        output = OrderedDict()
+        output["size"] = self.size
+        output["items"] = get_median(self.items) if len(self.items) > 0 else None
+        output["latency"] = min(self.latency) if len(self.latency) > 0 else None
+        output["bytes"] = get_median(self.bytes) if len(self.bytes) > 0 else None
+        output["samples"] = len(self.latency)
+        output["errors"] = self.errors
+        return output
+
+
+class ConnectionScaling(object):
+    # Latency and response size of one connection paged in one direction.
+    # The latency added over the smallest page is fitted to a * items^b, so
+    # the fixed per-request cost does not flatten the curve. Increments
+    # below min_increase or below the spread of their own repeats are noise
+    # and distort a log-log fit, so the flag uses only the pages above that
+    # floor and needs MIN_FIT_POINTS of them: a batched resolver stays around
+    # 1, work per item that grows with the page (N+1 lookups, nested fetches)
+    # pushes it towards 2.
+    def __init__(self, path, direction, sizes, min_increase=0.002):
+        self.path = path
+        self.direction = direction
+        self.min_increase = min_increase
+        self.points = OrderedDict([(size, ScalingPoint(size)) for size in sizes])
+
+    @property
+    def name(self):
+        return "%s(%s)" % (".".join(self.path), self.direction)
+
+    def record(self, size, result):
+        self.points[size].record(result, self.path)
+
+    def get_measured(self):
+        return [p for p in self.points.values() if len(p.latency) > 0]
+
+    def get_latency_fit(self, significant=False):
+        measured = sorted(self.get_measured(), key=lambda p: p.get_x())
+        if len(measured) < 2:
+            return None, None
+
+        x0, y0 = measured[0].get_x(), min(measured[0].latency)
+        points = [(p.get_x() - x0, min(p.latency) - y0) for p in measured[1:]]
+        if significant:
+            points = [(x, y) for (x, y), p in zip(points, measured[1:])
+                      if y >= self.min_increase and y >= max(p.latency) - min(p.latency)]
+            if len(points) < MIN_FIT_POINTS:
+                return None, None
+        return fit_power_law(points)
+
+    def get_bytes_fit(self):
+        return fit_power_law([(p.get_x(), get_median(p.bytes)) for p in self.get_measured()])
+
+    def get_failed_sizes(self):
+        return [p.size for p in self.points.values() if len(p.latency) == 0 and p.errors > 0]
+
+    def is_super_linear(self, threshold=1.3):
+        exponent, _ = self.get_latency_fit(True)
+        return exponent is not None and exponent > threshold
+
+    def to_dict(self, threshold=1.3):
+        latency, latency_coefficient = self.get_latency_fit()
+        significant, _ = self.get_latency_fit(True)
+        size, size_coefficient = self.get_bytes_fit()
+
+        output = OrderedDict()
+        output["path"] = list(self.path)
+        output["direction"] = self.direction
+        output["points"] = [p.to_dict() for p in self.points.values()]
+        output["latency_exponent"] = latency
+        output["latency_coefficient"] = latency_coefficient
+        output["significant_exponent"] = significant
+        output["bytes_exponent"] = size
+        output["bytes_coefficient"] = size_coefficient
+        output["super_linear"] = self.is_super_linear(threshold)
+        output["failed_sizes"] = self.get_failed_sizes()
+        return output
+
+
+class PaginationReport(object):
+    def __init__(self, sizes, threshold=1.3, min_increase=0.002):
+        self.sizes = sizes
+        self.threshold = threshold
+        self.min_increase = min_increase
+        self.connections = OrderedDict()
+
+    def get(self, path, direction):
+        key = (tuple(path), direction)
+        if key not in self.connections.keys():
+            self.connections[key] = ConnectionScaling(list(path), direction, self.sizes, self.min_increase)
+        return self.connections[key]
+
+    def get_flagged(self):
+        return [c for c in self.connections.values() if c.is_super_linear(self.threshold)]
+
+    def to_dict(self):
+        output = OrderedDict()
+        output["sizes"] = self.sizes
+        output["threshold"] = self.threshold
+        output["min_increase"] = self.min_increase
+        output["connections"] = [c.to_dict(self.threshold) for c in self.connections.values()]
+        return output
+
+    def format(self):
+        name_width = max([len(c.name) for c in self.connections.values()] + [10])
+        lines = ["%-*s %s %8s %8s %8s" % (name_width, "connection",
+                                          " ".join(["%9s" % ("size %d" % s) for s in self.sizes]),
+                                          "latency^", "signif^", "bytes^")]
+        for connection in self.connections.values():
+            exponents = [connection.get_latency_fit()[0], connection.get_latency_fit(True)[0],
+                         connection.get_bytes_fit()[0]]
+            cells = []
+            for point in connection.points.values():
+                if len(point.latency) > 0:
+                    cells.append("%9.1f" % (min(point.latency) * 1000))
+                else:
+                    cells.append("%9s" % ("error" if point.errors > 0 else "-"))
+
+            line = "%-*s %s %s" % (name_width, connection.name, " ".join(cells),
+                                   " ".join(["%8s" % ("-" if e is None else "%.2f" % e) for e in exponents]))
+            if connection.is_super_linear(self.threshold):
+                line += "  SUPER-LINEAR"
+            lines.append(line)
+
+        return "\n".join(lines)
+
+
+class PaginationProbe(object):
+    # Sweeps first/last of every connection over page sizes, repeat times per
+    # size, each size with the first planned values of the other arguments.
+    # The fastest of the repeats is used, it is the least disturbed by noise.
+    def __init__(self, executor, sizes=None, repeat=3, threshold=1.3, min_increase=0.002):
+        self.executor = executor
+        self.sizes = get_page_sizes() if sizes is None else sizes
+        self.repeat = repeat
+        self.report = PaginationReport(self.sizes, threshold, min_increase)
+
+    def get_requests(self, test_query, scalars, strategy=EXHAUSTIVE, strength=None, compiled=False, seed=None):
+        variables = test_query.query_data.variables
+        names = list(variables.keys())
+        page = [names.index(key) for key in test_query.get_page_variables()]
+        if len(page) == 0:
+            return []
+
+        requests = []
+        seen = set()
+        # combinations are rendered lazily, stop once every (direction, size) was seen
+        expected = set([(variables[names[i]]["key"], size) for i in page for size in self.sizes])
+        for query, values in test_query.get_query(scalars, strategy=strategy, strength=strength, compiled=compiled,
+                                                  seed=seed, page_sizes=self.sizes):
+            sized = [(variables[names[i]]["key"], values[i]) for i in page if values[i] is not None]
+            if len(sized) != 1 or sized[0] in seen:
+                continue
+            seen.add(sized[0])
+
+            direction, size = sized[0]
+            connection = self.report.get(test_query.query_data.path, direction)
+            for _ in range(self.repeat):
+                requests.append((query, values, (connection, size)))
+
+            if expected <= seen:
+                break
+
+        return requests
+
+    def run(self, test_queries, scalars, **options):
+        requests = []
+        for test_query in test_queries:
+            requests.extend(self.get_requests(test_query, scalars, **options))
+
+        def on_result(result):
+            connection, size = result.source
+            connection.record(size, result)
+
+        self.executor.run(requests, on_result)
+        return self.report
@@ -0,0 +1,289 @@
+import argparse
+import array
+import contextlib
+import json
+import mmap
+import struct
+import sys
+from collections import OrderedDict
+
+from gqltst.canonical import Deduplicator
+from gqltst.combinations import EXHAUSTIVE
+from gqltst.executor import Executor
+from gqltst.limits import AIMD, GRADIENT, get_limiter
+from gqltst.metrics import LatencyReport
+from gqltst.query import QueryData
+from gqltst.shard import Shard
+from gqltst.validation import ValidatorCompiler
+
+# File layout: MAGIC, header length (uint64 little endian), JSON header, then
+# 8-byte aligned row tables. A row table holds, per combination, one index per
+# variable slot into that slot's list of distinct (already serialized) values.
+# The header keeps the validator spec of every planned query.
+MAGIC = b"GQLPLAN1"
+PLAN_VERSION = 2
+PREFIX = struct.Struct("<8sQ")
+
+
+def get_typecode(size):
+    for typecode in ["B", "H", "I"]:
+        if size <= 1 << (8 * array.array(typecode).itemsize):
+            return typecode
+    return "Q"
+
+
+class PlanWriter(object):
+    def __init__(self, url, strategy=EXHAUSTIVE, strength=None, seed=None):
+        self.url = url
+        self.strategy = strategy
+        self.strength = strength
+        self.seed = seed
+        self.queries = []
+        self.tables = []
+        self.size = 0
+        self.duplicates = 0
+
+    def add(self, test_query, requests):
+        slots = []
+        for key, var in test_query.query_data.variables.items():
+            slots.append(OrderedDict([
+                ("name", key),
+                ("key", var["key"]),
+                ("names", var["names"]),
+                ("type", var["node"].type.signature),
+            ]))
+
+        values = [[] for _ in slots]
+        positions = [{} for _ in slots]
+        rows = []
+        for payload, _ in requests:
+            row = []
+            for i, slot in enumerate(slots):
+                value = payload["variables"].get(slot["name"][1:])
+                value_key = json.dumps(value, sort_keys=True, default=str)
+                if value_key not in positions[i]:
+                    positions[i][value_key] = len(values[i])
+                    values[i].append(value)
+                row.append(positions[i][value_key])
+            rows.append(row)
+
+        typecode = get_typecode(max([len(v) for v in values] + [1]))
+        table = array.array(typecode, [index for row in rows for index in row]).tobytes()
+        padding = -self.size % 8
+
+        self.queries.append(OrderedDict([
+            ("path", list(test_query.query_data.path)),
+            ("document", test_query.compile()),
+            ("slots", slots),
+            ("validator", ValidatorCompiler(test_query.schema_objects, {}).get_spec(test_query)),
+            ("values", values),
+            ("rows", OrderedDict([("offset", self.size + padding), ("count", len(rows)), ("typecode", typecode)])),
+        ]))
+        self.tables.append(b"\0" * padding + table)
+        self.size += padding + len(table)
+
+    def add_schema(self, schema):
+        deduplicator = Deduplicator()
+        for test_query in schema.get_test_queries():
+            requests = test_query.get_query(schema.scalars, strategy=self.strategy, strength=self.strength,
+                                            compiled=True, seed=self.seed)
+            self.add(test_query, deduplicator.filter(requests))
+        self.duplicates += deduplicator.duplicates
+
+    def get_header(self):
+        header = OrderedDict()
+        header["version"] = PLAN_VERSION
+        header["url"] = self.url
+        header["strategy"] = self.strategy
+        header["strength"] = self.strength
+        header["seed"] = self.seed
+        header["queries"] = self.queries
+        return json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+
+    def write(self, path):
+        header = self.get_header()
+        padding = -(PREFIX.size + len(header)) % 8
+        with open(path, "wb") as fh:
+            fh.write(PREFIX.pack(MAGIC, len(header) + padding))
+            fh.write(header + b" " * padding)
+            for table in self.tables:
+                fh.write(table)
+
+
+class PlannedQuery(object):
+    # Stands in for TestQuery when executing from a plan: same query_data shape
+    # (path and variable slots) but no schema objects, responses are validated
+    # against the stored validator spec.
+    def __init__(self, data, view):
+        self.document = data["document"]
+        self.values = data["values"]
+        self.spec = data["validator"]
+        self.validator = None
+
+        self.query_data = QueryData()
+        self.query_data.path = data["path"]
+        for slot in data["slots"]:
+            self.query_data.variables[slot["name"]] = slot
+
+        rows = data["rows"]
+        width = len(data["slots"])
+        self.count = rows["count"]
+        self.width = width
+        self.rows = None
+        if width > 0 and self.count > 0:
+            size = array.array(rows["typecode"]).itemsize * self.count * width
+            self.rows = view[rows["offset"]:rows["offset"] + size].cast(rows["typecode"])
+
+    def get_values(self, index):
+        start = index * self.width
+        return [self.values[i][self.rows[start + i]] for i in range(self.width)]
+
+    def get_payload(self, values):
+        variables = {}
+        for name, value in zip(self.query_data.variables.keys(), values):
+            if value is not None:
+                variables[name[1:]] = value
+        return {"query": self.document, "variables": variables}
+
+    def get_query(self, select=None):
+        for index in range(self.count):
+            if select is None or select(index):
+                values = self.get_values(index)
+                yield self.get_payload(values), values
+
+    def validate(self, data, scalars={}):
+        if self.validator is None:
+            self.validator = ValidatorCompiler(None, scalars).compile_spec(self.spec)
+
+        return self.validator(data)
+
+
+class Plan(object):
+    # Memory-mapped plan artifact: only the JSON header is parsed on load,
+    # combination rows are read in place from the mapping.
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, "rb")
+        self.mmap = mmap.mmap(self.fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_size = PREFIX.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise Exception("%s is not a gqltst plan" % path)
+
+        header = json.loads(self.mmap[PREFIX.size:PREFIX.size + header_size].decode("utf-8"))
+        if header["version"] != PLAN_VERSION:
+            raise Exception("Unsupported plan version %s" % header["version"])
+
+        self.url = header["url"]
+        self.strategy = header["strategy"]
+        self.strength = header["strength"]
+        self.seed = header["seed"]
+
+        self.view = memoryview(self.mmap)[PREFIX.size + header_size:]
+        self.queries = [PlannedQuery(q, self.view) for q in header["queries"]]
+
+    def __len__(self):
+        return sum([q.count for q in self.queries])
+
+    def get_requests(self, shard=None):
+        for planned in self.queries:
+            select = None if shard is None else shard.get_selector(planned)
+            for payload, values in planned.get_query(select):
+                yield payload, values, planned
+
+    def close(self):
+        for planned in self.queries:
+            if planned.rows is not None:
+                planned.rows.release()
+        self.view.release()
+        self.mmap.close()
+        self.fh.close()
+
+
+def compile_plan(schema, path, strategy=EXHAUSTIVE, strength=None, seed=0):
+    writer = PlanWriter(schema.url, strategy, strength, seed)
+    writer.add_schema(schema)
+    writer.write(path)
+    return writer
+
+
+def run_plan(path, headers={}, url=None, max_in_flight=10, timeout=30, shard=None, adaptive=None, scalars={}):
+    # scalars validates custom scalar values, as registered on a Schema
+    plan = Plan(path)
+    limiter = None if adaptive is None else get_limiter(adaptive, max_in_flight)
+    executor = Executor(url or plan.url, headers, max_in_flight=max_in_flight, timeout=timeout, limiter=limiter)
+
+    results = []
+    latency = LatencyReport()
+
+    def on_result(result):
+        if result.data is not None:
+            result.validation = result.source.validate(result.data, scalars)
+        latency.record(result)
+        results.append(result)
+
+    try:
+        executor.run(plan.get_requests(shard), on_result)
+    finally:
+        # results keep their PlannedQuery, drop the views before unmapping
+        plan.close()
+
+    for result in results:
+        if not result.success:
+            print(result)
+
+    print(latency.format())
+    print("Executed %d queries, %d failed" % (len(results), len([r for r in results if not r.success])))
+    if limiter is not None:
+        summary = limiter.metrics.summary()
+        print("Concurrency limit %s (%s-%s), %.1f requests/s, %d backoffs" % (
+            summary["limit"], summary["min_limit"], summary["max_limit"], summary["throughput"],
+            sum(summary["backoffs"].values())))
+    return results, latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gqltst.plan", description="Compile or run a test plan")
+    commands = parser.add_subparsers(dest="command")
+
+    compile_parser = commands.add_parser("compile", help="introspect, plan and store every request")
+    compile_parser.add_argument("url")
+    compile_parser.add_argument("output")
+    compile_parser.add_argument("--header", action="append", default=[], help="NAME:VALUE")
+    compile_parser.add_argument("--strategy", default=EXHAUSTIVE)
+    compile_parser.add_argument("--strength", type=int)
+    compile_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="execute a compiled plan")
+    run_parser.add_argument("plan")
+    run_parser.add_argument("--url", help="override the endpoint stored in the plan")
+    run_parser.add_argument("--header", action="append", default=[], help="NAME:VALUE")
+    run_parser.add_argument("--shard", help="INDEX/COUNT")
+    run_parser.add_argument("--max-in-flight", type=int, default=10)
+    run_parser.add_argument("--timeout", type=int, default=30)
+    run_parser.add_argument("--adaptive", choices=[AIMD, GRADIENT], help="adapt concurrency below --max-in-flight")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("command is required")
+
+    headers = dict([[v.strip() for v in h.split(":", 1)] for h in args.header])
+    if args.command == "compile":
+        from gqltst.schema import Schema
+
+        with contextlib.redirect_stdout(sys.stderr):
+            schema = Schema(args.url, headers)
+            schema.prepare_queries()
+        writer = compile_plan(schema, args.output, args.strategy, args.strength, args.seed)
+        print("Stored %d queries (%d duplicates skipped) in %s" % (
+            sum([q["rows"]["count"] for q in writer.queries]), writer.duplicates, args.output))
+        return 0
+
+    shard = None if args.shard is None else Shard.parse(args.shard)
+    results, latency = run_plan(args.plan, headers, args.url, args.max_in_flight, args.timeout, shard,
+                                args.adaptive)
+    return 1 if len([r for r in results if not r.success]) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
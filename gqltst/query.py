@@ -1,5 +1,8 @@
-import copy
-from gqltst.reslovers import connection_first_resolver, connection_last_resolver
+import json
+from gqltst.reslovers import connection_first_resolver, connection_last_resolver, page_size_resolvers, seed_random
+from gqltst.combinations import EXHAUSTIVE, get_combinations
+from gqltst import tracing
+from gqltst.validation import ValidatorCompiler
 from collections import OrderedDict
 
 class QueryData(object):
@@ -11,6 +14,7 @@ class QueryData(object):
         var_name = "$%s_%s" % ("_".join([a for a in self.path]), key)
         self.variables[var_name] = {
             "path": "_".join([a for a in self.path]),
+            "names": list(self.path),
             "node": node,
             "key": key
         }
@@ -22,50 +26,153 @@ class TestQuery(object):
         self.query = query
         self.query_data = query_data
         self.schema_objects = schema_objects
+        self.compiled = None
+        self.validator = None
+
+    def get_query(self, scalars={}, args={}, validators={}, strategy=EXHAUSTIVE, strength=None, compiled=False,
+                  seed=None, select=None, page_sizes=None):
+        # seed makes the built-in resolvers draw the same values for this query on
+        # every run; select(index) skips rendering combinations owned elsewhere;
+        # page_sizes replaces the random first/last of a connection with a sweep
+        if seed is not None:
+            seed_random(seed, ".".join(self.query_data.path))
+
+        self._prepare_variables(scalars, args, page_sizes)
+
+        if tracing.TRACER is None:
+            for index, values in enumerate(self._get_variables(strategy, strength)):
+                if select is None or select(index):
+                    yield self.render(values, compiled), values
+            return
+
+        path = self.query_data.path
+        variables = tracing.trace_iterator(self._get_variables(strategy, strength), "enumerate", path=path)
+        for index, values in enumerate(variables):
+            if select is None or select(index):
+                with tracing.span("render", path=path):
+                    query = self.render(values, compiled)
+                yield query, values
+
+    def render(self, values, compiled=False):
+        # one request for the given variable values, a None value leaves the argument out
+        if compiled:
+            return self._get_payload(self.compile(), values)
+
+        prepared_variables = {}
+        for (key, var), value in zip(self.query_data.variables.items(), values):
+            if var["path"] not in prepared_variables.keys():
+                prepared_variables[var["path"]] = {}
+
+            prepared_variables[var["path"]][key] = {
+                "value": value,
+                "key": var["key"],
+                "escaped": self._escape(var, value)
+            }
+
+        return "query{%s}" % self._prepare_query(prepared_variables)
+
+    def compile(self):
+        if self.compiled is None:
+            arguments = OrderedDict()
+            definitions = []
+            for key, var in self.query_data.variables.items():
+                if var["path"] not in arguments.keys():
+                    arguments[var["path"]] = []
 
-    def get_query(self, scalars={}, args={}, validators={}):
-        tested_object = self._get_object_by_path(self.query_data.path, self.schema_objects)
-        for key, var in self.query_data.variables.items():
-            path = self._get_path_from_key(key)
+                arguments[var["path"]].append("%s: %s" % (var["key"], key))
+                definitions.append("%s: %s" % (key, var["node"].type.signature))
+
+            document = self.query
+            for path, values in arguments.items():
+                document = document.replace("($%s)" % path, "(%s)" % ", ".join(values))
+
+            if len(definitions) > 0:
+                self.compiled = "query(%s){%s}" % (", ".join(definitions), document)
+            else:
+                self.compiled = "query{%s}" % document
+
+        return self.compiled
+
+    def validate(self, data, scalars={}):
+        if self.validator is None:
+            self.validator = ValidatorCompiler(self.schema_objects, scalars).compile_query(self)
 
+        return self.validator(data)
+
+    def is_connection(self):
+        tested_object = self._get_object_by_path(list(self.query_data.path), self.schema_objects)
+        return tested_object.is_connection(self.schema_objects)
+
+    def get_page_variables(self):
+        # names of the first/last variables of the tested connection itself
+        if not self.is_connection():
+            return []
+        return [key for key, var in self.query_data.variables.items()
+                if var["names"] == self.query_data.path and var["key"] in ["first", "last"]]
+
+    def _prepare_variables(self, scalars, args, page_sizes=None):
+        first_resolver, last_resolver = connection_first_resolver, connection_last_resolver
+        if page_sizes is not None:
+            first_resolver, last_resolver = page_size_resolvers(page_sizes)
+
+        is_connection = self.is_connection()
+        for key, var in self.query_data.variables.items():
             var["resolver"] = None
 
-            if tested_object.is_connection and tested_object.name == var["path"].split("_").pop():
+            if is_connection and var["names"] == self.query_data.path:
                 if var["key"] == "first":
-                    var["resolver"] = connection_first_resolver
+                    var["resolver"] = first_resolver
                 elif var["key"] == "last":
-                    var["resolver"] = connection_last_resolver
+                    var["resolver"] = last_resolver
 
             if var["resolver"] is None:
-                next_path = copy.deepcopy(path)
+                next_path = list(var["names"])
                 next_path.append(var["key"])
                 var["resolver"] = self._get_dict_by_path(next_path, args)
 
             if var["resolver"] is None:
-                if var["node"].type in scalars.keys():
-                    var["resolver"] = scalars[var["node"].type].resolve
+                var["resolver"] = getattr(var["node"], "resolver", None)
+
+            if var["resolver"] is None:
+                if var["node"].type.name in scalars.keys():
+                    var["resolver"] = scalars[var["node"].type.name].resolve
 
             if var["resolver"] is None:
                 raise Exception("Unknown resolver %s: %s" % (key, var["node"].type))
 
-        for values in [r for r in self._get_variables(0)]:
-            prepared_variables = {}
-            i = 0
-            for key, var in self.query_data.variables.items():
-                if var["path"] not in prepared_variables.keys():
-                    prepared_variables[var["path"]] = {}
+            var["scalar"] = None
+            if var["node"].type.kind == "SCALAR" and var["node"].type.name in scalars.keys():
+                var["scalar"] = scalars[var["node"].type.name]()
+
+    def _get_payload(self, document, values):
+        variables = {}
+        for (key, var), value in zip(self.query_data.variables.items(), values):
+            if value is not None:
+                variables[key[1:]] = self._serialize(var, value)
+
+        return {"query": document, "variables": variables}
+
+    def _serialize(self, var, value):
+        if var["scalar"] is not None:
+            return var["scalar"].serialize(value)
+        return value
+
+    def _escape(self, var, value):
+        if value is None:
+            return None
+
+        if var["scalar"] is not None:
+            return var["scalar"].escape(value)
 
-                prepared_variables[var["path"]][key] = {
-                    "value": values[i],
-                    "key": var["key"],
-                    "escaped": scalars[var["node"].type].escape(values[i])
-                }
-                i += 1
+        if var["node"].type.kind == "ENUM":
+            if type(value) == list:
+                return "[%s]" % ", ".join([str(v) for v in value])
+            return str(value)
 
-            yield "query{%s}" % self._prepare_query(prepared_variables), values
+        return json.dumps(value)
 
     def _prepare_query(self, variables):
-        prepared_query = copy.deepcopy(self.query)
+        prepared_query = self.query
         for key, var in variables.items():
             value_list = []
             for varname, value in var.items():
@@ -79,22 +186,12 @@ class TestQuery(object):
 
         return prepared_query
 
-    def _get_variables(self, i, context={}):
-        if "vars" not in context.keys():
-            context["vars"] = OrderedDict()
-
-        for res in list(self.query_data.variables.values())[i]["resolver"](context):
-            context["vars"][list(self.query_data.variables.keys())[i]] = res
-            if len(self.query_data.variables.values()) > i + 1:
-                for r in self._get_variables(i+1, copy.deepcopy(context)):
-                    if type(r) is list:
-                        nr = [res]
-                        nr.extend(r)
-                        yield nr
-                    else:
-                        yield [res, r]
-            else:
-                yield [res]
+    def _get_variables(self, strategy=EXHAUSTIVE, strength=None):
+        keys = list(self.query_data.variables.keys())
+        resolvers = [var["resolver"] for var in self.query_data.variables.values()]
+
+        for prefix in get_combinations(keys, resolvers, strategy, strength):
+            yield prefix.values()
 
     def _get_path_from_key(self, key):
         return key[1:].split("_")[:-1]
@@ -119,13 +216,14 @@ class TestQuery(object):
     def _get_object_by_path(self, path, obj):
         key = path.pop(0)
 
-        if key in obj.keys():
-            obj = obj[key]
+        if key in obj["Query"].fields.keys():
+            obj = obj["Query"].fields[key]
 
             while key is not None and len(path) > 0:
                 key = path.pop(0)
-                if key in obj.fields.keys():
-                    obj = obj.fields[key]
+                fields = self.schema_objects[obj.type.name].fields
+                if key in fields.keys():
+                    obj = fields[key]
                 else:
                     return None
 
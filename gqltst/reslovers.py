@@ -1,17 +1,48 @@
 import random
+import zlib
 from datetime import datetime, timedelta
 
+# shared by all built-in resolvers so a run can be reproduced from a seed
+RANDOM = random.Random()
+
+
+def get_seed(seed, key):
+    return zlib.crc32(("%s:%s" % (seed, key)).encode("utf-8"))
+
+
+def seed_random(seed, key=None):
+    RANDOM.seed(seed if key is None else get_seed(seed, key))
+
+
 def connection_first_resolver(context):
-    for i in [None, random.randint(1, 5)]:
+    for i in [None, RANDOM.randint(1, 5)]:
         yield i
 
 def connection_last_resolver(context):
     if list(context["vars"].keys()).pop()[-5:] == "first":
         if context["vars"][list(context["vars"].keys()).pop()] is None:
-            yield random.randint(1, 5)
+            yield RANDOM.randint(1, 5)
 
     yield None
 
+def page_size_resolvers(sizes):
+    # first sweeps sizes (then None), last sweeps sizes only when first is not set
+    def first(context):
+        for i in sizes:
+            yield i
+        yield None
+
+    def last(context):
+        keys = list(context["vars"].keys())
+        if len(keys) > 0 and keys[-1][-5:] == "first" and context["vars"][keys[-1]] is not None:
+            yield None
+            return
+
+        for i in sizes:
+            yield i
+
+    return first, last
+
 def range_resolver(range=[]):
     def func(context):
         for i in range:
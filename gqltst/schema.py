@@ -1,51 +1,188 @@
+import asyncio
 import requests
-import copy
+import hashlib
+import itertools
 import json
+import sys
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from gqltst.types import SCALAR_TYPES
 from gqltst.reslovers import enum_resolver, input_object_resolver
+from gqltst.query import QueryData, TestQuery
+from gqltst.batch import get_batcher
+from gqltst.cache import iter_spool, spool_response
+from gqltst.canonical import Deduplicator
+from gqltst.coverage import Coverage, CoverageScheduler
+from gqltst.diff import diff_types, get_query_dependencies
+from gqltst.executor import ExecutionResult, Executor
+from gqltst.load import LoadCorpus, LoadRunner, RateProfile
+from gqltst.limits import get_limiter
+from gqltst.metrics import LatencyReport
+from gqltst.pagination import PaginationProbe
+from gqltst.shrink import Shrinker
+from gqltst.store import RecordingExecutor, ReplayExecutor
+from gqltst.stream import iter_types
+from gqltst import tracing
+from gqltst.combinations import EXHAUSTIVE, VariablesPrefix, get_combinations
+
+TYPE_REFS = {}
+STREAM_CHUNK_SIZE = 65536
+# object levels a generated selection descends below the queried field
+MAX_SELECTION_DEPTH = 6
+structure_query = """query IntrospectionQuery{__schema{types{kind,name,description,enumValues{name,description,isDeprecated,deprecationReason},inputFields{name,description,type{...TypeRef},defaultValue},interfaces{...TypeRef},possibleTypes{...TypeRef},fields(includeDeprecated: false){name,description,isDeprecated,deprecationReason,args{name,description,type{...TypeRef},defaultValue},type{...TypeRef}}}}} fragment TypeRef on __Type{kind,name,ofType{kind,name,ofType{kind,name,ofType{kind,name,ofType{kind,name,ofType{kind,name,ofType{kind,name,ofType{kind,name}}}}}}}}"""
+
+
+class TypeRegistry(object):
+    # Types and scalar resolvers of one schema, handed through planning and
+    # resolution so several schemas can live in one process.
+    __slots__ = ("types", "scalars")
+
+    def __init__(self, types=None, scalars=None):
+        self.types = OrderedDict() if types is None else types
+        self.scalars = dict(SCALAR_TYPES) if scalars is None else scalars
+
+
+class BoundArgument(object):
+    # A schema argument paired with the resolver chosen for one query path;
+    # the GqlArgument itself stays shared with the type registry.
+    __slots__ = ("argument", "resolver")
+
+    def __init__(self, argument, resolver):
+        self.argument = argument
+        self.resolver = resolver
+
+    @property
+    def name(self):
+        return self.argument.name
+
+    @property
+    def type(self):
+        return self.argument.type
+
+    @property
+    def default_value(self):
+        return self.argument.default_value
 
-TYPES_CACHE = {}
-structure_query = """query IntrospectionQuery{__schema{types{kindenumValues{name},name,fields(includeDeprecated: false) {name,args {name,type { ...TypeRef }defaultValue}, type { ...TypeRef }}}}} fragment TypeRef on __Type {kind,name,interfaces{name,enumValues{name,}},ofType {kind,name,interfaces{name,enumValues{name,}},ofType {kind,name,ofType {kind,name,ofType {kind,name,ofType {kind, name,ofType {kind,name,ofType {kind,name,}}}}}}}}"""
+    def __str__(self):
+        return str(self.argument)
 
 
 class QueryInfo(object):
-    def __init__(self, resolvers):
-        self.path = []
-        self.variables = OrderedDict()
+    # Persistent path node: extending a path creates a child that links to its
+    # parent, so every planning step allocates one node whatever the depth.
+    __slots__ = ("resolvers", "registry", "parent", "obj", "arguments", "depth")
+
+    def __init__(self, resolvers, registry, parent=None, obj=None):
         self.resolvers = resolvers
+        self.registry = registry
+        self.parent = parent
+        self.obj = obj
+        self.arguments = None
+
+        self.depth = 0
+        if parent is not None:
+            self.depth = parent.depth + 1
+
+        if obj is not None and len(obj.args.keys()) > 0:
+            names = self.get_names()
+            self.arguments = OrderedDict()
+            for name, arg in obj.args.items():
+                self.arguments[name] = BoundArgument(arg, arg.prepare_resolver(names + [name], resolvers, registry))
 
     def add_to_path(self, obj):
-        self.path.append(obj)
+        return QueryInfo(self.resolvers, self.registry, self, obj)
+
+    def get_nodes(self):
+        nodes = []
+        node = self
+        while node is not None and node.obj is not None:
+            nodes.append(node)
+            node = node.parent
+        nodes.reverse()
+        return nodes
+
+    def get_names(self):
+        return [node.obj.name for node in self.get_nodes()]
+
+    def has_visited(self, owner, name):
+        node = self
+        while node is not None and node.obj is not None:
+            parent = node.parent
+            node_owner = "Query" if parent is None or parent.obj is None else parent.obj.type.name
+            if node.obj.name == name and node_owner == owner:
+                return True
+            node = parent
+        return False
+
+    @property
+    def path(self):
+        return [node.obj for node in self.get_nodes()]
 
-        key = [p.name for p in self.path]
-        if len(obj.args.keys()) > 0:
-            self.variables[".".join(key)] = copy.deepcopy(obj.args)
-            for _, arg in self.variables[".".join(key)].items():
-                arg.resolver = arg.prepare_resolver(copy.deepcopy(key), self.resolvers)
+    @property
+    def variables(self):
+        variables = OrderedDict()
+        names = []
+        for node in self.get_nodes():
+            names.append(node.obj.name)
+            if node.arguments is not None:
+                variables[".".join(names)] = node.arguments
+        return variables
 
     def get_query(self):
         result_query = ""
         for item in reversed(self.path):
             if result_query == "":
-                result_query = item.get_query()
+                result_query = item.get_query(self.registry.types)
             else:
                 result_query = "%s{%s}" % (item.name, result_query)
 
         return result_query
 
+    def get_test_query(self, schema_objects):
+        query_data = QueryData()
+        path = self.path
+        variables = self.variables
+
+        for item in path:
+            query_data.path.append(item.name)
+            key = ".".join(query_data.path)
+            if key in variables.keys():
+                for name, arg in variables[key].items():
+                    query_data.get_var_name(name, arg)
+
+        result_query = ""
+        for i in reversed(range(len(path))):
+            item = path[i]
+            placeholder = ""
+            if item.is_argumented():
+                placeholder = "($%s)" % "_".join(query_data.path[:i + 1])
+
+            if result_query == "":
+                result_query = "%s%s%s" % (item.name, placeholder, item.get_selection(schema_objects))
+            else:
+                result_query = "%s%s{%s}" % (item.name, placeholder, result_query)
+
+        return TestQuery(result_query, query_data, schema_objects)
+
     def __str__(self):
         return " -> ".join([str(obj) for obj in self.path])
 
 
 class GqlScalar(object):
-    def __init__(self):
-        self.non_null = False
-        self.is_list = False
-        self.is_enum = False
-        self.kind = None
-        self.name = None
+    # Type reference of a field, argument or input field. Instances are
+    # immutable and shared: get_type_ref() returns one per signature and kind.
+    __slots__ = ("non_null", "is_list", "is_enum", "kind", "name", "signature")
+
+    def __init__(self, kind=None, name=None, non_null=False, is_list=False, is_enum=False, signature=None):
+        for key, value in [("kind", kind), ("name", name), ("non_null", non_null), ("is_list", is_list),
+                           ("is_enum", is_enum), ("signature", signature)]:
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise Exception("Type reference %s is shared and immutable" % self.signature)
+
+    def __reduce__(self):
+        return get_type_ref, (self.kind, self.name, self.non_null, self.is_list, self.is_enum, self.signature)
 
     def __str__(self):
         output = "%s: %s" % (self.name, self.kind)
@@ -59,31 +196,123 @@ class GqlScalar(object):
         return output
 
 
-class GqlObject(object):
-    def parse_type(self, data, scalar=None):
-        if scalar is None:
-            scalar = GqlScalar()
+def get_type_ref(kind, name, non_null, is_list, is_enum, signature):
+    key = (signature, kind)
+    if key not in TYPE_REFS:
+        TYPE_REFS[key] = GqlScalar(intern_name(kind), intern_name(name), non_null, is_list, is_enum,
+                                   intern_name(signature))
+    return TYPE_REFS[key]
+
+
+def intern_name(name):
+    if name is None:
+        return None
+    return sys.intern(name)
+
+
+class FieldTable(object):
+    # Read-only ordered mapping of named schema members (fields, arguments,
+    # input fields, enum values). Members live in a tuple; tables longer than
+    # INDEX_THRESHOLD also keep a name -> position index, shorter ones are scanned.
+    __slots__ = ("members", "index")
+    INDEX_THRESHOLD = 8
+
+    def __init__(self, members=()):
+        self.members = tuple(members)
+        self.index = None
+        if len(self.members) > self.INDEX_THRESHOLD:
+            self.index = dict([(m.name, i) for i, m in enumerate(self.members)])
+
+    @staticmethod
+    def build(members):
+        members = tuple(members)
+        if len(members) == 0:
+            return EMPTY_TABLE
+        return FieldTable(members)
 
+    def find(self, name):
+        if self.index is not None:
+            return self.index.get(name, -1)
+
+        for i, member in enumerate(self.members):
+            if member.name == name:
+                return i
+        return -1
+
+    def get(self, name, default=None):
+        i = self.find(name)
+        if i < 0:
+            return default
+        return self.members[i]
+
+    def __getitem__(self, name):
+        i = self.find(name)
+        if i < 0:
+            raise KeyError(name)
+        return self.members[i]
+
+    def __contains__(self, name):
+        return self.find(name) >= 0
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.members)
+
+    def keys(self):
+        return [m.name for m in self.members]
+
+    def values(self):
+        return self.members
+
+    def items(self):
+        return [(m.name, m) for m in self.members]
+
+
+EMPTY_TABLE = FieldTable()
+
+
+class GqlObject(object):
+    __slots__ = ()
+
+    def parse_type(self, data):
+        signature = self.get_type_signature(data)
+
+        non_null = False
+        is_list = False
+        is_enum = False
+        kind = None
+        name = None
+        while data is not None:
+            if data["kind"] == "NON_NULL":
+                non_null = True
+            elif data["kind"] == "LIST":
+                is_list = True
+            elif data["kind"] == "ENUM":
+                is_enum = True
+                name = data["name"]
+                kind = data["kind"]
+            elif data["kind"] in ["OBJECT", "SCALAR", "INTERFACE", "INPUT_OBJECT", "UNION"]:
+                name = data["name"]
+                kind = data["kind"]
+            data = data.get("ofType")
+
+        return get_type_ref(kind, name, non_null, is_list, is_enum, signature)
+
+    def get_type_signature(self, data):
         if data["kind"] == "NON_NULL":
-            scalar.non_null = True
+            return "%s!" % self.get_type_signature(data["ofType"])
         elif data["kind"] == "LIST":
-            scalar.is_list = True
-        elif data["kind"] == "ENUM":
-            scalar.is_enum = True
-            scalar.name = data["name"]
-            scalar.kind = data["kind"]
-        elif data["kind"] in ["OBJECT", "SCALAR", "INTERFACE", "INPUT_OBJECT", "UNION"]:
-            scalar.name = data["name"]
-            scalar.kind = data["kind"]
-
-        if data["ofType"] is not None:
-            return self.parse_type(data["ofType"], scalar)
-        else:
-            return scalar
+            return "[%s]" % self.get_type_signature(data["ofType"])
+        return data["name"]
 
-    def get_type_object(self, otype):
-        if otype.name in TYPES_CACHE.keys():
-            return TYPES_CACHE[otype.name]
+    def is_leaf_type(self, otype):
+        return otype.kind in ["SCALAR", "ENUM"]
+
+    def get_type_object(self, otype, types):
+        if otype.name in types.keys():
+            return types[otype.name]
         else:
             raise Exception("Fail to found type %s" % str(otype))
 
@@ -91,6 +320,8 @@ class GqlObject(object):
         key = path.pop(0)
         if key in data.keys():
             if type(data[key]) == dict:
+                if len(path) == 0:
+                    return None
                 return self.get_dict_value(data[key], path)
             else:
                 return data[key]
@@ -103,16 +334,20 @@ class GqlObject(object):
 
 
 class GqlEnumValue(GqlObject):
+    __slots__ = ("name", "description", "is_deprecated", "deprecation_reason")
+
     def __init__(self, data):
-        self.name = data["name"]
+        self.name = sys.intern(data["name"])
         self.description = data["description"]
         self.is_deprecated = data["isDeprecated"]
         self.deprecation_reason = data["deprecationReason"]
 
 
 class GqlInputField(GqlObject):
+    __slots__ = ("name", "description", "default_value", "type")
+
     def __init__(self, data):
-        self.name = data["name"]
+        self.name = sys.intern(data["name"])
         self.description = data["description"]
         self.default_value = data["defaultValue"]
 
@@ -122,9 +357,11 @@ class GqlInputField(GqlObject):
 
 
 class GqlInterface(GqlObject):
+    __slots__ = ("kind", "name", "type")
+
     def __init__(self, data):
-        self.kind = data["kind"]
-        self.name = data["name"]
+        self.kind = sys.intern(data["kind"])
+        self.name = sys.intern(data["name"])
 
         self.type = None
         if "type" in data.keys() and data["type"] is not None:
@@ -132,8 +369,10 @@ class GqlInterface(GqlObject):
 
 
 class GqlArgument(GqlObject):
+    __slots__ = ("name", "description", "default_value", "resolver", "type")
+
     def __init__(self, data):
-        self.name = data["name"]
+        self.name = sys.intern(data["name"])
         self.description = data["description"]
         self.default_value = data["defaultValue"]
         self.resolver = None
@@ -142,36 +381,38 @@ class GqlArgument(GqlObject):
         if "type" in data.keys() and data["type"] is not None:
             self.type = self.parse_type(data["type"])
 
-    def prepare_resolver(self, path, resolvers, obj_type=None):
-        if obj_type is None:
-            obj_type = self.type
-
-        resolver = self.get_dict_value(resolvers, path)
-        if resolver is None:
-            if obj_type.kind == "SCALAR":
-                resolver = self.get_scalar_resolver(obj_type)
-            elif obj_type.kind == "ENUM":
-                resolver = enum_resolver(TYPES_CACHE[obj_type.name].enum_values, obj_type.is_list, obj_type.non_null)
-            elif obj_type.kind == "INPUT_OBJECT":
-                input_data = OrderedDict()
-                for ifld in TYPES_CACHE[obj_type.name].input_fields.values():
-                    ifld_path = copy.deepcopy(path)
-                    ifld_path.append(ifld.name)
-
-                    input_data[ifld.name] = self.get_dict_value(resolvers, ifld_path)
-                    if input_data[ifld.name] is None:
-                        input_data[ifld.name] = self.prepare_resolver(ifld_path, resolvers, ifld.type)
-
-                resolver = input_object_resolver(input_data)
-
-        if resolver is None:
-            raise Exception("NULL resolver %s.%s" % (".".join(path), self.name))
-
-        return resolver
-
-    def get_scalar_resolver(self, scalar_type):
-        if scalar_type.name in SCALAR_TYPES.keys():
-            return SCALAR_TYPES[scalar_type.name].resolve
+    def prepare_resolver(self, path, resolvers, registry, obj_type=None):
+        with tracing.span("prepare_resolver", path=path):
+            if obj_type is None:
+                obj_type = self.type
+
+            resolver = self.get_dict_value(resolvers, list(path))
+            if resolver is None:
+                if obj_type.kind == "SCALAR":
+                    resolver = self.get_scalar_resolver(obj_type, registry.scalars)
+                elif obj_type.kind == "ENUM":
+                    resolver = enum_resolver(registry.types[obj_type.name].enum_values, obj_type.is_list,
+                                             obj_type.non_null)
+                elif obj_type.kind == "INPUT_OBJECT":
+                    input_data = OrderedDict()
+                    for ifld in registry.types[obj_type.name].input_fields.values():
+                        ifld_path = list(path)
+                        ifld_path.append(ifld.name)
+
+                        input_data[ifld.name] = self.get_dict_value(resolvers, list(ifld_path))
+                        if input_data[ifld.name] is None:
+                            input_data[ifld.name] = self.prepare_resolver(ifld_path, resolvers, registry, ifld.type)
+
+                    resolver = input_object_resolver(input_data)
+
+            if resolver is None:
+                raise Exception("NULL resolver %s" % ".".join(path))
+
+            return resolver
+
+    def get_scalar_resolver(self, scalar_type, scalars):
+        if scalar_type.name in scalars.keys():
+            return scalars[scalar_type.name].resolve
         else:
             raise Exception("Unknown scalar %s" % scalar_type.name)
 
@@ -184,50 +425,43 @@ class GqlArgument(GqlObject):
         return output
 
 
-class GqlInputField(GqlObject):
-    def __init__(self, data):
-        self.name = data["name"]
-        self.description = data["description"]
-        self.default_value = data["defaultValue"]
-
-        self.type = None
-        if "type" in data.keys() and data["type"] is not None:
-            self.type = self.parse_type(data["type"])
-
-
 class GqlField(GqlObject):
+    __slots__ = ("name", "description", "is_deprecated", "deprecation_reason", "args", "type")
+
     def __init__(self, data):
-        self.name = data["name"]
+        self.name = sys.intern(data["name"])
         self.description = data["description"]
         self.is_deprecated = data["isDeprecated"]
         self.deprecation_reason = data["deprecationReason"]
 
-        self.args = OrderedDict()
+        self.args = EMPTY_TABLE
         if "args" in data.keys() and data["args"] is not None:
-            for arg in data["args"]:
-                self.args[arg["name"]] = GqlArgument(arg)
+            self.args = FieldTable.build([GqlArgument(arg) for arg in data["args"]])
 
         self.type = None
         if "type" in data.keys() and data["type"] is not None:
             self.type = self.parse_type(data["type"])
 
-    def prepare_queries(self, resolvers={}, query_info=None):
+    def prepare_queries(self, planner, resolvers={}, query_info=None, own_query=True):
         if query_info is None:
-            query_info = QueryInfo(resolvers)
-            query_info.add_to_path(self)
-        else:
-            query_info.add_to_path(self)
+            query_info = QueryInfo(resolvers, planner.registry)
+        query_info = query_info.add_to_path(self)
+
+        if self.is_leaf_type(self.type):
+            return [query_info]
 
         need_to_own_quering = False
         subqueries = []
-        for key, field in self.get_type_object(self.type).fields.items():
-            if not field.is_argumented():
-                if not self.get_type_object(field.type).has_argumented_fields():
-                    need_to_own_quering = True
+        for key, field in self.get_type_object(self.type, planner.types).fields.items():
+            if field.is_argumented():
+                if planner.should_expand(self.type.name, field, query_info):
+                    subqueries.extend(field.prepare_queries(planner, resolvers, query_info, True))
             else:
-                subqueries.extend(field.prepare_queries(resolvers, copy.deepcopy(query_info)))
+                need_to_own_quering = True
+                if planner.leads_to_arguments(field) and planner.should_expand(self.type.name, field, query_info):
+                    subqueries.extend(field.prepare_queries(planner, resolvers, query_info, False))
 
-        if need_to_own_quering:
+        if need_to_own_quering and own_query:
             subqueries.append(query_info)
 
         return subqueries
@@ -235,8 +469,21 @@ class GqlField(GqlObject):
     def is_argumented(self):
         return len(self.args.keys()) > 0
 
-    def get_query(self):
-        return self.name
+    def is_connection(self, types):
+        if self.is_leaf_type(self.type):
+            return False
+
+        fields = self.get_type_object(self.type, types).fields
+        return "edges" in fields.keys() and "pageInfo" in fields.keys()
+
+    def get_selection(self, types, seen=None):
+        if self.is_leaf_type(self.type):
+            return ""
+
+        return "{%s}" % self.get_type_object(self.type, types).get_selection(types, seen)
+
+    def get_query(self, types):
+        return "%s%s" % (self.name, self.get_selection(types))
 
     def __str__(self, tab=0):
         output = "%s" % self.name
@@ -250,52 +497,88 @@ class GqlField(GqlObject):
         return output
 
 class GqlType(GqlObject):
+    __slots__ = ("name", "kind", "enum_values", "description", "possible_types", "interfaces", "fields",
+                 "input_fields", "args", "argumented")
+
     def __init__(self, data):
-        self.name = data["name"]
-        self.kind = data["kind"]
+        self.name = sys.intern(data["name"])
+        self.kind = sys.intern(data["kind"])
 
-        self.enum_values = {}
+        self.enum_values = EMPTY_TABLE
         if "enumValues" in data.keys() and data["enumValues"] is not None:
-            for ev in data["enumValues"]:
-                self.enum_values[ev["name"]] = GqlEnumValue(ev)
+            self.enum_values = FieldTable.build([GqlEnumValue(ev) for ev in data["enumValues"]])
 
         self.description = None
         if "description" in data.keys():
             self.description = data["description"]
 
-        self.possible_types = []
+        possible_types = []
         if "possibleTypes" in data.keys() and data["possibleTypes"] is not None:
             for pt in data["possibleTypes"]:
-                self.possible_types.append(GqlType(pt))
+                possible_types.append(GqlType(pt))
 
-        self.interfaces = []
+        self.interfaces = ()
         if "interfaces" in data.keys() and data["interfaces"] is not None:
             for interface in data["interfaces"]:
-                self.possible_types.append(GqlInterface(interface))
+                possible_types.append(GqlInterface(interface))
+        self.possible_types = tuple(possible_types)
 
-        self.fields = OrderedDict()
+        self.fields = EMPTY_TABLE
         if "fields" in data.keys() and data["fields"] is not None:
-            for field in data["fields"]:
-                self.fields[field["name"]] = GqlField(field)
+            self.fields = FieldTable.build([GqlField(field) for field in data["fields"]])
 
-        self.input_fields = OrderedDict()
+        self.input_fields = EMPTY_TABLE
         if "inputFields" in data.keys() and data["inputFields"] is not None:
-            for ifield in data["inputFields"]:
-                self.input_fields[ifield["name"]] = GqlInputField(ifield)
+            self.input_fields = FieldTable.build([GqlInputField(ifield) for ifield in data["inputFields"]])
 
-        self.args = OrderedDict()
+        self.args = EMPTY_TABLE
         if "args" in data.keys() and data["args"] is not None:
-            for arg in data["args"]:
-                self.args[arg["name"]] = GqlArgument(arg)
+            self.args = FieldTable.build([GqlArgument(arg) for arg in data["args"]])
 
-    def has_argumented_fields(self):
-        for _, field in self.fields.items():
+        self.argumented = None
+
+    def get_selection_tree(self, types, seen=None, depth=MAX_SELECTION_DEPTH):
+        # seen is shared by the whole document: every object type is expanded
+        # once, where it is first reached, and no deeper than depth levels, so
+        # the selection stays bounded however many paths lead to a type
+        if seen is None:
+            seen = set()
+        seen.add(self.name)
+
+        selection = []
+        for key, field in self.fields.items():
             if field.is_argumented():
-                return True
+                continue
+
+            if self.is_leaf_type(field.type):
+                selection.append((field.name, field, None))
+            elif depth > 1 and field.type.kind in ["OBJECT", "INTERFACE"] and field.type.name not in seen:
+                field_type = self.get_type_object(field.type, types)
+                selection.append((field.name, field, field_type.get_selection_tree(types, seen, depth - 1)))
+
+        if len(selection) == 0:
+            selection.append(("__typename", None, None))
+
+        return selection
+
+    def get_selection(self, types, seen=None):
+        return self.render_selection(self.get_selection_tree(types, seen))
+
+    def render_selection(self, selection):
+        output = []
+        for name, field, children in selection:
+            if children is None:
+                output.append(name)
             else:
-                return self.get_type_object(field.type).has_argumented_fields()
+                output.append("%s{%s}" % (name, self.render_selection(children)))
 
-        return False
+        return " ".join(output)
+
+    def has_argumented_fields(self, types):
+        if self.argumented is None:
+            index_argumented_types(types)
+
+        return self.argumented
 
     def __str__(self, tab=0):
         output = self.name
@@ -309,80 +592,506 @@ class GqlType(GqlObject):
         return output
 
 
+def get_strongly_connected_components(graph):
+    # iterative Tarjan; components come out in reverse topological order,
+    # i.e. every component after all components it points to
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    counter = 0
+
+    for start in graph.keys():
+        if start in index:
+            continue
+
+        work = [(start, 0)]
+        while len(work) > 0:
+            node, i = work[-1]
+            if i == 0:
+                index[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+
+            successors = graph[node]
+            descended = False
+            while i < len(successors):
+                successor = successors[i]
+                i += 1
+                if successor not in index:
+                    work[-1] = (node, i)
+                    work.append((successor, 0))
+                    descended = True
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+
+            if descended:
+                continue
+
+            work.pop()
+            if len(work) > 0:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                yield component
+
+
+def index_argumented_types(types):
+    graph = OrderedDict()
+    for name, otype in types.items():
+        graph[name] = [f.type.name for f in otype.fields.values() if f.type.name in types.keys()]
+
+    argumented = set()
+    for component in get_strongly_connected_components(graph):
+        members = set(component)
+        for name in component:
+            if any([f.is_argumented() for f in types[name].fields.values()]) or \
+                    any([s in argumented for s in graph[name] if s not in members]):
+                argumented.update(members)
+                break
+
+    for name, otype in types.items():
+        otype.argumented = name in argumented
+
+    return argumented
+
+
+class QueryPlanner(object):
+    # Only fields that lead to arguments are expanded, and every (type, field)
+    # pair at most once per path, which bounds self-referencing types. With
+    # expand_once each pair is expanded once per planning run instead, on one
+    # of its shortest paths from Query: planning stays linear in the schema
+    # size, but a field reachable through several paths is tested through
+    # only one of them.
+    def __init__(self, registry, expand_once=False):
+        self.registry = registry
+        self.types = registry.types
+        self.expand_once = expand_once
+        self.expanded = set()
+        self.depths = self.get_depths() if expand_once else {}
+
+    def leads_to_arguments(self, field):
+        if field.is_leaf_type(field.type) or field.type.name not in self.types.keys():
+            return False
+        return self.types[field.type.name].has_argumented_fields(self.types)
+
+    def get_depths(self):
+        depths = {}
+        queue = deque()
+        for field in self.types["Query"].fields.values():
+            depths[("Query", field.name)] = 1
+            queue.append((field, 1))
+
+        while len(queue) > 0:
+            field, depth = queue.popleft()
+            if field.is_leaf_type(field.type) or field.type.name not in self.types.keys():
+                continue
+
+            for child in self.types[field.type.name].fields.values():
+                key = (field.type.name, child.name)
+                if key not in depths and (child.is_argumented() or self.leads_to_arguments(child)):
+                    depths[key] = depth + 1
+                    queue.append((child, depth + 1))
+
+        return depths
+
+    def should_expand(self, owner, field, query_info):
+        if not self.expand_once:
+            return not query_info.has_visited(owner, field.name)
+
+        key = (owner, field.name)
+        depth = query_info.depth + 1
+        if key in self.expanded or self.depths.get(key, depth) < depth:
+            return False
+
+        self.expanded.add(key)
+        return True
+
+
 class TestProposition(object):
-    def __init__(self):
-        self.position = 0
-        self.values = OrderedDict()
+    def __init__(self, resolvers_list, prefix=None):
+        if prefix is None:
+            prefix = VariablesPrefix()
+
+        self.resolvers_list = resolvers_list
+        self.prefix = prefix
+
+    @property
+    def position(self):
+        return self.prefix.depth
 
-    def set_value(self, resolver_dict, value):
-        if resolver_dict["key"] not in self.values.keys():
-            self.values[resolver_dict["key"]] = OrderedDict()
+    @property
+    def values(self):
+        values = OrderedDict()
+        for name, value in self.prefix.items():
+            resolver_dict = self.resolvers_list[name]
+            if resolver_dict["key"] not in values.keys():
+                values[resolver_dict["key"]] = OrderedDict()
 
-        self.values[resolver_dict["key"]][resolver_dict["name"]] = value
+            values[resolver_dict["key"]][resolver_dict["name"]] = value
+
+        return values
 
     def __str__(self):
         return " -> ".join([k for k in self.values.keys()])
 
 
 class Schema(object):
-    def __init__(self, url, headers={}):
+    def __init__(self, url, headers={}, cache=None, refresh=False, revalidate=True, introspection=None):
         self.url = url
         self.headers = headers
+        self.cache = cache
 
-        self.queries = []
-
-        print("Requesting structure...", end='\r', flush=True)
-        structure = requests.get(self.url, headers=self.headers, params={"query": structure_query})
-        print("Building caches...", end='\r', flush=True)
+        self.registry = TypeRegistry()
+        self.types = self.registry.types
+        self.scalars = self.registry.scalars
 
-        if structure.status_code == 200:
-            for d in structure.json()["data"]["__schema"]["types"]:
-                TYPES_CACHE[d["name"]] = GqlType(d)
+        self.queries = []
+        self.latency = None
+        self.limiter = None
+        self.shrunk = []
+        self.coverage = None
+        self.deduplicator = None
+        self.diff = None
+        self.schema_hash = None
+
+        entry = None
+        if cache is not None and not refresh:
+            entry = cache.load(self.url, self.headers)
+
+        if introspection is not None:
+            print("Building caches...", end='\r', flush=True)
+            self.types.update(self.build_types(introspection["data"]["__schema"]["types"]))
+        elif entry is not None and not revalidate:
+            self.types.update(entry["types"])
+            self.schema_hash = entry["hash"]
         else:
-            print(structure.status_code)
+            self.introspect(entry, cache)
+
+        self.argumented_types = index_argumented_types(self.types)
 
         print("Initialization done!", end='\r', flush=True)
 
-    def register_scalar(self, name, resolver):
-        SCALAR_TYPES[name] = resolver
+    def introspect(self, entry=None, cache=None):
+        with tracing.span("introspection", url=self.url) as span:
+            request_headers = dict(self.headers)
+            if entry is not None and entry["etag"] is not None:
+                request_headers["If-None-Match"] = entry["etag"]
+
+            print("Requesting structure...", end='\r', flush=True)
+            structure = requests.get(self.url, headers=request_headers, params={"query": structure_query},
+                                     stream=True)
+            span.set("status", structure.status_code)
+
+            if structure.status_code == 304 and entry is not None:
+                self.types.update(entry["types"])
+                self.schema_hash = entry["hash"]
+            elif structure.status_code == 200:
+                chunks = structure.iter_content(STREAM_CHUNK_SIZE)
+                cached = False
+                spool = None
+                if entry is not None:
+                    # the raw response is hashed before anything is built and
+                    # spooled to disk, an unchanged schema is served from the
+                    # cache entry
+                    schema_hash, spool = spool_response(chunks)
+                    chunks = iter_spool(spool, STREAM_CHUNK_SIZE)
+                    cached = entry["hash"] == schema_hash
+                span.set("cached", cached)
+
+                try:
+                    if cached:
+                        self.types.update(entry["types"])
+                    else:
+                        # types are built while the response streams in, the
+                        # raw payload is never held whole
+                        print("Building caches...", end='\r', flush=True)
+                        digest = hashlib.sha256()
+                        types = self.build_types(iter_types(chunks, digest))
+                        schema_hash = digest.hexdigest()
+                        self.types.update(types)
+
+                        if entry is not None:
+                            self.diff = diff_types(entry["types"], types)
+
+                        if cache is not None:
+                            cache.save(self.url, self.headers, types, structure.headers.get("ETag"), schema_hash)
+                finally:
+                    if spool is not None:
+                        spool.close()
+                self.schema_hash = schema_hash
+            else:
+                print(structure.status_code)
 
-    def prepare_queries(self, resolvers={}):
-        for key, obj in TYPES_CACHE["Query"].fields.items():
-            for qi in obj.prepare_queries(resolvers):
-                self.queries.append(qi)
+    def build_types(self, types_data):
+        with tracing.span("build_types") as span:
+            types = OrderedDict()
+            for d in types_data:
+                types[d["name"]] = GqlType(d)
+            span.set("types", len(types))
+        return types
 
-    def calculate_query_values(self, resolvers_list={}, proposition=None):
-        if proposition is None:
-            resolver = resolvers_list[list(resolvers_list.keys())[0]]
-            proposition = TestProposition()
+    def register_scalar(self, name, resolver):
+        self.scalars[name] = resolver
+
+    def prepare_queries(self, resolvers={}, expand_once=False):
+        with tracing.span("prepare_queries") as span:
+            planner = QueryPlanner(self.registry, expand_once)
+            for key, obj in self.types["Query"].fields.items():
+                for qi in obj.prepare_queries(planner, resolvers):
+                    self.queries.append(qi)
+            span.set("queries", len(self.queries))
+
+    def calculate_query_values(self, resolvers_list={}, proposition=None, strategy=EXHAUSTIVE, strength=None):
+        prefix = None
+        if proposition is not None:
+            prefix = proposition.prefix
+
+        keys = list(resolvers_list.keys())
+        if prefix is not None:
+            keys = keys[prefix.depth:]
+
+        resolvers = [resolvers_list[key]["obj"].resolver for key in keys]
+        for node in get_combinations(keys, resolvers, strategy, strength, prefix):
+            yield TestProposition(resolvers_list, node)
+
+    def get_test_queries(self):
+        return [query_info.get_test_query(self.types) for query_info in self.queries]
+
+    def get_requests(self, test_queries=None, strategy=EXHAUSTIVE, strength=None, compiled=False, shard=None,
+                     seed=None):
+        if test_queries is None:
+            test_queries = self.get_test_queries()
+        if shard is not None and seed is None:
+            raise Exception("Sharded runs need a seed so every shard resolves the same values")
+
+        for test_query in test_queries:
+            select = None if shard is None else shard.get_selector(test_query)
+            for query, values in test_query.get_query(self.scalars, strategy=strategy, strength=strength,
+                                                      compiled=compiled, seed=seed, select=select):
+                yield query, values, test_query
+
+    def get_load_corpus(self, weights=None, per_query=1000, strategy=EXHAUSTIVE, strength=None, compiled=False,
+                        seed=0):
+        requests = []
+        deduplicator = Deduplicator()
+        for test_query in self.get_test_queries():
+            unique = deduplicator.filter(self.get_requests([test_query], strategy, strength, compiled, seed=seed))
+            requests.extend(itertools.islice(unique, per_query))
+        return LoadCorpus(requests, weights, seed)
+
+    def get_affected_queries(self, test_queries=None, diff=None):
+        # planned queries whose document, variables or validation depend on
+        # something that changed since the cached introspection (or in diff)
+        if test_queries is None:
+            test_queries = self.get_test_queries()
+        if diff is None:
+            diff = self.diff
+        if diff is None:
+            return []
+
+        return [q for q in test_queries if diff.is_affected(get_query_dependencies(q, self.types))]
+
+    def get_reusable_results(self, test_queries, stored):
+        # stored is the entry of the last incremental run: its results are
+        # compared by the types they were produced against, not by self.diff,
+        # which is unset when the schema cache already held the new schema
+        if stored is None:
+            return test_queries, []
+
+        if self.schema_hash is not None and stored["hash"] == self.schema_hash:
+            affected = set()
+        elif stored["types"] is not None:
+            affected = set([id(q) for q in self.get_affected_queries(test_queries,
+                                                                     diff_types(stored["types"], self.types))])
         else:
-            resolver = resolvers_list[list(resolvers_list.keys())[proposition.position]]
-
-        result = []
-
-        for value in resolver["obj"].resolver(proposition):
-            new_proposition = copy.deepcopy(proposition)
-            new_proposition.set_value(resolver, value)
-            if len(resolvers_list) > new_proposition.position + 1:
-                new_proposition.position += 1
-                result.extend(self.calculate_query_values(resolvers_list, new_proposition))
-            else:
-                result.append(new_proposition)
-
-        return result
-
-    def test(self):
-        for query_info in self.queries:
-            resolvers_list = OrderedDict()
-            for key, var in query_info.variables.items():
-                for vname, v in var.items():
-                    resolvers_list["%s.%s" % (key, vname)] = {
-                        "key": key,
-                        "name": vname,
-                        "obj": v,
-                    }
-
-            if len(resolvers_list.keys()) > 0:
-                print([str(p) for p in self.calculate_query_values(resolvers_list)])
+            return test_queries, []
+
+        pending = []
+        reused = []
+        results = stored["results"]
+        for test_query in test_queries:
+            key = ".".join(test_query.query_data.path)
+            if id(test_query) in affected or key not in results.keys():
+                pending.append(test_query)
             else:
-                print("!!!!!", query_info)
+                reused.extend([ExecutionResult.from_dict(r, test_query) for r in results[key]])
+
+        return pending, reused
+
+    def test(self, max_in_flight=10, timeout=30, strategy=EXHAUSTIVE, strength=None, compiled=False,
+             batch=None, batch_size=10, shard=None, seed=None, deduplicate=True, incremental=False, store=None,
+             replay=False, adaptive=None, shrink=False, coverage=False, budget=None, target=None, patience=None):
+        return asyncio.run(self.test_async(None, max_in_flight, timeout, strategy, strength, compiled, batch,
+                                           batch_size, shard, seed, deduplicate, incremental, store, replay,
+                                           adaptive, shrink, coverage, budget, target, patience))
+
+    async def test_async(self, session=None, max_in_flight=10, timeout=30, strategy=EXHAUSTIVE, strength=None,
+                         compiled=False, batch=None, batch_size=10, shard=None, seed=None, deduplicate=True,
+                         incremental=False, store=None, replay=False, adaptive=None, shrink=False, coverage=False,
+                         budget=None, target=None, patience=None):
+        # store (a ResponseStore) records every response, or with replay=True
+        # serves the recorded ones instead of calling the endpoint
+        # session may be shared by several schemas, see test_schemas
+        # adaptive ("aimd", "gradient" or a Limiter) moves the in-flight limit
+        # below max_in_flight from latency and 429/5xx responses
+        # shrink reduces every new failure to a minimal set of arguments
+        # coverage sends the requests adding new coverage first and stops after
+        # budget seconds, at target coverage (0-1) or after patience useless results
+        batcher = None
+        if batch is not None:
+            batcher = get_batcher(batch, batch_size)
+
+        self.limiter = None
+        if adaptive is not None:
+            self.limiter = get_limiter(adaptive, max_in_flight) if type(adaptive) == str else adaptive
+
+        if store is None:
+            if replay:
+                raise Exception("Replay needs a response store")
+            executor = Executor(self.url, self.headers, max_in_flight=max_in_flight, timeout=timeout, batcher=batcher,
+                                limiter=self.limiter)
+        else:
+            # random resolvers must draw the recorded values again, so the seed
+            # a store was recorded with is kept in it
+            if seed is None:
+                seed = store.get_meta("seed")
+            if seed is None:
+                if replay:
+                    raise Exception("The store has no recorded seed, pass the seed it was recorded with")
+                seed = 0
+            if not replay:
+                store.set_meta("seed", seed)
+
+            executor_class = ReplayExecutor if replay else RecordingExecutor
+            executor = executor_class(store, self.url, self.headers, max_in_flight=max_in_flight, timeout=timeout,
+                                      batcher=batcher, limiter=self.limiter)
+
+        results = []
+        self.latency = LatencyReport()
+        self.coverage = None
+        scheduler = None
+        if coverage or budget is not None or target is not None or patience is not None:
+            self.coverage = Coverage(self.types)
+
+        def on_result(result):
+            if result.data is not None and result.source is not None:
+                with tracing.span("validate", path=result.source.query_data.path):
+                    result.validation = result.source.validate(result.data, self.scalars)
+            self.latency.record(result)
+            if self.coverage is not None:
+                added = self.coverage.record(result)
+                if scheduler is not None:
+                    scheduler.record(added)
+            results.append(result)
+
+        test_queries = self.get_test_queries()
+        reused = []
+        if incremental:
+            if self.cache is None:
+                raise Exception("Incremental runs need a schema cache")
+
+            options = (strategy, strength, compiled, None if shard is None else str(shard), seed)
+            stored = self.cache.load_results(self.url, self.headers, options)
+            test_queries, reused = self.get_reusable_results(test_queries, stored)
+            for result in reused:
+                on_result(result)
+
+        requests = self.get_requests(test_queries, strategy, strength, compiled, shard, seed)
+        self.deduplicator = None
+        if deduplicate:
+            self.deduplicator = Deduplicator()
+            requests = self.deduplicator.filter(requests)
+        if self.coverage is not None:
+            requests = scheduler = CoverageScheduler(requests, self.coverage, budget=budget, target=target,
+                                                     patience=patience)
+
+        async for result in executor.execute(requests, session):
+            on_result(result)
+        if store is not None:
+            store.flush()
+
+        self.shrunk = []
+        if shrink:
+            # reused results were never planned in this run, their resolvers are not prepared
+            shrinker = Shrinker(executor, self.scalars, compiled)
+            self.shrunk = await shrinker.shrink_all(results[len(reused):], session, results)
+            if store is not None:
+                store.flush()
+
+        shrunk = dict([(id(s.result), s) for s in self.shrunk])
+        for result in results:
+            if not result.success:
+                print(shrunk.get(id(result), result))
+
+        print(self.latency.format())
+        print("Executed %d queries, %d failed" % (len(results), len([r for r in results if not r.success])))
+        if self.deduplicator is not None and self.deduplicator.duplicates > 0:
+            print("Skipped %d duplicate queries" % self.deduplicator.duplicates)
+        if self.coverage is not None:
+            print(self.coverage.format())
+            if scheduler.reason is not None:
+                print("Stopped after %d requests: %s" % (scheduler.sent, scheduler.reason))
+        if self.limiter is not None:
+            summary = self.limiter.metrics.summary()
+            print("Concurrency limit %s (%s-%s), %.1f requests/s, %d backoffs" % (
+                summary["limit"], summary["min_limit"], summary["max_limit"], summary["throughput"],
+                sum(summary["backoffs"].values())))
+
+        if incremental:
+            print("Reused %d stored results, re-tested %d planned queries" % (len(reused), len(test_queries)))
+
+            records = OrderedDict()
+            for result in results:
+                records.setdefault(".".join(result.source.query_data.path), []).append(result.to_dict())
+            self.cache.save_results(self.url, self.headers, records, options, self.types, self.schema_hash)
+
+        return results
+
+    def probe_pagination(self, sizes=None, repeat=3, threshold=1.3, min_increase=0.002, max_in_flight=1, timeout=30,
+                         strategy=EXHAUSTIVE, strength=None, compiled=False, seed=0):
+        # one request at a time by default, so page sizes do not compete for the server
+        executor = Executor(self.url, self.headers, max_in_flight=max_in_flight, timeout=timeout)
+        probe = PaginationProbe(executor, sizes, repeat, threshold, min_increase)
+        report = probe.run(self.get_test_queries(), self.scalars, strategy=strategy, strength=strength,
+                           compiled=compiled, seed=seed)
+
+        print(report.format())
+        for connection in report.get_flagged():
+            print("%s grows super-linearly with page size, check for N+1 lookups" % connection.name)
+        return report
+
+    def load(self, rate, duration, ramp_to=None, ramp=0, weights=None, window=1.0, max_connections=100,
+             max_outstanding=1000, timeout=30, per_query=1000, strategy=EXHAUSTIVE, strength=None, compiled=False,
+             seed=0):
+        corpus = self.get_load_corpus(weights, per_query, strategy, strength, compiled, seed)
+        print("Load corpus: %d requests over %d root fields" % (len(corpus), len(corpus.fields)))
+
+        executor = Executor(self.url, self.headers, max_in_flight=max_connections, timeout=timeout)
+        runner = LoadRunner(executor, corpus, RateProfile(rate, ramp_to, ramp), duration, window, max_outstanding)
+        report = runner.run()
+
+        print(report.format())
+        return report
+
+
+def test_schemas(schemas, max_connections=100, **options):
+    # tests several endpoints concurrently over one connection pool
+    async def runner():
+        session = Executor(None, max_in_flight=max_connections).create_session()
+        try:
+            return await asyncio.gather(*[schema.test_async(session, **options) for schema in schemas])
+        finally:
+            await session.close()
+
+    return asyncio.run(runner())
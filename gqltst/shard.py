@@ -0,0 +1,157 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import sys
+import zlib
+from collections import OrderedDict
+
+from gqltst.combinations import EXHAUSTIVE
+from gqltst.metrics import LatencyReport
+
+
+class Shard(object):
+    # One of count disjoint slices of the request space; a request belongs to
+    # a shard by a stable hash of its query path and combination index.
+    def __init__(self, index, count):
+        if count < 1 or index < 1 or index > count:
+            raise Exception("Invalid shard %s/%s" % (index, count))
+
+        self.index = index
+        self.count = count
+
+    @staticmethod
+    def parse(value):
+        try:
+            index, count = [int(v) for v in value.split("/")]
+        except ValueError:
+            raise Exception("Invalid shard %s, expected INDEX/COUNT" % value)
+        return Shard(index, count)
+
+    def contains(self, key, index):
+        return zlib.crc32(("%s#%d" % (key, index)).encode("utf-8")) % self.count == self.index - 1
+
+    def get_selector(self, test_query):
+        key = ".".join(test_query.query_data.path)
+        return lambda index: self.contains(key, index)
+
+    def __str__(self):
+        return "%d/%d" % (self.index, self.count)
+
+
+def get_shard_report(shard, seed, results, latency):
+    failures = []
+    for result in results:
+        if not result.success:
+            failures.append(OrderedDict([
+                ("query", ".".join(result.source.query_data.path) if result.source is not None else None),
+                ("values", result.values),
+                ("reason", str(result)),
+            ]))
+
+    report = OrderedDict()
+    report["shards"] = [str(shard)]
+    report["seed"] = seed
+    report["executed"] = len(results)
+    report["failed"] = len(failures)
+    report["failures"] = failures
+    report["latency"] = latency.to_dict(buckets=True)
+    return report
+
+
+def merge_reports(reports):
+    merged = OrderedDict([("shards", []), ("seed", None), ("executed", 0), ("failed", 0), ("failures", [])])
+    latency = LatencyReport()
+    for report in reports:
+        if merged["seed"] is not None and report["seed"] != merged["seed"]:
+            raise Exception("Unable to merge shards run with seeds %s and %s" % (merged["seed"], report["seed"]))
+
+        merged["seed"] = report["seed"]
+        merged["shards"].extend(report["shards"])
+        merged["executed"] += report["executed"]
+        merged["failed"] += report["failed"]
+        merged["failures"].extend(report["failures"])
+        latency.merge(LatencyReport.from_dict(report["latency"]))
+
+    merged["latency"] = latency.to_dict(buckets=True)
+    return merged
+
+
+def run_shard(url, headers, shard, seed=0, cache=None, options={}):
+    from gqltst.schema import Schema
+
+    # duplicates are only recognized once rendered, that is within a shard, so
+    # they are all sent unless asked otherwise
+    options = dict(options)
+    options.setdefault("deduplicate", False)
+
+    # progress goes to stderr so stdout stays a clean JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        schema = Schema(url, headers, cache=cache)
+        schema.prepare_queries()
+        results = schema.test(shard=shard, seed=seed, **options)
+    return get_shard_report(shard, seed, results, schema.latency)
+
+
+def run_sharded(url, headers={}, count=None, seed=0, cache=None, **options):
+    # every worker introspects, plans and enumerates on its own and only renders,
+    # sends and validates its slice; without deduplication (see run_shard)
+    # merged results do not depend on count
+    if count is None:
+        count = multiprocessing.cpu_count()
+
+    arguments = [(url, headers, Shard(i + 1, count), seed, cache, options) for i in range(count)]
+    with multiprocessing.Pool(count) as pool:
+        reports = pool.starmap(run_shard, arguments)
+
+    return merge_reports(reports)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gqltst.shard",
+                                     description="Run a deterministic slice of the generated test queries")
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("--header", action="append", default=[], help="NAME:VALUE")
+    parser.add_argument("--shard", help="INDEX/COUNT, run a single slice in this process")
+    parser.add_argument("--workers", type=int, help="run every slice in this many local processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy", default=EXHAUSTIVE)
+    parser.add_argument("--strength", type=int)
+    parser.add_argument("--compiled", action="store_true")
+    parser.add_argument("--max-in-flight", type=int, default=10)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--merge", nargs="+", metavar="REPORT", help="merge shard reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.merge:
+        reports = []
+        for path in args.merge:
+            with open(path) as f:
+                reports.append(json.load(f))
+        report = merge_reports(reports)
+    else:
+        if args.url is None:
+            parser.error("url is required unless --merge is given")
+
+        from gqltst.cache import SchemaCache
+
+        headers = dict([[v.strip() for v in h.split(":", 1)] for h in args.header])
+        options = {"strategy": args.strategy, "strength": args.strength, "compiled": args.compiled,
+                   "max_in_flight": args.max_in_flight}
+        if args.shard is not None:
+            report = run_shard(args.url, headers, Shard.parse(args.shard), args.seed, SchemaCache(), options)
+        else:
+            report = run_sharded(args.url, headers, args.workers, args.seed, SchemaCache(), **options)
+
+    content = json.dumps(report, indent=2, default=str)
+    if args.output is None:
+        print(content)
+    else:
+        with open(args.output, "w") as f:
+            f.write(content)
+
+    return 1 if report["failed"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
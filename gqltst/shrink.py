@@ -0,0 +1,215 @@
+import asyncio
+import re
+from collections import OrderedDict
+
+from gqltst.canonical import get_canonical_hash
+from gqltst.combinations import VariablesPrefix, get_context
+
+# values quoted or numbered in an error message differ between probes of the same failure
+literal_re = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|-?\d+(?:\.\d+)?')
+
+
+def get_failure_key(result):
+    # what a probe has to reproduce to count as the same failure, None for a pass
+    if result.success:
+        return None
+    if result.error is not None:
+        return ("error", literal_re.sub("_", result.error.split(":")[0]))
+    if result.errors:
+        error = result.errors[0]
+        message = error.get("message", error) if type(error) == dict else error
+        return ("errors", result.status, literal_re.sub("_", str(message)))
+    if result.validation:
+        return ("validation", str(result.validation[0]).split(":")[0])
+    return ("status", result.status)
+
+
+def get_size(value):
+    if type(value) in [int, float]:
+        return abs(value)
+    if type(value) == str:
+        return len(value)
+    if type(value) in [list, tuple]:
+        return len(value) + sum([get_size(v) for v in value])
+    if type(value) == dict:
+        return len(value) + sum([get_size(v) for v in value.values()])
+    return 0
+
+
+class ShrunkFailure(object):
+    def __init__(self, result, shrunk, values, dropped, simplified, probes):
+        self.result = result
+        self.shrunk = shrunk
+        self.values = values
+        self.dropped = dropped
+        self.simplified = simplified
+        self.probes = probes
+
+    def get_arguments(self):
+        arguments = OrderedDict()
+        for key, value in zip(self.result.source.query_data.variables.keys(), self.values):
+            if value is not None:
+                arguments[key] = value
+        return arguments
+
+    def __str__(self):
+        arguments = ", ".join(["%s=%r" % (k, v) for k, v in self.get_arguments().items()])
+        return "%s\n    minimal (%d probes, %d dropped, %d simplified): %s\n    %s" % (
+            self.result, self.probes, len(self.dropped), len(self.simplified), arguments or "no arguments",
+            self.shrunk.query)
+
+
+class Shrinker(object):
+    # Delta debugging over the arguments of failing requests: first drop
+    # (render as absent) as many nullable arguments as possible while the
+    # failure reproduces, then move every remaining value to the earliest, no
+    # bigger one its resolver yields. Probes are memoized by canonical request hash,
+    # seeded with the requests of the main run and shared by every failure being
+    # shrunk, so nothing is sent twice.
+    def __init__(self, executor, scalars={}, compiled=False, alternatives=8):
+        self.executor = executor
+        self.scalars = scalars
+        self.compiled = compiled
+        self.alternatives = alternatives
+        self.probes = {}
+        self.semaphore = None
+        self.sent = 0
+        self.hits = 0
+
+    async def send(self, session, test_query, values):
+        async with self.semaphore:
+            self.sent += 1
+            result = await self.executor.send(session, test_query.render(values, self.compiled), values, test_query)
+
+        if result.data is not None:
+            result.validation = test_query.validate(result.data, self.scalars)
+        return result
+
+    def remember(self, key, result):
+        # known results are kept as they are, only probes in flight are futures
+        if key not in self.probes.keys():
+            self.probes[key] = result
+
+    async def probe(self, session, test_query, values, keys):
+        key = get_canonical_hash(test_query.render(values, self.compiled))
+        keys.add(key)
+        if key in self.probes.keys():
+            self.hits += 1
+        else:
+            self.probes[key] = asyncio.ensure_future(self.send(session, test_query, values))
+
+        probe = self.probes[key]
+        if isinstance(probe, asyncio.Future):
+            return await probe
+        return probe
+
+    async def find_failing(self, session, test_query, candidates, expected, keys):
+        # every candidate is probed at once, the first (in order) that fails the same way wins
+        results = await asyncio.gather(*[self.probe(session, test_query, values, keys) for values in candidates])
+        for values, result in zip(candidates, results):
+            if get_failure_key(result) == expected:
+                return values, result
+        return None, None
+
+    def get_droppable(self, test_query, values):
+        variables = list(test_query.query_data.variables.values())
+        # type.non_null is set for a non-null item of a list too, only an outer ! makes the argument required
+        return [i for i, value in enumerate(values)
+                if value is not None and not variables[i]["node"].type.signature.endswith("!")]
+
+    def drop(self, values, indexes):
+        return [None if i in indexes else v for i, v in enumerate(values)]
+
+    async def drop_arguments(self, session, test_query, values, result, expected, keys):
+        # ddmin: try removing each chunk, then everything but each chunk, refining on failure to reduce
+        droppable = self.get_droppable(test_query, values)
+        chunks = 2
+        while len(droppable) > 0:
+            size = -(-len(droppable) // chunks)
+            parts = [droppable[i:i + size] for i in range(0, len(droppable), size)]
+
+            candidates = [self.drop(values, part) for part in parts]
+            if len(parts) > 2:
+                candidates.extend([self.drop(values, [i for i in droppable if i not in part]) for part in parts])
+
+            reduced, reduced_result = await self.find_failing(session, test_query, candidates, expected, keys)
+            if reduced is not None:
+                values, result = reduced, reduced_result
+                droppable = self.get_droppable(test_query, values)
+                chunks = max(chunks - 1, 2)
+            elif chunks < len(droppable):
+                chunks = min(chunks * 2, len(droppable))
+            else:
+                break
+
+        return values, result
+
+    def get_alternatives(self, test_query, values, index):
+        # values the resolver yields before the current one, in resolver order,
+        # that are not bigger than it (random resolvers have no useful order)
+        prefix = VariablesPrefix()
+        for key, value in list(zip(test_query.query_data.variables.keys(), values))[:index]:
+            prefix = prefix.extend(key, value)
+
+        resolver = list(test_query.query_data.variables.values())[index]["resolver"]
+        alternatives = []
+        for value in resolver(get_context(prefix)):
+            if value == values[index] or len(alternatives) >= self.alternatives:
+                break
+            if value is not None and value not in alternatives and get_size(value) <= get_size(values[index]):
+                alternatives.append(value)
+        return alternatives
+
+    async def simplify_values(self, session, test_query, values, result, expected, keys):
+        simplified = []
+        for index in range(len(values)):
+            if values[index] is None:
+                continue
+
+            candidates = []
+            for value in self.get_alternatives(test_query, values, index):
+                candidate = list(values)
+                candidate[index] = value
+                candidates.append(candidate)
+
+            reduced, reduced_result = await self.find_failing(session, test_query, candidates, expected, keys)
+            if reduced is not None:
+                values, result = reduced, reduced_result
+                simplified.append(list(test_query.query_data.variables.keys())[index])
+
+        return values, result, simplified
+
+    async def shrink(self, session, result):
+        test_query = result.source
+        expected = get_failure_key(result)
+        keys = set()
+
+        # the failing request itself never needs to be sent again
+        self.remember(get_canonical_hash(test_query.render(result.values, self.compiled)), result)
+
+        values, shrunk = await self.drop_arguments(session, test_query, list(result.values), result, expected, keys)
+        dropped = [k for k, before, after in zip(test_query.query_data.variables.keys(), result.values, values)
+                   if before is not None and after is None]
+        values, shrunk, simplified = await self.simplify_values(session, test_query, values, shrunk, expected, keys)
+
+        return ShrunkFailure(result, shrunk, values, dropped, simplified, len(keys))
+
+    async def shrink_all(self, results, session=None, sent=None):
+        # independent failures shrink concurrently, the executor's max_in_flight bounds the probes
+        # sent holds results of requests already made (the main run), probes reuse them
+        own_session = session is None
+        if own_session:
+            session = self.executor.create_session()
+
+        self.semaphore = asyncio.Semaphore(self.executor.max_in_flight)
+        for result in (sent or []):
+            self.remember(get_canonical_hash(result.query), result)
+        try:
+            shrinkable = [r for r in results if not r.success and hasattr(r.source, "render") and r.values]
+            return await asyncio.gather(*[self.shrink(session, r) for r in shrinkable])
+        finally:
+            if own_session:
+                await session.close()
+
+    def run(self, results, sent=None):
+        return asyncio.run(self.shrink_all(results, sent=sent))
@@ -0,0 +1,175 @@
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+from gqltst.canonical import get_canonical_hash
+from gqltst.executor import Executor
+
+
+class NotRecorded(aiohttp.ClientError):
+    pass
+
+
+class ResponseStore(object):
+    # SQLite file of responses keyed by the canonical hash of the request
+    # payload, written by RecordingExecutor and served by ReplayExecutor.
+    def __init__(self, path, commit_every=100):
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            hash TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            status INTEGER,
+            body BLOB,
+            ttfb REAL,
+            total REAL,
+            recorded REAL
+        )""")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.commit()
+
+    def get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        self.connection.commit()
+
+    def record(self, payload, status, body, timing=None):
+        self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            get_canonical_hash(payload),
+            json.dumps(payload, default=str),
+            status,
+            body,
+            None if timing is None else timing.ttfb,
+            None if timing is None else timing.total,
+            time.time(),
+        ))
+
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.flush()
+
+    def get(self, key):
+        row = self.connection.execute("SELECT hash, payload, status, body, ttfb, total, recorded FROM responses "
+                                      "WHERE hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        return OrderedDict(zip(["hash", "payload", "status", "body", "ttfb", "total", "recorded"], row))
+
+    def find(self, payload):
+        return self.get(get_canonical_hash(payload))
+
+    def keys(self):
+        return [row[0] for row in self.connection.execute("SELECT hash FROM responses ORDER BY hash")]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def flush(self):
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+class RecordingExecutor(Executor):
+    def __init__(self, store, *args, **kwargs):
+        super(RecordingExecutor, self).__init__(*args, **kwargs)
+        self.store = store
+
+    async def post(self, session, payload, timing=None):
+        status, body = await super(RecordingExecutor, self).post(session, payload, timing)
+        self.store.record(payload, status, body, timing)
+        return status, body
+
+
+class ReplayExecutor(Executor):
+    # Serves recorded responses and never touches the network; requests that
+    # were not recorded fail like a connection error would.
+    def __init__(self, store, *args, **kwargs):
+        super(ReplayExecutor, self).__init__(*args, **kwargs)
+        self.store = store
+
+    async def post(self, session, payload, timing=None):
+        entry = self.store.find(payload)
+        if entry is None:
+            raise NotRecorded("No recorded response for %s" % get_canonical_hash(payload))
+
+        if timing is not None:
+            timing.ttfb = entry["ttfb"]
+            timing.finish(len(entry["body"]))
+            timing.total = entry["total"]
+
+        return entry["status"], entry["body"]
+
+
+def get_body(entry):
+    try:
+        return json.loads(entry["body"])
+    except (TypeError, ValueError):
+        return entry["body"]
+
+
+def diff_stores(old, new):
+    old_keys = set(old.keys())
+    new_keys = set(new.keys())
+
+    changed = []
+    for key in sorted(old_keys & new_keys):
+        before = old.get(key)
+        after = new.get(key)
+        if before["status"] != after["status"] or get_body(before) != get_body(after):
+            changed.append((key, before, after))
+
+    diff = OrderedDict()
+    diff["added"] = sorted(new_keys - old_keys)
+    diff["removed"] = sorted(old_keys - new_keys)
+    diff["changed"] = changed
+    diff["unchanged"] = len(old_keys & new_keys) - len(changed)
+    return diff
+
+
+def format_diff(diff, old, new):
+    lines = []
+    for key in diff["added"]:
+        lines.append("+ %s" % json.loads(new.get(key)["payload"]))
+    for key in diff["removed"]:
+        lines.append("- %s" % json.loads(old.get(key)["payload"]))
+    for key, before, after in diff["changed"]:
+        lines.append("~ %s" % json.loads(after["payload"]))
+        lines.append("    HTTP %s: %s" % (before["status"], json.dumps(get_body(before), sort_keys=True)))
+        lines.append("    HTTP %s: %s" % (after["status"], json.dumps(get_body(after), sort_keys=True)))
+
+    lines.append("%d added, %d removed, %d changed, %d unchanged" % (len(diff["added"]), len(diff["removed"]),
+                                                                    len(diff["changed"]), diff["unchanged"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gqltst.store", description="Compare two recordings")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    old = ResponseStore(args.old)
+    new = ResponseStore(args.new)
+    diff = diff_stores(old, new)
+    print(format_diff(diff, old, new))
+
+    return 1 if diff["added"] or diff["removed"] or diff["changed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import codecs
+import json
+import re
+
+TYPES_PATH = ["data", "__schema", "types"]
+
+
+class TypesStreamParser(object):
+    # Incremental reader for an introspection response: feed() takes raw chunks
+    # and returns every element of data.__schema.types completed so far, so
+    # only one element is kept as text and as a dict at any time. Brackets are
+    # tracked only down to the types array; elements are decoded by the json
+    # module as soon as they are complete.
+    special_re = re.compile(r'["{}\[\]]')
+    string_re = re.compile(r'"(?:[^"\\]|\\.)*"')
+    separator_re = re.compile(r'[\s,]*')
+
+    def __init__(self, path=None):
+        self.path = TYPES_PATH if path is None else path
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.stack = []
+        self.last_string = None
+        self.last_string_end = None
+        self.in_array = False
+        self.found = False
+        self.retry_size = 0
+
+    def get_key(self, position):
+        if self.last_string_end is not None and self.buffer[self.last_string_end:position].strip() == ":":
+            return self.last_string
+        return None
+
+    def read_elements(self, elements, final):
+        while True:
+            self.position = self.separator_re.match(self.buffer, self.position).end()
+            if self.position >= len(self.buffer):
+                return False
+
+            if self.buffer[self.position] == "]":
+                self.in_array = False
+                self.stack.pop()
+                self.position += 1
+                return True
+
+            if not final and len(self.buffer) - self.position < self.retry_size:
+                return False
+
+            try:
+                element, self.position = self.json_decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if final:
+                    raise Exception("Malformed introspection response")
+                # incomplete element: wait until the buffer doubles before parsing it again
+                self.retry_size = 2 * (len(self.buffer) - self.position)
+                return False
+
+            self.retry_size = 0
+            elements.append(element)
+
+    def feed(self, chunk, final=False):
+        self.buffer += self.decoder.decode(chunk, final)
+
+        elements = []
+        while True:
+            if self.in_array:
+                if not self.read_elements(elements, final):
+                    break
+                continue
+
+            match = self.special_re.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+                break
+
+            char = match.group(0)
+            position = match.start()
+            if char == '"':
+                string = self.string_re.match(self.buffer, position)
+                if string is None:
+                    # the string continues in the next chunk
+                    self.position = position
+                    break
+                self.last_string = string.group(0)[1:-1]
+                self.last_string_end = string.end()
+                self.position = string.end()
+                continue
+
+            self.position = position + 1
+            if char in "{[":
+                self.stack.append(self.get_key(position))
+                if char == "[" and not self.found and self.stack[1:] == self.path:
+                    self.found = True
+                    self.in_array = True
+            else:
+                if len(self.stack) == 0:
+                    raise Exception("Malformed introspection response")
+                self.stack.pop()
+
+            self.last_string_end = None
+
+        self.compact()
+        return elements
+
+    def compact(self):
+        # drop everything before the element (or token) still being read
+        start = self.position
+        if self.last_string_end is not None:
+            # keep the text after the last string to tell whether it was a key
+            start = min(start, self.last_string_end)
+        if start > 0:
+            self.buffer = self.buffer[start:]
+            self.position -= start
+            if self.last_string_end is not None:
+                self.last_string_end -= start
+
+
+def iter_types(chunks, digest=None):
+    parser = TypesStreamParser()
+    for chunk in chunks:
+        if digest is not None:
+            digest.update(chunk)
+        for element in parser.feed(chunk):
+            yield element
+
+    for element in parser.feed(b"", True):
+        yield element
+
+    if not parser.found:
+        raise Exception("No __schema.types in introspection response")
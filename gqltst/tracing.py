@@ -0,0 +1,200 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# the enabled Tracer, None keeps every span() call down to one global lookup
+TRACER = None
+
+CURRENT = contextvars.ContextVar("gqltst_span", default=None)
+
+# OTLP span kinds
+INTERNAL = 1
+CLIENT = 3
+
+
+class NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+    __slots__ = ("tracer", "name", "category", "attributes", "is_async", "span_id", "parent_id", "thread",
+                 "start", "end", "token")
+
+    def __init__(self, tracer, name, category, attributes, is_async=False):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self.is_async = is_async
+        self.span_id = tracer.get_span_id()
+        self.parent_id = None
+        self.thread = None
+        self.start = None
+        self.end = None
+        self.token = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        parent = CURRENT.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+        self.thread = threading.get_ident()
+        self.token = CURRENT.set(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.end = time.perf_counter_ns()
+        CURRENT.reset(self.token)
+        self.token = None
+        if error_type is not None:
+            self.attributes["error"] = error_type.__name__
+        self.tracer.finish(self)
+        return False
+
+
+def get_otlp_value(value):
+    if type(value) == bool:
+        return {"boolValue": value}
+    if type(value) == int:
+        return {"intValue": str(value)}
+    if type(value) == float:
+        return {"doubleValue": value}
+    if type(value) in [list, tuple]:
+        return {"arrayValue": {"values": [get_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+class Tracer(object):
+    # Collects finished spans in memory; hooks are called with every finished
+    # span. Past max_spans new spans are only counted, so a long run cannot
+    # exhaust memory through tracing.
+    def __init__(self, service="gqltst", max_spans=1000000):
+        self.service = service
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+        self.hooks = []
+        self.trace_id = os.urandom(16).hex()
+        self.counter = 0
+        self.pid = os.getpid()
+        # perf_counter_ns has no epoch, exports are shifted to wall clock time
+        self.epoch = time.time_ns() - time.perf_counter_ns()
+
+    def get_span_id(self):
+        self.counter += 1
+        return self.counter
+
+    def span(self, name, category="gqltst", attributes=None, is_async=False):
+        return Span(self, name, category, {} if attributes is None else attributes, is_async)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def finish(self, span):
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+        for hook in self.hooks:
+            hook(span)
+
+    def get_chrome_trace(self):
+        # trace event format: sync spans as complete events, spans of concurrent
+        # requests as async begin/end pairs so they do not have to nest
+        events = []
+        for span in self.spans:
+            args = dict(span.attributes)
+            start = span.start / 1000.0
+            if span.is_async:
+                for phase, ts in [("b", start), ("e", span.end / 1000.0)]:
+                    events.append(OrderedDict([("name", span.name), ("cat", span.category), ("ph", phase),
+                                               ("id", span.span_id), ("ts", ts), ("pid", self.pid),
+                                               ("tid", span.thread), ("args", args if phase == "b" else {})]))
+            else:
+                events.append(OrderedDict([("name", span.name), ("cat", span.category), ("ph", "X"), ("ts", start),
+                                           ("dur", (span.end - span.start) / 1000.0), ("pid", self.pid),
+                                           ("tid", span.thread), ("args", args)]))
+
+        events.sort(key=lambda e: e["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"service": self.service, "dropped_spans": self.dropped}}
+
+    def get_otlp(self):
+        # OTLP/JSON ExportTraceServiceRequest, as accepted by collectors' file receivers
+        spans = []
+        for span in self.spans:
+            entry = OrderedDict()
+            entry["traceId"] = self.trace_id
+            entry["spanId"] = "%016x" % span.span_id
+            if span.parent_id is not None:
+                entry["parentSpanId"] = "%016x" % span.parent_id
+            entry["name"] = span.name
+            entry["kind"] = CLIENT if span.is_async else INTERNAL
+            entry["startTimeUnixNano"] = str(self.epoch + span.start)
+            entry["endTimeUnixNano"] = str(self.epoch + span.end)
+            attributes = [("category", span.category)] + list(span.attributes.items())
+            entry["attributes"] = [{"key": k, "value": get_otlp_value(v)} for k, v in attributes]
+            spans.append(entry)
+
+        resource = {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]}
+        return {"resourceSpans": [{"resource": resource,
+                                   "scopeSpans": [{"scope": {"name": "gqltst"}, "spans": spans}]}]}
+
+    def write_chrome(self, path):
+        with open(path, "w") as fh:
+            json.dump(self.get_chrome_trace(), fh)
+
+    def write_otlp(self, path):
+        with open(path, "w") as fh:
+            json.dump(self.get_otlp(), fh)
+
+
+def enable(tracer=None):
+    global TRACER
+    TRACER = Tracer() if tracer is None else tracer
+    return TRACER
+
+
+def disable():
+    global TRACER
+    tracer = TRACER
+    TRACER = None
+    return tracer
+
+
+def span(name, category="gqltst", is_async=False, **attributes):
+    # attributes are kept by reference, pass values that are cheap to build
+    if TRACER is None:
+        return NULL_SPAN
+    return TRACER.span(name, category, attributes, is_async)
+
+
+def trace_iterator(iterable, name, category="gqltst", **attributes):
+    # one span per item, covering only the time spent producing it
+    iterator = iter(iterable)
+    while True:
+        with span(name, category, **attributes):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -1,12 +1,16 @@
-import random
 import uuid
 from datetime import datetime, timedelta
 
+from gqltst.reslovers import RANDOM
+
 
 class BaseResolver(object):
     def escape(self, value):
         pass
 
+    def serialize(self, value):
+        return value
+
     def validate(self, data):
         return False
 
@@ -20,6 +24,9 @@ class StringResolver(BaseResolver):
     def escape(self, value):
         return "\"%s\"" % (str(value))
 
+    def serialize(self, value):
+        return str(value)
+
     def validate(self, data):
         if data is None:
             return True
@@ -38,6 +45,9 @@ class DateTimeResolver(BaseResolver):
     def escape(self, value):
         return "\"%s\"" % (str(value))
 
+    def serialize(self, value):
+        return str(value)
+
     def validate(self, data):
         if data is None:
             return True
@@ -48,13 +58,16 @@ class DateTimeResolver(BaseResolver):
 class IntResolver(BaseResolver):
     @staticmethod
     def resolve(context):
-        yield random.randint(1, 10)
+        yield RANDOM.randint(1, 10)
 
     def escape(self, value):
         if value is not None:
             return int(value)
         return value
 
+    def serialize(self, value):
+        return self.escape(value)
+
     def validate(self, data):
         if data is None:
             return True
@@ -65,11 +78,14 @@ class IntResolver(BaseResolver):
 class FloatResolver(BaseResolver):
     @staticmethod
     def resolve(context):
-        yield random.randint(1, 10)
+        yield RANDOM.randint(1, 10)
 
     def escape(self, value):
         return float(value)
 
+    def serialize(self, value):
+        return self.escape(value)
+
     def validate(self, data):
         if data is None:
             return True
@@ -80,7 +96,7 @@ class FloatResolver(BaseResolver):
 class BooleanResolver(BaseResolver):
     @staticmethod
     def resolve(context):
-        yield random.choice([True, False])
+        yield RANDOM.choice([True, False])
 
     def escape(self, value):
         if value:
@@ -88,12 +104,15 @@ class BooleanResolver(BaseResolver):
         else:
             return "false"
 
+    def serialize(self, value):
+        return bool(value)
+
     def validate(self, data):
         return type(data) == bool
 
 
 class ValidationResult(object):
-    def __init__(self, error=None, node=None, data=None):
+    def __init__(self, error=None, node=None, data=None, path=None):
         if error is None:
             self.success = True
             self.error = None
@@ -103,8 +122,11 @@ class ValidationResult(object):
 
         self.node = node
         self.data = data
+        self.path = path
 
     def __str__(self):
+        if self.path is not None:
+            return "%s at %s" % (str(self.error), self.path)
         return "%s" % (str(self.error))
 
 SCALAR_TYPES = {
@@ -0,0 +1,189 @@
+from gqltst.types import ValidationResult
+
+MISSING = object()
+
+# kinds of validator spec nodes
+OBJECT = "object"
+ENUM = "enum"
+SCALAR = "scalar"
+TYPENAME = "typename"
+
+SCALAR_PYTHON_TYPES = {
+    "Int": (int,),
+    "Float": (int, float),
+    "String": (str,),
+    "Boolean": (bool,),
+    "ID": (str, int),
+}
+
+
+def format_path(path):
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(str(key))
+    keys.reverse()
+    # None at the root, so failures there are not reported "at" an empty path
+    return ".".join(keys) or None
+
+
+def get_signature(otype):
+    if otype.signature is not None:
+        return otype.signature
+
+    signature = otype.name
+    if otype.is_list:
+        signature = "[%s]" % signature
+    if otype.non_null:
+        signature = "%s!" % signature
+    return signature
+
+
+class ValidatorCompiler(object):
+    # Describes a selection as a compact JSON spec, one [name, signature, kind,
+    # detail] node per selected field, then turns the spec into a tree of
+    # closures once, so validating a response is a single pass over the JSON
+    # with no registry lookups per node. Plans store the spec.
+    def __init__(self, types, scalars):
+        self.types = types
+        self.scalars = scalars
+
+    def compile_query(self, test_query):
+        return self.compile_spec(self.get_spec(test_query))
+
+    def get_spec(self, test_query):
+        fields = []
+        obj = self.types["Query"]
+        for name in test_query.query_data.path:
+            field = obj.fields[name]
+            fields.append(field)
+            if not field.is_leaf_type(field.type):
+                obj = self.types[field.type.name]
+
+        leaf = fields[-1]
+        children = None
+        if not leaf.is_leaf_type(leaf.type):
+            children = self.types[leaf.type.name].get_selection_tree(self.types)
+
+        spec = self.get_field_spec(leaf.name, leaf, children)
+        for i in reversed(range(len(fields) - 1)):
+            spec = [fields[i].name, get_signature(fields[i].type), OBJECT, [spec]]
+
+        return [spec]
+
+    def get_field_spec(self, name, field, children):
+        if field is None:
+            return [name, None, TYPENAME, None]
+
+        if children is not None:
+            return [name, get_signature(field.type), OBJECT,
+                    [self.get_field_spec(n, f, c) for n, f, c in children]]
+
+        otype = field.type
+        if otype.kind == "ENUM":
+            return [name, get_signature(otype), ENUM, [otype.name, sorted(self.types[otype.name].enum_values.keys())]]
+        return [name, get_signature(otype), SCALAR, otype.name]
+
+    def compile_spec(self, spec):
+        root = self.compile_object(None, [(node[0], self.compile_node(node)) for node in spec])
+
+        def validate(data):
+            failures = []
+            root(data, None, failures)
+            return failures
+
+        return validate
+
+    def compile_node(self, node):
+        name, signature, kind, detail = node
+        if kind == TYPENAME:
+            return self.compile_python_type(None, name, (str,))
+
+        if kind == OBJECT:
+            named = self.compile_object(name, [(child[0], self.compile_node(child)) for child in detail])
+        elif kind == ENUM:
+            named = self.compile_enum(name, detail[0], detail[1])
+        else:
+            named = self.compile_scalar(name, detail)
+
+        return self.compile_type(name, signature, named)
+
+    def compile_type(self, field, signature, named):
+        non_null = signature.endswith("!")
+        if non_null:
+            signature = signature[:-1]
+
+        if signature.startswith("["):
+            item = self.compile_type(field, signature[1:-1], named)
+
+            def inner(value, path, failures):
+                if type(value) is not list:
+                    failures.append(ValidationResult("Expected list", field, value, format_path(path)))
+                    return
+                for i, v in enumerate(value):
+                    item(v, (path, i), failures)
+        else:
+            inner = named
+
+        if non_null:
+            def check(value, path, failures):
+                if value is None:
+                    failures.append(ValidationResult("Non-null value is null", field, value, format_path(path)))
+                    return
+                inner(value, path, failures)
+        else:
+            def check(value, path, failures):
+                if value is not None:
+                    inner(value, path, failures)
+
+        return check
+
+    def compile_object(self, field, checks):
+        checks = tuple(checks)
+
+        def check(value, path, failures):
+            if type(value) is not dict:
+                failures.append(ValidationResult("Expected object", field, value, format_path(path)))
+                return
+            for name, field_check in checks:
+                item = value.get(name, MISSING)
+                if item is MISSING:
+                    failures.append(ValidationResult("Missing field %s" % name, field, value, format_path(path)))
+                else:
+                    field_check(item, (path, name), failures)
+
+        return check
+
+    def compile_enum(self, field, name, values):
+        allowed = frozenset(values)
+
+        def check(value, path, failures):
+            if type(value) is not str or value not in allowed:
+                failures.append(ValidationResult("Unknown %s value" % name, field, value, format_path(path)))
+
+        return check
+
+    def compile_scalar(self, field, name):
+        if name in SCALAR_PYTHON_TYPES.keys():
+            return self.compile_python_type(field, name, SCALAR_PYTHON_TYPES[name])
+
+        if name in self.scalars.keys():
+            validate = self.scalars[name]().validate
+
+            def check(value, path, failures):
+                if not validate(value):
+                    failures.append(ValidationResult("Invalid %s value" % name, field, value, format_path(path)))
+
+            return check
+
+        def check(value, path, failures):
+            pass
+
+        return check
+
+    def compile_python_type(self, field, name, allowed):
+        def check(value, path, failures):
+            if type(value) not in allowed:
+                failures.append(ValidationResult("Invalid %s value" % name, field, value, format_path(path)))
+
+        return check
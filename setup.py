@@ -14,6 +14,10 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/pyatka/gqltst",
     packages=setuptools.find_packages(),
+    install_requires=[
+        "requests",
+        "aiohttp",
+    ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
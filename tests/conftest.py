@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from aiohttp import web
+
+graphql = pytest.importorskip("graphql")
+
+SDL = """
+enum Order { ASC DESC }
+enum Color { RED GREEN BLUE }
+type PageInfo { hasNextPage: Boolean! endCursor: String }
+type User { id: ID! name: String! age: Int color: Color
+  friends(first: Int, last: Int): UserConnection
+  bestFriend(id: ID): User }
+type UserEdge { cursor: String! node: User }
+type UserConnection { totalCount: Int! pageInfo: PageInfo! edges: [UserEdge] }
+type Query {
+  version: String
+  hello(name: String): String
+  user(id: ID!): User
+  users(first: Int, last: Int, order: Order, color: [Color!]): UserConnection
+}
+"""
+
+
+def get_user(i):
+    return {"id": i, "name": "u%d" % i, "age": 20 + i, "color": "RED",
+            "bestFriend": lambda info, **kw: get_user(i + 1),
+            "friends": lambda info, **kw: get_users(kw.get("first") or kw.get("last") or 2)}
+
+
+def get_users(n):
+    return {"totalCount": 100, "pageInfo": {"hasNextPage": True, "endCursor": "x"},
+            "edges": [{"cursor": str(i), "node": get_user(i)} for i in range(n)]}
+
+
+ROOT = {
+    "version": "1",
+    "hello": lambda info, **kw: "hello %s" % kw.get("name"),
+    "user": lambda info, id: get_user(int(id) if str(id).isdigit() else 0),
+    "users": lambda info, **kw: get_users(kw.get("first") or kw.get("last") or 3),
+}
+
+
+class StubServer(object):
+    # A GraphQL endpoint served by graphql-core from a background thread.
+    # Introspection is answered on GET, queries (single or array batches) on
+    # POST; every POST is counted together with the peak number in flight and
+    # the headers it carried. A status other than 200 fails every POST.
+    def __init__(self, sdl=SDL, root=ROOT, delay=0.0, status=200):
+        self.sdl = sdl
+        self.root = root
+        self.delay = delay
+        self.status = status
+        self.schema = graphql.build_schema(sdl)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.headers = []
+        self.bodies = []
+        self.loop = None
+        self.runner = None
+        self.url = None
+
+    def set_sdl(self, sdl):
+        self.sdl = sdl
+        self.schema = graphql.build_schema(sdl)
+
+    def run(self, body):
+        result = graphql.graphql_sync(self.schema, body.get("query"), root_value=self.root,
+                                      variable_values=body.get("variables"))
+        output = {"data": result.data}
+        if result.errors:
+            output["errors"] = [e.formatted for e in result.errors]
+        return output
+
+    async def handle(self, request):
+        if request.method == "GET":
+            query = request.query.get("query") or graphql.get_introspection_query()
+            return web.json_response(self.run({"query": query}))
+
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.headers.append(dict(request.headers))
+        try:
+            await asyncio.sleep(self.delay)
+            body = json.loads(await request.read())
+            self.bodies.append(body)
+            if self.status != 200:
+                return web.json_response({"errors": [{"message": "HTTP %d" % self.status}]}, status=self.status)
+            if type(body) == list:
+                return web.json_response([self.run(b) for b in body])
+            return web.json_response(self.run(body))
+        finally:
+            self.in_flight -= 1
+
+    def start(self):
+        started = threading.Event()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_route("*", "/graphql", self.handle)
+            self.runner = web.AppRunner(app)
+            await self.runner.setup()
+            site = web.TCPSite(self.runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.url = "http://127.0.0.1:%d/graphql" % port
+            started.set()
+
+        def main():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(serve())
+            self.loop.run_forever()
+
+        threading.Thread(target=main, daemon=True).start()
+        started.wait(10)
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(StubServer(**kwargs).start())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
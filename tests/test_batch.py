@@ -0,0 +1,69 @@
+import pytest
+
+from gqltst.batch import RESEND, AliasBatcher, ArrayBatcher
+from gqltst.executor import Executor
+from gqltst.schema import Schema
+
+ITEMS = [("query{users(first:1){totalCount}}", [1]), ("query{users(first:2){totalCount}}", [2])]
+
+
+@pytest.mark.parametrize("mode", ["alias", "array"])
+def test_batches_are_accepted(stub_server, mode):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(batch=mode, batch_size=4, deduplicate=False)
+
+    assert all([r.success for r in results]), [str(r) for r in results if not r.success]
+    assert server.requests < len(results)
+
+
+@pytest.mark.parametrize("mode", ["alias", "array"])
+def test_failed_batch_is_not_resent(stub_server, mode):
+    server = stub_server(status=503)
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(batch=mode, batch_size=4, deduplicate=False)
+
+    # resending every case alone would take more requests than there are cases
+    assert all([r.status == 503 and not r.success for r in results])
+    assert server.requests < len(results)
+
+
+def test_alias_pathless_errors_resend_every_case():
+    batcher = AliasBatcher(4)
+    content = {"data": None, "errors": [{"message": "Query is too complex"}]}
+
+    assert batcher.split(400, content, ITEMS) == RESEND
+    assert batcher.split(200, content, ITEMS) == RESEND
+    # a throttled or failed batch is not resent case by case
+    assert batcher.split(503, content, ITEMS) == [(None, content["errors"])] * 2
+    assert batcher.split(429, content, ITEMS) == [(None, content["errors"])] * 2
+
+
+def test_invalid_case_fails_alone(stub_server):
+    server = stub_server()
+    source = object()
+    queries = [("query{users(first:1){totalCount}}", [1], source), ("query{hello(name:5)}", [2], source),
+               ("query{users(first:2){totalCount}}", [3], source)]
+    batcher = AliasBatcher(4)
+    results = Executor(server.url, batcher=batcher).run(queries)
+
+    assert [r.success for r in sorted(results, key=lambda r: r.values)] == [True, False, True]
+    assert server.requests == 4
+    assert batcher.size == 4 and batcher.rejections == 0
+
+
+def test_alias_errors_follow_their_alias():
+    content = {"data": {"t0": None, "t1": {"totalCount": 2}},
+               "errors": [{"message": "boom", "path": ["t0", "totalCount"]}]}
+    parts = AliasBatcher(4).split(200, content, ITEMS)
+
+    assert parts[0] == ({"users": None}, [{"message": "boom", "path": ["users", "totalCount"]}])
+    assert parts[1] == ({"users": {"totalCount": 2}}, None)
+
+
+def test_unsupported_batches_are_rejected():
+    assert AliasBatcher(4).split(200, {"data": {"users": None}}, ITEMS) is None
+    assert ArrayBatcher(4).split(400, {"errors": [{"message": "Must provide query string."}]}, ITEMS) is None
+    assert ArrayBatcher(4).split(503, {"errors": [{"message": "down"}]}, ITEMS) == [(None, [{"message": "down"}])] * 2
@@ -0,0 +1,38 @@
+from gqltst import tracing
+from gqltst.cache import SchemaCache
+from gqltst.schema import Schema
+
+from conftest import SDL
+
+
+def test_unchanged_schema_is_not_rebuilt(stub_server, tmp_path, monkeypatch):
+    server = stub_server()
+    cache = SchemaCache(str(tmp_path))
+    first = Schema(server.url, cache=cache)
+
+    def build_types(self, types_data):
+        raise AssertionError("types built for an unchanged schema")
+
+    monkeypatch.setattr(Schema, "build_types", build_types)
+    tracer = tracing.enable()
+    try:
+        second = Schema(server.url, cache=cache)
+    finally:
+        tracing.disable()
+
+    assert second.schema_hash == first.schema_hash
+    assert sorted(second.types.keys()) == sorted(first.types.keys())
+    assert [s.attributes["cached"] for s in tracer.spans if s.name == "introspection"] == [True]
+
+
+def test_changed_schema_is_rebuilt(stub_server, tmp_path):
+    server = stub_server()
+    cache = SchemaCache(str(tmp_path))
+    first = Schema(server.url, cache=cache)
+
+    server.set_sdl(SDL.replace("hello(name: String)", "hello(name: Int)"))
+    second = Schema(server.url, cache=cache)
+
+    assert second.schema_hash != first.schema_hash
+    assert "~ argument Query.hello.name" in str(second.diff)
+    assert cache.load(server.url)["hash"] == second.schema_hash
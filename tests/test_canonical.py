@@ -0,0 +1,24 @@
+from gqltst.canonical import get_canonical_hash, normalize_document
+
+
+def test_normalize_document():
+    assert normalize_document("query { a(x: 1, y: \"b c\") { b c } }") == 'query{a(x:1 y:"b c"){b c}}'
+    assert normalize_document("query{\n  a # comment, {\n  ,,b\n}") == "query{a b}"
+    assert normalize_document('{a(s: "x # not a comment,")}') == '{a(s:"x # not a comment,")}'
+    assert normalize_document("{a(x: -1.5e3, y: ENUM) ... on T { b }}") == "{a(x:-1.5e3 y:ENUM)...on T{b}}"
+    assert normalize_document("{a b}") != normalize_document("{ab}")
+
+
+def test_canonical_hash_equivalences():
+    document = "query($a: Int, $b: String){ f(a: $a, b: $b) }"
+    payload = {"query": document, "variables": {"a": 1, "b": None}}
+
+    assert get_canonical_hash(payload) == get_canonical_hash({"query": "query($a:Int $b:String){f(a:$a b:$b)}",
+                                                              "variables": {"a": 1}})
+    assert get_canonical_hash({"query": document, "variables": {"b": "x", "a": 1}}) == \
+        get_canonical_hash({"query": document, "variables": {"a": 1, "b": "x"}})
+    assert get_canonical_hash({"query": "{f}"}) == get_canonical_hash("{ f }") == \
+        get_canonical_hash({"query": "{f}", "variables": None})
+    assert get_canonical_hash(payload) != get_canonical_hash({"query": document, "variables": {"a": 2}})
+    assert get_canonical_hash([payload]) != get_canonical_hash(payload)
+    assert get_canonical_hash([payload, "{f}"]) != get_canonical_hash(["{f}", payload])
@@ -0,0 +1,157 @@
+import itertools
+import random
+
+import pytest
+
+from gqltst.combinations import (EXHAUSTIVE, PAIRWISE, T_WISE, CoveringArray, VariablesPrefix, freeze,
+                                 get_combinations, iterate_combinations)
+from gqltst.reslovers import depend_resolver, range_resolver
+
+
+def get_rows(keys, resolvers, strategy, strength=None):
+    return [[freeze(v) for v in p.values()] for p in get_combinations(keys, resolvers, strategy, strength)]
+
+
+def get_feasible_tuples(keys, resolvers, strength):
+    # every t-tuple some complete combination contains
+    tuples = set()
+    for row in get_rows(keys, resolvers, EXHAUSTIVE):
+        for cols in itertools.combinations(range(len(keys)), strength):
+            tuples.add((cols, tuple([row[c] for c in cols])))
+    return tuples
+
+
+def assert_covers(keys, resolvers, strength, rows):
+    exhaustive = get_rows(keys, resolvers, EXHAUSTIVE)
+    assert all([row in exhaustive for row in rows])
+
+    missing = set(get_feasible_tuples(keys, resolvers, strength))
+    for row in rows:
+        for cols in itertools.combinations(range(len(keys)), strength):
+            missing.discard((cols, tuple([row[c] for c in cols])))
+    assert missing == set()
+
+
+def test_pairwise_covers_every_pair():
+    keys = ["a", "b", "c", "d", "e"]
+    resolvers = [range_resolver([1, 2, 3]) for _ in keys]
+    rows = get_rows(keys, resolvers, PAIRWISE)
+
+    assert_covers(keys, resolvers, 2, rows)
+    assert len(rows) < 3 ** 5 // 10
+
+
+@pytest.mark.parametrize("strength", [2, 3])
+def test_t_wise_covers_every_tuple(strength):
+    keys = ["a", "b", "c", "d", "e", "f"]
+    resolvers = [range_resolver([1, 2]), range_resolver(["x", "y", "z"]), range_resolver([True, False]),
+                 range_resolver([None, 0, 1]), range_resolver([[1], [2]]), range_resolver(["p", "q"])]
+
+    assert_covers(keys, resolvers, strength, get_rows(keys, resolvers, T_WISE, strength))
+
+
+def test_dependent_resolver_keeps_earlier_pairs():
+    # d has no value when c is x, rows ending in x must not take their a/b pairs with them
+    keys = ["a", "b", "c", "d"]
+    resolvers = [range_resolver([1, 2]), range_resolver([1, 2]), range_resolver(["x", "y"]),
+                 depend_resolver("c", "x", [], [7])]
+    rows = get_rows(keys, resolvers, PAIRWISE)
+
+    assert_covers(keys, resolvers, 2, rows)
+    assert [freeze(1), freeze(1), freeze("y"), freeze(7)] in rows
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_dependent_resolvers_are_covered(seed):
+    generator = random.Random(seed)
+    keys = ["k%d" % i for i in range(6)]
+    resolvers = []
+    for i, key in enumerate(keys):
+        values = list(range(generator.randint(1, 3)))
+        if i > 0 and generator.random() < 0.4:
+            parent = keys[generator.randrange(i)]
+            # some parent values leave nothing to choose
+            resolvers.append(depend_resolver(parent, 0, values, values[:generator.randint(0, len(values))]))
+        else:
+            resolvers.append(range_resolver(values))
+
+    if len(get_rows(keys, resolvers, EXHAUSTIVE)) == 0:
+        return
+    assert_covers(keys, resolvers, 2, get_rows(keys, resolvers, PAIRWISE))
+
+
+def test_infeasible_tuples_are_counted():
+    keys = ["a", "b", "c"]
+    resolvers = [range_resolver([1, 2]), range_resolver(["x", "y"]), depend_resolver("b", "x", [], [7])]
+    array = CoveringArray(keys, resolvers, 2)
+    rows = array.build()
+
+    assert all([array.tables[1][row[1]] == "y" for row in rows])
+    assert array.infeasible > 0
+
+
+def test_strength_below_one_is_rejected():
+    with pytest.raises(Exception):
+        CoveringArray(["a"], [range_resolver([1])], 0)
+
+
+def test_t_wise_needs_strength():
+    with pytest.raises(Exception):
+        get_combinations(["a"], [range_resolver([1])], T_WISE)
+
+
+def test_exhaustive_matches_product():
+    keys = ["a", "b", "c"]
+    resolvers = [range_resolver([1, 2]), range_resolver(["x", "y", "z"]), range_resolver([None, 0])]
+    rows = [p.values() for p in iterate_combinations(keys, resolvers)]
+
+    assert rows == [list(r) for r in itertools.product([1, 2], ["x", "y", "z"], [None, 0])]
+
+
+def test_combinations_are_produced_lazily():
+    calls = []
+
+    def endless(context):
+        calls.append(context["vars"].items())
+        return itertools.count()
+
+    combinations = iterate_combinations(["a", "b"], [range_resolver([1, 2]), endless])
+    first = list(itertools.islice(combinations, 3))
+
+    # the second resolver yields forever, only the first value of a is ever extended
+    assert [p.items() for p in first] == [[("a", 1), ("b", 0)], [("a", 1), ("b", 1)], [("a", 1), ("b", 2)]]
+    assert calls == [[("a", 1)]]
+
+
+def test_combinations_share_prefixes():
+    keys = ["a", "b", "c"]
+    combinations = list(iterate_combinations(keys, [range_resolver([1, 2]) for _ in keys]))
+
+    assert len(combinations) == 8
+    assert combinations[0].parent is combinations[1].parent
+    assert combinations[0].parent.parent is combinations[3].parent.parent
+    assert combinations[0].parent.parent is not combinations[4].parent.parent
+    assert len(set([id(p.parent.parent.parent) for p in combinations])) == 1
+
+
+def test_combinations_extend_a_given_prefix():
+    prefix = VariablesPrefix().extend("x", 0)
+    combinations = list(iterate_combinations(["a"], [depend_resolver("x", 0, [1, 2], [3])], prefix))
+
+    assert [p.items() for p in combinations] == [[("x", 0), ("a", 1)], [("x", 0), ("a", 2)]]
+    assert all([p.parent is prefix for p in combinations])
+
+
+def test_variables_prefix_mapping():
+    prefix = VariablesPrefix().extend("a", 1).extend("b", None).extend("a", 3)
+
+    assert len(prefix) == 3
+    assert prefix.keys() == ["a", "b", "a"]
+    assert prefix.values() == [1, None, 3]
+    # the latest value of a key wins
+    assert prefix["a"] == 3 and prefix.get("a") == 3
+    assert "b" in prefix and "c" not in prefix
+    assert prefix.get("c", 5) == 5
+    with pytest.raises(KeyError):
+        prefix["c"]
+    assert list(prefix) == ["a", "b", "a"]
@@ -0,0 +1,22 @@
+from gqltst.schema import Schema
+
+
+def test_planned_features_are_released_when_answered(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(coverage=True)
+
+    assert schema.coverage.requests == len(results)
+    assert schema.coverage.planned == set()
+    assert schema.coverage.get_ratio() > 0
+
+
+def test_patience_stops_early(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    everything = len(schema.test(deduplicate=False))
+    limited = len(schema.test(deduplicate=False, patience=3))
+
+    assert limited < everything
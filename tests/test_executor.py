@@ -0,0 +1,91 @@
+from gqltst.benchmark.runner import build_schema
+from gqltst.benchmark.synthetic import SyntheticSchema
+from gqltst.schema import MAX_SELECTION_DEPTH, Schema
+
+
+def get_depth(document):
+    depth = deepest = 0
+    for char in document:
+        if char == "{":
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == "}":
+            depth -= 1
+    return deepest
+
+
+def test_sends_every_query(stub_server):
+    server = stub_server(delay=0.01)
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(max_in_flight=4)
+
+    assert len(results) > 0
+    assert server.requests == len(results)
+    assert all([r.success for r in results]), [str(r) for r in results if not r.success]
+
+
+def test_max_in_flight_bounds_concurrency(stub_server):
+    server = stub_server(delay=0.05)
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    schema.test(max_in_flight=3, deduplicate=False)
+
+    assert 1 < server.max_in_flight <= 3
+
+
+def test_headers_sent_with_every_request(stub_server):
+    server = stub_server()
+    schema = Schema(server.url, headers={"Authorization": "Bearer abc"})
+    schema.prepare_queries()
+    results = schema.test()
+
+    assert len(server.headers) == len(results)
+    assert all([h.get("Authorization") == "Bearer abc" for h in server.headers])
+
+
+def test_timeout_is_reported_per_request(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    server.delay = 0.5
+    results = schema.test(timeout=0.1)
+
+    assert len(results) > 0
+    assert all([r.error == "Timeout after 0.1s" for r in results])
+
+
+def test_selection_expands_each_type_once():
+    # cycles reach every type through many paths, documents must stay bounded anyway
+    schema = build_schema(SyntheticSchema(types=300, cycles=0.5, seed=1).generate())
+    schema.prepare_queries(expand_once=True)
+
+    for test_query in schema.get_test_queries():
+        document = test_query.query
+        assert get_depth(document) <= len(test_query.query_data.path) + MAX_SELECTION_DEPTH + 1
+        assert len(document) < 20000
+
+
+def get_paths(schema):
+    return set([".".join(test_query.query_data.path) for test_query in schema.get_test_queries()])
+
+
+def test_fields_planned_through_every_path(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    paths = get_paths(schema)
+
+    assert "user.friends" in paths
+    assert "users.edges.node.friends" in paths
+    assert "user.bestFriend" in paths
+
+
+def test_expand_once_plans_each_field_once(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries(expand_once=True)
+    paths = get_paths(schema)
+
+    assert "user.friends" in paths
+    assert "users.edges.node.friends" not in paths
@@ -0,0 +1,52 @@
+from gqltst.cache import SchemaCache
+from gqltst.schema import Schema
+
+from conftest import SDL
+
+
+def run(server, cache, **kwargs):
+    schema = Schema(server.url, cache=cache, **kwargs)
+    schema.prepare_queries()
+    sent = server.requests
+    results = schema.test(incremental=True)
+    return results, [b["query"] for b in server.bodies[sent:]]
+
+
+def test_unchanged_schema_reuses_results(stub_server, tmp_path):
+    server = stub_server()
+    cache = SchemaCache(str(tmp_path))
+    first, _ = run(server, cache)
+    second, sent = run(server, cache)
+
+    assert sent == []
+    assert len(second) == len(first)
+
+
+def test_changed_argument_is_retested_after_refresh(stub_server, tmp_path):
+    # with refresh=True the schema cache holds no old types, so schema.diff
+    # is unset and only the stored results can tell what changed
+    server = stub_server()
+    cache = SchemaCache(str(tmp_path))
+    run(server, cache)
+
+    server.set_sdl(SDL.replace("hello(name: String)", "hello(name: Int)"))
+    results, sent = run(server, cache, refresh=True)
+
+    assert len(sent) > 0
+    assert all(["hello" in q for q in sent])
+    assert all([r.success for r in results if r.source.query_data.path == ["hello"]])
+
+
+def test_changed_argument_is_retested_when_cache_is_current(stub_server, tmp_path):
+    server = stub_server()
+    cache = SchemaCache(str(tmp_path))
+    run(server, cache)
+
+    server.set_sdl(SDL.replace("hello(name: String)", "hello(name: Int)"))
+    Schema(server.url, cache=cache)
+    schema = Schema(server.url, cache=cache)
+    assert schema.diff is None
+
+    _, sent = run(server, cache)
+    assert len(sent) > 0
+    assert all(["hello" in q for q in sent])
@@ -0,0 +1,98 @@
+from gqltst.limits import AIMDLimiter, GradientLimiter, get_limiter
+
+
+def feed(limiter, samples, in_flight=None):
+    for sample in samples:
+        rtt, status = sample[:2]
+        retry_after = sample[2] if len(sample) > 2 else None
+        limiter.on_sample(rtt, limiter.limit if in_flight is None else in_flight, status, None, retry_after)
+
+
+def get_reasons(limiter):
+    return [reason for _, reason, _, _ in limiter.metrics.backoffs]
+
+
+def test_aimd_grows_while_the_limit_is_used():
+    limiter = get_limiter("aimd", max_limit=50, initial=10)
+    feed(limiter, [(0.1, 200)] * 200)
+
+    assert limiter.limit > 10
+    assert limiter.metrics.backoffs == []
+
+
+def test_aimd_idle_limit_does_not_grow():
+    limiter = AIMDLimiter(initial=10)
+    feed(limiter, [(0.1, 200)] * 200, in_flight=1)
+
+    assert limiter.limit == 10
+
+
+def test_aimd_backs_off_on_drops():
+    for status in [429, 500, 502, 503]:
+        limiter = AIMDLimiter(initial=20, backoff=0.0)
+        feed(limiter, [(0.1, status)] * 3)
+
+        assert limiter.limit == int(20 * 0.9 ** 3), status
+        assert limiter.metrics.drops == 3
+        assert get_reasons(limiter) == ["HTTP %d" % status] * 3
+
+
+def test_client_errors_are_not_drops():
+    limiter = AIMDLimiter(initial=20)
+    feed(limiter, [(0.1, 400), (0.1, 404)])
+
+    assert limiter.limit == 20
+    assert limiter.metrics.drops == 0
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AIMDLimiter(initial=20, backoff=5.0)
+    feed(limiter, [(0.1, 429, "2")])
+    assert 1.5 < limiter.get_delay() <= 2.0
+
+    # without Retry-After, or with an HTTP date, the default backoff applies
+    limiter = AIMDLimiter(initial=20, backoff=5.0)
+    feed(limiter, [(0.1, 503, "Wed, 21 Oct 2015 07:28:00 GMT")])
+    assert 4.5 < limiter.get_delay() <= 5.0
+
+    # a 500 shrinks the limit but does not pause
+    limiter = AIMDLimiter(initial=20, backoff=5.0)
+    feed(limiter, [(0.1, 500, "2")])
+    assert limiter.get_delay() == 0.0
+
+
+def test_default_aimd_backs_off_on_latency():
+    limiter = get_limiter("aimd", initial=20)
+    feed(limiter, [(0.1, 200)] * 50)
+    before = limiter.limit
+    feed(limiter, [(0.5, 200)] * 5)
+
+    assert limiter.limit < before
+    assert get_reasons(limiter) == ["latency"] * 5
+
+
+def test_aimd_fixed_latency_threshold():
+    limiter = AIMDLimiter(initial=20, latency_threshold=1.0)
+    feed(limiter, [(0.9, 200)] * 10)
+    assert get_reasons(limiter) == []
+
+    feed(limiter, [(1.1, 200)])
+    assert get_reasons(limiter) == ["latency"]
+
+
+def test_gradient_grows_at_steady_latency():
+    limiter = get_limiter("gradient", max_limit=100, initial=10)
+    feed(limiter, [(0.1, 200)] * 50)
+
+    assert limiter.limit > 10
+    assert get_reasons(limiter) == []
+
+
+def test_gradient_shrinks_on_rising_latency():
+    limiter = GradientLimiter(initial=50)
+    feed(limiter, [(0.1, 200)] * 20)
+    before = limiter.limit
+    feed(limiter, [(0.1 * (1 + i), 200) for i in range(20)])
+
+    assert limiter.limit < before
+    assert "latency" in get_reasons(limiter)
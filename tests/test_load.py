@@ -0,0 +1,101 @@
+import asyncio
+
+from gqltst.executor import ExecutionResult
+from gqltst.load import LoadCorpus, LoadRunner, RateProfile
+from gqltst.query import QueryData
+from gqltst.schema import Schema
+
+
+class FakeSession(object):
+    async def close(self):
+        pass
+
+
+class FakeExecutor(object):
+    # answers every request after delay seconds, without any HTTP
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = 0
+
+    def create_session(self):
+        return FakeSession()
+
+    async def send(self, session, query, values=None, source=None):
+        self.sent += 1
+        await asyncio.sleep(self.delay)
+        result = ExecutionResult(query, values, source)
+        result.status = 200
+        return result
+
+
+class FakeQuery(object):
+    def __init__(self, field):
+        self.query_data = QueryData()
+        self.query_data.path = [field]
+
+
+def get_requests(counts):
+    requests = []
+    for field, count in counts.items():
+        source = FakeQuery(field)
+        requests.extend([("query{%s(i:%d)}" % (field, i), [i], source) for i in range(count)])
+    return requests
+
+
+def test_constant_schedule():
+    schedule = list(RateProfile(10).get_schedule(0.95))
+
+    assert len(schedule) == 10
+    assert all([abs(b - a - 0.1) < 1e-9 for a, b in zip(schedule, schedule[1:])])
+
+
+def test_ramped_schedule():
+    profile = RateProfile(10, ramp_to=100, ramp=2)
+    assert profile.get_rate(0) == 10
+    assert profile.get_rate(1) == 55
+    assert profile.get_rate(5) == 100
+
+    schedule = list(profile.get_schedule(4.0))
+    gaps = [b - a for a, b in zip(schedule, schedule[1:])]
+    assert gaps[0] > gaps[-1]
+    assert abs(gaps[-1] - 0.01) < 1e-9
+    assert len([o for o in schedule if o >= 2]) == 200
+
+
+def test_corpus_weights():
+    corpus = LoadCorpus(get_requests({"a": 2, "b": 3, "c": 1}), {"a": 3, "c": 0}, seed=1)
+    assert len(corpus) == 6
+    assert corpus.fields == ["a", "b"]
+
+    drawn = [corpus.next() for _ in range(4000)]
+    share = len([f for f, _ in drawn if f == "a"]) / float(len(drawn))
+    assert 0.7 < share < 0.8
+    # requests of a field are cycled through in order
+    assert [item[1] for f, item in drawn if f == "b"][:4] == [[0], [1], [2], [0]]
+
+
+def test_corpus_is_seeded(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+
+    def draw(seed):
+        corpus = schema.get_load_corpus(seed=seed)
+        return [corpus.next()[1][:2] for _ in range(50)]
+
+    assert draw(3) == draw(3)
+
+
+def test_requests_over_max_outstanding_are_dropped():
+    executor = FakeExecutor(delay=0.5)
+    corpus = LoadCorpus(get_requests({"a": 5}))
+    report = LoadRunner(executor, corpus, RateProfile(100), 0.195, window=0.1, max_outstanding=3).run()
+
+    sent = sum([w.sent for w in report.windows])
+    dropped = sum([w.dropped for w in report.windows])
+    completed = sum([w.completed for w in report.windows])
+    assert sent == 20
+    assert executor.sent == completed == 3
+    assert dropped == sent - 3
+    # latency is counted from the intended send time
+    assert report.latency.percentile(50) >= 500000
@@ -0,0 +1,129 @@
+import json
+import math
+import random
+
+import pytest
+
+from gqltst.executor import ExecutionResult
+from gqltst.metrics import Histogram, LatencyReport, RequestTiming
+from gqltst.query import QueryData
+
+
+def get_exact_percentile(values, percent):
+    values = sorted(values)
+    return values[max(1, int(math.ceil(len(values) * percent / 100.0))) - 1]
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.record(value)
+
+    assert [histogram.percentile(p) for p in [1, 50, 95, 99, 100]] == [1, 50, 95, 99, 100]
+    assert (histogram.count, histogram.min, histogram.max, histogram.mean()) == (100, 1, 100, 50.5)
+
+
+def test_buckets_bound_the_relative_error():
+    histogram = Histogram(precision=8)
+    previous = -1
+    for value in list(range(0, 5000)) + [random.Random(1).randrange(1, 10 ** 9) for _ in range(5000)]:
+        index = histogram.get_index(value)
+        top = histogram.get_value(index)
+        assert value <= top <= value * (1 + 2.0 ** -7) + 1e-9, value
+        assert histogram.get_index(top) == index
+        if value < 5000:
+            assert index >= previous
+            previous = index
+
+
+def test_percentiles_match_exact_ones():
+    generator = random.Random(2)
+    values = [int(generator.lognormvariate(10, 1.5)) for _ in range(10000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    for percent in [50, 90, 95, 99, 99.9]:
+        exact = get_exact_percentile(values, percent)
+        assert exact <= histogram.percentile(percent) <= exact * (1 + 2.0 ** -7), percent
+    assert histogram.percentile(100) == max(values)
+
+
+def test_empty_and_negative_values():
+    histogram = Histogram()
+    assert histogram.percentile(50) is None and histogram.mean() is None
+
+    histogram.record(-5)
+    histogram.record(2.7, count=3)
+    assert (histogram.count, histogram.min, histogram.max, histogram.total) == (4, 0, 2, 6)
+
+
+def test_merge_equals_recording_everything():
+    generator = random.Random(3)
+    values = [generator.randrange(0, 10 ** 6) for _ in range(2000)]
+    whole, first, second = Histogram(), Histogram(), Histogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (first if i % 3 else second).record(value)
+
+    first.merge(second)
+    assert first.to_dict() == whole.to_dict()
+
+    with pytest.raises(Exception):
+        Histogram(8).merge(Histogram(6))
+
+
+def test_histogram_round_trip():
+    histogram = Histogram()
+    for value in [0, 5, 300, 70000, 70001]:
+        histogram.record(value)
+
+    restored = Histogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.to_dict() == histogram.to_dict()
+    assert restored.counts == histogram.counts
+
+
+class FakeQuery(object):
+    def __init__(self, path, variables):
+        self.query_data = QueryData()
+        self.query_data.path = path
+        for name in variables:
+            self.query_data.variables[name] = {}
+
+
+def get_result(source, values, total, success=True):
+    result = ExecutionResult("query", values, source)
+    result.status = 200 if success else 500
+    result.timing = RequestTiming()
+    result.timing.ttfb = total / 2.0
+    result.timing.total = total
+    result.timing.size = 100
+    return result
+
+
+def test_report_groups_and_merges():
+    users = FakeQuery(["users"], ["$users_first", "$users_last"])
+    friends = FakeQuery(["users", "edges", "node", "friends"], ["$users_first"])
+
+    first, second = LatencyReport(), LatencyReport()
+    first.record(get_result(users, [1, None], 0.010))
+    first.record(get_result(users, [None, 2], 0.020, False))
+    second.record(get_result(friends, [1], 0.030))
+    second.record(get_result(users, [3, None], 0.040))
+    second.record(ExecutionResult("query"))
+
+    first.merge(second)
+    assert list(first.fields.keys()) == ["users"]
+    assert list(first.queries.keys()) == ["users", "users.edges.node.friends"]
+    assert list(first.shapes.keys()) == ["users(users_first)", "users(users_last)",
+                                         "users.edges.node.friends(users_first)"]
+
+    total = first.fields["users"].histograms["total"]
+    assert (total.count, total.min, total.max) == (4, 10000, 40000)
+    assert first.fields["users"].errors == 1
+    assert first.shapes["users(users_first)"].histograms["total"].count == 2
+    assert first.fields["users"].histograms["connect"].max == 0
+
+    restored = LatencyReport.from_dict(json.loads(json.dumps(first.to_dict(buckets=True))))
+    assert restored.to_dict(buckets=True) == first.to_dict(buckets=True)
+    assert "users" in restored.format()
@@ -0,0 +1,87 @@
+import pickle
+
+import pytest
+
+from gqltst.schema import EMPTY_TABLE, TYPE_REFS, FieldTable, GqlEnumValue, Schema
+
+
+@pytest.fixture
+def schema(stub_server):
+    return Schema(stub_server().url)
+
+
+def get_objects(types):
+    for obj in types.values():
+        yield obj
+        for table in [obj.fields, obj.input_fields, obj.enum_values]:
+            for member in table.values():
+                yield member
+                for argument in getattr(member, "args", EMPTY_TABLE).values():
+                    yield argument
+
+
+def test_schema_objects_have_no_instance_dict(schema):
+    objects = list(get_objects(schema.types))
+    assert len(objects) > 100
+    for obj in objects + [schema.types["User"].fields["friends"].type, schema.registry]:
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+
+
+def test_type_refs_are_shared(schema):
+    types = schema.types
+    connection = types["Query"].fields["users"].type
+    assert types["User"].fields["friends"].type is connection
+    assert types["Query"].fields["users"].args["first"].type is types["User"].fields["friends"].args["last"].type
+    # same name, different signature
+    assert types["Query"].fields["user"].args["id"].type is not types["User"].fields["bestFriend"].args["id"].type
+    assert TYPE_REFS[("UserConnection", "OBJECT")] is connection
+
+    with pytest.raises(Exception):
+        connection.name = "Other"
+
+
+def test_empty_tables_are_shared(schema):
+    assert schema.types["Query"].fields["version"].args is EMPTY_TABLE
+    assert schema.types["String"].fields is EMPTY_TABLE
+    assert FieldTable.build([]) is EMPTY_TABLE
+
+
+def get_enum_value(name):
+    return GqlEnumValue({"name": name, "description": None, "isDeprecated": False, "deprecationReason": None})
+
+
+def test_field_table_lookup():
+    short = FieldTable([get_enum_value(n) for n in ["A", "B"]])
+    long = FieldTable([get_enum_value("V%d" % i) for i in range(20)])
+    assert short.index is None and long.index is not None
+
+    for table in [short, long]:
+        names = table.keys()
+        assert [table[n].name for n in names] == names
+        assert names[-1] in table and "missing" not in table
+        assert table.get("missing") is None
+        with pytest.raises(KeyError):
+            table["missing"]
+    assert [k for k, _ in long.items()] == list(long) == ["V%d" % i for i in range(20)]
+
+
+def test_pickle_round_trip(schema):
+    restored = pickle.loads(pickle.dumps(schema.types))
+
+    assert list(restored.keys()) == list(schema.types.keys())
+    for name, obj in schema.types.items():
+        assert restored[name].fields.keys() == obj.fields.keys()
+        assert restored[name].enum_values.keys() == obj.enum_values.keys()
+        for field_name, field in obj.fields.items():
+            # type refs are re-interned, not copied
+            assert restored[name].fields[field_name].type is field.type
+            assert restored[name].fields[field_name].args.keys() == field.args.keys()
+
+    schema.prepare_queries()
+    before = [q.compile() for q in schema.get_test_queries()]
+    assert len(before) > 0
+    schema.types.clear()
+    schema.types.update(restored)
+    schema.queries = []
+    schema.prepare_queries()
+    assert [q.compile() for q in schema.get_test_queries()] == before
@@ -0,0 +1,29 @@
+from gqltst import schema as gqltst_schema
+from gqltst.schema import Schema
+
+
+def test_schemas_share_a_session(stub_server):
+    servers = [stub_server(), stub_server()]
+    schemas = [Schema(server.url, headers={"X-Endpoint": str(i)}) for i, server in enumerate(servers)]
+    for schema in schemas:
+        schema.prepare_queries()
+
+    results = gqltst_schema.test_schemas(schemas, max_connections=4)
+
+    assert [len(r) for r in results] == [server.requests for server in servers]
+    assert all([r.success for batch in results for r in batch])
+    for i, server in enumerate(servers):
+        assert all([h["X-Endpoint"] == str(i) for h in server.headers])
+    # separate registries, one schema's types are not the other's
+    assert schemas[0].types is not schemas[1].types
+
+
+def test_schemas_keep_their_timeout(stub_server):
+    server = stub_server(delay=0.5)
+    schema = Schema(server.url)
+    schema.prepare_queries()
+
+    results = gqltst_schema.test_schemas([schema], timeout=0.1)[0]
+
+    assert len(results) > 0
+    assert all([r.error == "Timeout after 0.1s" for r in results])
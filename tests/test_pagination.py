@@ -0,0 +1,92 @@
+import time
+
+from gqltst.pagination import ConnectionScaling, PaginationProbe, get_page_sizes
+from gqltst.schema import Schema
+
+from conftest import ROOT, get_users
+
+SIZES = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+def get_connection(latency, repeats=None):
+    connection = ConnectionScaling(["users"], "first", SIZES)
+    for size, point in connection.points.items():
+        point.latency = [latency(size)] + ([] if repeats is None else repeats(size))
+    return connection
+
+
+def test_page_sizes():
+    assert get_page_sizes() == SIZES
+    assert get_page_sizes(100) == SIZES[:7]
+
+
+def test_noisy_small_pages_do_not_flag_linear():
+    # 0.1 ms per edge, with the smallest pages 1 ms off either way
+    noise = {2: 0.001, 5: -0.001, 10: 0.001, 20: 0.0008}
+    connection = get_connection(lambda n: 0.01 + 0.0001 * n + noise.get(n, 0.0))
+
+    assert connection.get_latency_fit()[0] is not None
+    assert not connection.is_super_linear()
+
+
+def test_slow_largest_page_does_not_flag_linear():
+    # one disturbed size used to decide the two-point slope on its own
+    connection = get_connection(lambda n: 0.01 + 0.0001 * n + (0.03 if n == 1000 else 0.0))
+    assert not connection.is_super_linear()
+
+
+def test_quadratic_is_flagged():
+    connection = get_connection(lambda n: 0.01 + 1e-7 * n * n)
+    assert connection.is_super_linear()
+    assert abs(connection.get_latency_fit(True)[0] - 2.0) < 0.1
+
+
+def test_small_increase_is_not_fitted():
+    connection = get_connection(lambda n: 0.01 + 1e-9 * n * n)
+    assert connection.get_latency_fit(True) == (None, None)
+    assert not connection.is_super_linear()
+
+
+def test_increase_within_repeat_spread_is_not_fitted():
+    connection = get_connection(lambda n: 0.01 + 1e-7 * n * n, lambda n: [1.0])
+    assert not connection.is_super_linear()
+
+
+def test_probe_linear_connection(stub_server):
+    def users(info, **kwargs):
+        size = kwargs.get("first") or kwargs.get("last") or 3
+        time.sleep(0.0001 * size)
+        return get_users(size)
+
+    server = stub_server(root=dict(ROOT, users=users))
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    report = schema.probe_pagination(sizes=[1, 10, 100, 200, 500], repeat=2)
+
+    assert len(report.connections) > 0
+    assert report.get_flagged() == []
+
+
+def test_probe_stops_rendering_once_every_size_is_seen(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    test_query = [q for q in schema.get_test_queries() if q.query_data.path == ["users"]][0]
+
+    rendered = []
+    get_query = test_query.get_query
+
+    def counting_get_query(*args, **kwargs):
+        for item in get_query(*args, **kwargs):
+            rendered.append(item)
+            yield item
+
+    test_query.get_query = counting_get_query
+    probe = PaginationProbe(None, sizes=[1, 10, 100], repeat=2)
+    requests = probe.get_requests(test_query, schema.scalars, seed=0)
+    total = len(list(get_query(schema.scalars, seed=0, page_sizes=probe.sizes)))
+
+    # first and last, three sizes each, twice
+    assert len(requests) == 12
+    assert len(rendered) < total
+    assert "size 100" in probe.report.format()
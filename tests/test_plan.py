@@ -0,0 +1,64 @@
+import pytest
+
+from gqltst.plan import Plan, compile_plan, run_plan
+from gqltst.schema import Schema
+
+
+@pytest.fixture
+def plan_path(stub_server, tmp_path):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    path = str(tmp_path / "test.gqlplan")
+    writer = compile_plan(schema, path, "pairwise")
+    return server, path, sum([q["rows"]["count"] for q in writer.queries])
+
+
+def get_planned(plan, path):
+    return [q for q in plan.queries if q.query_data.path == path][0]
+
+
+def test_plan_round_trip(plan_path):
+    server, path, count = plan_path
+    plan = Plan(path)
+    try:
+        assert len(plan) == count
+        requests = list(plan.get_requests())
+        assert len(requests) == count
+        assert all([payload["query"] == planned.document for payload, _, planned in requests])
+    finally:
+        plan.close()
+
+    assert plan.mmap.closed
+    with pytest.raises(ValueError):
+        plan.view[0]
+
+
+def test_plan_run_validates_responses(plan_path):
+    server, path, count = plan_path
+    results, latency = run_plan(path)
+
+    assert len(results) == count == server.requests
+    assert all([r.success for r in results]), [str(r) for r in results if not r.success]
+
+
+def test_planned_query_validation_failures(plan_path):
+    server, path, count = plan_path
+    plan = Plan(path)
+    try:
+        users = get_planned(plan, ["users"])
+        valid = {"users": {"totalCount": 1, "pageInfo": {"hasNextPage": False, "endCursor": None}, "edges": []}}
+        assert users.validate(valid) == []
+
+        missing = {"users": {"totalCount": None, "pageInfo": {"hasNextPage": False, "endCursor": None},
+                             "edges": {}}}
+        assert sorted([str(v) for v in users.validate(missing)]) == [
+            "Expected list at users.edges", "Non-null value is null at users.totalCount"]
+
+        node = {"id": "1", "name": "a", "age": "old", "color": "PURPLE"}
+        edges = {"users": {"totalCount": 1, "pageInfo": {"hasNextPage": False, "endCursor": None},
+                           "edges": [{"cursor": "1", "node": node}]}}
+        assert sorted([str(v) for v in users.validate(edges)]) == [
+            "Invalid Int value at users.edges.0.node.age", "Unknown Color value at users.edges.0.node.color"]
+    finally:
+        plan.close()
@@ -0,0 +1,67 @@
+import re
+
+import pytest
+
+from gqltst.schema import Schema
+
+from conftest import SDL
+
+graphql = pytest.importorskip("graphql")
+
+definition_re = re.compile(r"\$(\w+): ([^,)]+)")
+
+
+@pytest.fixture
+def schema(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    return schema
+
+
+def get_test_query(schema, path):
+    return [q for q in schema.get_test_queries() if q.query_data.path == path][0]
+
+
+def test_compiled_documents_are_valid(schema):
+    server_schema = graphql.build_schema(SDL)
+    for test_query in schema.get_test_queries():
+        document = test_query.compile()
+        assert graphql.validate(server_schema, graphql.parse(document)) == [], document
+        # compiled once
+        assert test_query.compile() is document
+
+
+def test_variables_match_argument_types(schema):
+    definitions = dict(definition_re.findall(get_test_query(schema, ["users", "edges", "node", "bestFriend"]).compile()))
+
+    assert definitions == {"users_first": "Int", "users_last": "Int", "users_order": "Order",
+                           "users_color": "[Color!]", "users_edges_node_bestFriend_id": "ID"}
+    assert dict(definition_re.findall(get_test_query(schema, ["user"]).compile())) == {"user_id": "ID!"}
+
+
+def test_compiled_payloads_only_change_variables(schema):
+    test_query = get_test_query(schema, ["users"])
+    payloads = [payload for payload, _ in test_query.get_query(schema.scalars, strategy="pairwise", compiled=True,
+                                                                 seed=0)]
+
+    assert len(payloads) > 1
+    assert len(set([p["query"] for p in payloads])) == 1
+    for payload, (_, values) in zip(payloads, test_query.get_query(schema.scalars, strategy="pairwise", seed=0)):
+        # None values are left out, like absent arguments in the literal document
+        expected = dict([(k[1:], v) for k, v in zip(test_query.query_data.variables.keys(), values)
+                         if v is not None])
+        assert payload["variables"] == expected
+
+
+def test_compiled_and_literal_requests_agree(schema):
+    server_schema = graphql.build_schema(SDL)
+    for test_query in schema.get_test_queries():
+        compiled = test_query.get_query(schema.scalars, strategy="pairwise", compiled=True, seed=0)
+        literal = test_query.get_query(schema.scalars, strategy="pairwise", seed=0)
+        for (payload, values), (document, literal_values) in zip(compiled, literal):
+            assert values == literal_values
+            result = graphql.execute(server_schema, graphql.parse(payload["query"]),
+                                     variable_values=payload["variables"])
+            assert graphql.validate(server_schema, graphql.parse(document)) == [], document
+            assert result.errors is None, (payload, result.errors)
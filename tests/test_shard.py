@@ -0,0 +1,33 @@
+from gqltst.canonical import get_canonical_hash
+from gqltst.schema import Schema
+from gqltst.shard import Shard, merge_reports, run_shard
+
+
+def get_keys(schema, shard=None):
+    return [(".".join(test_query.query_data.path), get_canonical_hash(query))
+            for query, values, test_query in schema.get_requests(strategy="pairwise", shard=shard, seed=0)]
+
+
+def test_shards_partition_the_requests(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    everything = get_keys(schema, Shard(1, 1))
+    assert everything == get_keys(schema)
+
+    for count in [2, 3, 5]:
+        slices = [get_keys(schema, Shard(i + 1, count)) for i in range(count)]
+        assert sorted(sum(slices, [])) == sorted(everything)
+        # stable: the same slice every time
+        assert slices[0] == get_keys(schema, Shard(1, count))
+
+
+def test_merged_reports_do_not_depend_on_count(stub_server):
+    server = stub_server()
+    options = {"strategy": "pairwise"}
+    whole = run_shard(server.url, {}, Shard(1, 1), 0, None, options)
+    merged = merge_reports([run_shard(server.url, {}, Shard(i + 1, 3), 0, None, options) for i in range(3)])
+
+    assert merged["executed"] == whole["executed"] > 0
+    assert merged["failed"] == whole["failed"]
+    assert merged["shards"] == ["1/3", "2/3", "3/3"]
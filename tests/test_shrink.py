@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from gqltst.canonical import get_canonical_hash
+from gqltst.executor import Executor
+from gqltst.schema import Schema
+from gqltst.shrink import Shrinker
+
+from conftest import ROOT, get_users
+
+
+def users(info, **kwargs):
+    if kwargs.get("last") and kwargs.get("color"):
+        raise Exception("Unable to page filtered users backwards")
+    return get_users(kwargs.get("first") or 3)
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_shrinking_sends_nothing_twice(stub_server, compiled):
+    server = stub_server(root=dict(ROOT, users=users))
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(shrink=True, compiled=compiled)
+
+    # dropping last from a failing request gives one the main run already sent
+    hashes = [get_canonical_hash(b) for b in server.bodies]
+    assert len(hashes) == len(set(hashes))
+    assert server.requests > len(results)
+
+    assert len(schema.shrunk) > 0
+    for shrunk in schema.shrunk:
+        assert [k.split("_")[-1] for k in shrunk.get_arguments().keys()] == ["last", "color"]
+
+
+def test_remembered_results_are_kept_as_they_are(stub_server):
+    server = stub_server(root=dict(ROOT, users=users))
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test(deduplicate=False)
+    requests = server.requests
+
+    shrinker = Shrinker(Executor(server.url))
+    shrunk = shrinker.run(results, sent=results)
+
+    # the main run's results are stored as they are, only probes sent are futures
+    futures = [p for p in shrinker.probes.values() if isinstance(p, asyncio.Future)]
+    assert len(shrunk) > 0
+    assert len(futures) == shrinker.sent == server.requests - requests
+    assert len(shrinker.probes) - len(futures) == len(set([get_canonical_hash(r.query) for r in results]))
@@ -0,0 +1,28 @@
+import pytest
+
+from gqltst.schema import Schema
+from gqltst.store import ResponseStore
+
+
+def test_replay_without_seed_serves_every_recording(stub_server, tmp_path):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    store = ResponseStore(str(tmp_path / "run.db"))
+
+    recorded = schema.test(store=store)
+    assert store.get_meta("seed") is not None
+
+    schema.url = "http://127.0.0.1:1/graphql"
+    replayed = schema.test(store=store, replay=True)
+
+    assert len(replayed) == len(recorded)
+    assert all([r.success for r in replayed]), [str(r) for r in replayed if not r.success]
+
+
+def test_replay_needs_a_recorded_seed(tmp_path):
+    schema = Schema("http://127.0.0.1:1/graphql", introspection={"data": {"__schema": {"types": []}}})
+    store = ResponseStore(str(tmp_path / "empty.db"))
+
+    with pytest.raises(Exception, match="no recorded seed"):
+        schema.test(store=store, replay=True)
@@ -0,0 +1,48 @@
+import hashlib
+import json
+
+from gqltst.cache import iter_spool, spool_response
+from gqltst.stream import TypesStreamParser, iter_types
+
+TYPES = [
+    {"name": "Query", "description": "a \"quoted\" [list] {object}", "fields": []},
+    {"name": "Tricky", "description": "back\\slash \\\" ] } , : é中", "fields": [{"name": "x"}]},
+    {"name": "Empty", "description": "", "fields": None},
+]
+
+RESPONSE = json.dumps({
+    "extensions": {"note": "\"types\": [not this one]", "types": ["neither", {"a": "]"}]},
+    "data": {"__schema": {"queryType": {"name": "Query"}, "types": TYPES}},
+}, ensure_ascii=False).encode("utf-8")
+
+
+def parse(chunks):
+    parser = TypesStreamParser()
+    elements = []
+    for chunk in chunks:
+        elements.extend(parser.feed(chunk))
+    elements.extend(parser.feed(b"", True))
+    assert parser.found
+    return elements
+
+
+def test_split_at_every_byte():
+    for i in range(len(RESPONSE) + 1):
+        assert parse([RESPONSE[:i], RESPONSE[i:]]) == TYPES, i
+
+
+def test_byte_by_byte():
+    assert parse([RESPONSE[i:i + 1] for i in range(len(RESPONSE))]) == TYPES
+
+
+def test_iter_types_digest_matches_spooled_hash():
+    chunks = [RESPONSE[i:i + 7] for i in range(0, len(RESPONSE), 7)]
+    digest = hashlib.sha256()
+    assert list(iter_types(chunks, digest)) == TYPES
+
+    schema_hash, spool = spool_response(chunks)
+    try:
+        assert schema_hash == digest.hexdigest()
+        assert list(iter_types(iter_spool(spool, 5))) == TYPES
+    finally:
+        spool.close()
@@ -0,0 +1,137 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from gqltst import tracing
+from gqltst.schema import Schema
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.enable(tracing.Tracer(service="test"))
+    yield tracer
+    tracing.disable()
+
+
+def record_spans():
+    with tracing.span("outer", size=3, ok=True, ratio=0.5, path=["users", "edges"]):
+        with tracing.span("request", "http", True, status=200):
+            pass
+        with pytest.raises(ValueError):
+            with tracing.span("inner"):
+                raise ValueError()
+
+
+def test_chrome_trace_shape(tracer):
+    record_spans()
+    trace = json.loads(json.dumps(tracer.get_chrome_trace()))
+    events = trace["traceEvents"]
+
+    assert trace["otherData"] == {"service": "test", "dropped_spans": 0}
+    assert [e["ts"] for e in events] == sorted([e["ts"] for e in events])
+    assert sorted([(e["name"], e["ph"]) for e in events]) == [
+        ("inner", "X"), ("outer", "X"), ("request", "b"), ("request", "e")]
+
+    by_name = dict([(e["name"], e) for e in events if e["ph"] in "Xb"])
+    outer = by_name["outer"]
+    assert outer["args"] == {"size": 3, "ok": True, "ratio": 0.5, "path": ["users", "edges"]}
+    assert by_name["inner"]["args"] == {"error": "ValueError"}
+    for name in ["inner", "request"]:
+        assert outer["ts"] <= by_name[name]["ts"] <= outer["ts"] + outer["dur"]
+
+    begin, end = [e for e in events if e["name"] == "request"]
+    assert begin["id"] == end["id"] and begin["cat"] == "http"
+    assert begin["args"] == {"status": 200} and end["args"] == {}
+
+
+def test_otlp_shape(tracer):
+    started = time.time_ns()
+    record_spans()
+    export = json.loads(json.dumps(tracer.get_otlp()))
+
+    resource_spans = export["resourceSpans"]
+    assert resource_spans[0]["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "test"}}]
+    spans = dict([(s["name"], s) for s in resource_spans[0]["scopeSpans"][0]["spans"]])
+
+    outer = spans["outer"]
+    assert "parentSpanId" not in outer
+    assert spans["request"]["parentSpanId"] == spans["inner"]["parentSpanId"] == outer["spanId"]
+    assert [spans[n]["kind"] for n in ["outer", "request", "inner"]] == [tracing.INTERNAL, tracing.CLIENT,
+                                                                         tracing.INTERNAL]
+    for span in spans.values():
+        assert len(span["traceId"]) == 32 and len(span["spanId"]) == 16
+        assert started <= int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"]) <= time.time_ns()
+
+    assert outer["attributes"] == [
+        {"key": "category", "value": {"stringValue": "gqltst"}},
+        {"key": "size", "value": {"intValue": "3"}},
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "path", "value": {"arrayValue": {"values": [{"stringValue": "users"}, {"stringValue": "edges"}]}}}]
+
+
+def test_spans_past_the_limit_are_counted(tracer):
+    tracer.max_spans = 2
+    finished = []
+    tracer.add_hook(finished.append)
+    for item in tracing.trace_iterator(range(4), "item"):
+        pass
+
+    # one span per item and one for the exhausted iterator
+    assert len(finished) == 5
+    assert len(tracer.spans) == 2 and tracer.dropped == 3
+    assert tracer.get_chrome_trace()["otherData"]["dropped_spans"] == 3
+
+
+def test_disabled_tracing_allocates_nothing():
+    assert tracing.TRACER is None
+    assert tracing.span("anything", path=["users"]) is tracing.NULL_SPAN
+
+    def run():
+        for _ in range(10000):
+            with tracing.span("disabled", path=None) as span:
+                span.set("key", "value")
+
+    run()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        run()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    grown = sum([s.size_diff for s in after.compare_to(before, "filename") if s.size_diff > 0])
+    assert grown < 1024
+
+
+def test_disabled_spans_are_cheaper_than_enabled():
+    def measure():
+        started = time.perf_counter()
+        for _ in range(20000):
+            with tracing.span("measured", path=None):
+                pass
+        return time.perf_counter() - started
+
+    disabled = min([measure() for _ in range(3)])
+    tracing.enable()
+    try:
+        enabled = min([measure() for _ in range(3)])
+    finally:
+        tracing.disable()
+
+    assert disabled * 2 < enabled
+
+
+def test_run_is_traced(stub_server, tracer):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    results = schema.test()
+
+    names = set([s.name for s in tracer.spans])
+    assert set(["introspection", "prepare_queries", "enumerate", "render", "validate"]) <= names
+    requests = [s for s in tracer.spans if s.is_async]
+    assert len(requests) == len(results) == server.requests
@@ -0,0 +1,65 @@
+import pytest
+
+from gqltst.schema import Schema
+
+
+@pytest.fixture
+def schema(stub_server):
+    server = stub_server()
+    schema = Schema(server.url)
+    schema.prepare_queries()
+    return schema
+
+
+def get_failures(schema, path, data, scalars=None):
+    test_query = [q for q in schema.get_test_queries() if q.query_data.path == path][0]
+    return sorted([str(f) for f in test_query.validate(data, schema.scalars if scalars is None else scalars)])
+
+
+def get_users(edges, total=1):
+    return {"users": {"totalCount": total, "pageInfo": {"hasNextPage": False, "endCursor": None}, "edges": edges}}
+
+
+def get_node(**kwargs):
+    node = {"id": "1", "name": "a", "age": 1, "color": "RED"}
+    node.update(kwargs)
+    return node
+
+
+def test_valid_response(schema):
+    assert get_failures(schema, ["users"], get_users([{"cursor": "0", "node": get_node()}, None])) == []
+    assert get_failures(schema, ["users"], {"users": None}) == []
+    assert get_failures(schema, ["user"], {"user": get_node(age=None, color=None)}) == []
+
+
+def test_nullability(schema):
+    assert get_failures(schema, ["users"], get_users([{"cursor": None, "node": get_node(name=None)}], None)) == [
+        "Non-null value is null at users.edges.0.cursor",
+        "Non-null value is null at users.edges.0.node.name",
+        "Non-null value is null at users.totalCount"]
+    assert get_failures(schema, ["user"], {"user": get_node(id=None)}) == ["Non-null value is null at user.id"]
+
+
+def test_lists(schema):
+    assert get_failures(schema, ["users"], get_users({"cursor": "0"})) == ["Expected list at users.edges"]
+    assert get_failures(schema, ["users"], get_users(["edge"])) == ["Expected object at users.edges.0"]
+
+
+def test_enums(schema):
+    assert get_failures(schema, ["user"], {"user": get_node(color="PURPLE")}) == ["Unknown Color value at user.color"]
+    assert get_failures(schema, ["user"], {"user": get_node(color=1)}) == ["Unknown Color value at user.color"]
+
+
+def test_scalars_and_missing_fields(schema):
+    node = get_node(age="1", name=2)
+    del node["color"]
+    assert get_failures(schema, ["user"], {"user": node}) == [
+        "Invalid Int value at user.age", "Invalid String value at user.name", "Missing field color at user"]
+    assert get_failures(schema, ["user"], {}) == ["Missing field user"]
+
+
+def test_path_to_the_tested_field(schema):
+    data = {"users": {"edges": [{"node": {"bestFriend": get_node(color="PURPLE")}}]}}
+    assert get_failures(schema, ["users", "edges", "node", "bestFriend"], data) == [
+        "Unknown Color value at users.edges.0.node.bestFriend.color"]
+    assert get_failures(schema, ["users", "edges", "node", "bestFriend"], {"users": {"edges": None}}) == []